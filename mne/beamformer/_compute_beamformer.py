@@ -17,7 +17,8 @@ from ..io.proj import make_projector, Projection
 from ..io.pick import pick_channels_forward
 from ..minimum_norm.inverse import _get_vertno
 from ..source_space import label_src_vertno_sel
-from ..utils import verbose, check_fname, _reg_pinv, _check_compensation_grade
+from ..utils import (verbose, check_fname, _reg_pinv,
+                     _check_compensation_grade, warn)
 from ..time_frequency.csd import CrossSpectralDensity
 
 from ..externals.h5io import read_hdf5, write_hdf5
@@ -130,6 +131,62 @@ def _prepare_beamformer_input(info, forward, label, picks, pick_ori,
     return is_free_ori, ch_names, proj, vertno, G, nn
 
 
+def _reduce_rank_pinv(x):
+    """Compute the rank-reduced pseudo-inverse of stacked square matrices.
+
+    This is a stacked equivalent of ``_reg_pinv(x, rank=x.shape[-1] - 1)``,
+    i.e. the smallest singular value of each matrix is discarded.
+    """
+    U, s, V = np.linalg.svd(x)
+    s[..., -1] = 0.
+    s_inv = np.zeros(s.shape)
+    mask = s != 0
+    s_inv[mask] = 1. / s[mask]
+    return np.matmul(np.swapaxes(V, -1, -2),
+                     s_inv[..., np.newaxis] * np.swapaxes(U, -1, -2))
+
+
+def _pinv_stacked(x, rcond):
+    """Compute the pseudo-inverse of stacked matrices.
+
+    Singular values smaller than ``rcond`` times the largest singular value
+    of each matrix are treated as zero.
+    """
+    U, s, V = np.linalg.svd(x)
+    s_inv = np.zeros(s.shape)
+    mask = s > rcond * s.max(axis=-1, keepdims=True)
+    s_inv[mask] = 1. / s[mask]
+    return np.matmul(np.swapaxes(V, -1, -2).conj(),
+                     s_inv[..., np.newaxis] * np.swapaxes(U, -1, -2).conj())
+
+
+def _stacked_sandwich(Wk, Cm):
+    """Compute ``Wk @ Cm @ Wk.T`` for stacked filters ``Wk``."""
+    WkCm = np.dot(Wk.reshape(-1, Wk.shape[-1]), Cm).reshape(Wk.shape)
+    return np.matmul(WkCm, np.swapaxes(Wk, 1, 2))
+
+
+def _max_power_sign(max_power_ori, nn):
+    """Get the sign flip to align stacked max-power orientations to normals.
+
+    Parameters
+    ----------
+    max_power_ori : ndarray, shape (n_sources, 3)
+        The orientations of maximum power.
+    nn : ndarray, shape (n_sources, 3)
+        The source normals.
+
+    Returns
+    -------
+    sign : ndarray, shape (n_sources,)
+        The (otherwise arbitrary) sign of each orientation, with the
+        corner case of orthogonal orientations mapped to 1.
+    """
+    sign = np.sign(np.sum(max_power_ori * nn, axis=1))
+    sign[sign == 0] = 1  # corner case
+    return sign
+
+
 def _normalized_weights(Wk, Gk, Cm_inv_sq, reduce_rank, nn):
     """Compute the normalized weights in max-power orientation.
 
@@ -137,69 +194,72 @@ def _normalized_weights(Wk, Gk, Cm_inv_sq, reduce_rank, nn):
 
     Parameters
     ----------
-    Wk : ndarray, shape (3, n_channels)
-        The set of un-normalized filters at a single source point.
-    Gk : ndarray, shape (n_channels, 3)
-        The leadfield at a single source point.
+    Wk : ndarray, shape (n_sources, 3, n_channels)
+        The set of un-normalized filters at each source point.
+    Gk : ndarray, shape (n_sources, n_channels, 3)
+        The leadfield at each source point.
     Cm_inv_sq : nsarray, snape (n_channels, n_channels)
         The squared inverse covariance matrix.
     reduce_rank : bool
         Whether to reduce the rank of the filter by one.
-    nn : ndarray, shape (3,)
-        The source normal.
+    nn : ndarray, shape (n_sources, 3)
+        The source normals.
 
     Returns
     -------
-    Wk : ndarray, shape (n_dipoles, n_channels)
-        The normalized beamformer filters at the source point in the direction
-        of max power.
+    Wk : ndarray, shape (n_sources, n_channels)
+        The normalized beamformer filters at each source point in the
+        direction of max power.
 
     References
     ----------
     .. [1] Sekihara & Nagarajan. Adaptive spatial filters for electromagnetic
            brain imaging (2008) Springer Science & Business Media
     """
-    norm_inv = np.dot(Gk.T, np.dot(Cm_inv_sq, Gk))
+    assert Wk.shape[1] == Gk.shape[2] == 3
+    # one large product instead of a stack of small ones
+    Cm_inv_sq_Gk = np.dot(Cm_inv_sq, Gk.transpose(1, 0, 2).reshape(
+        Gk.shape[1], -1)).reshape(Gk.shape[1], -1, 3).transpose(1, 0, 2)
+    norm_inv = np.matmul(np.swapaxes(Gk, 1, 2), Cm_inv_sq_Gk)
     if reduce_rank:
         # Use pseudo inverse computation setting smallest
         # component to zero if the leadfield is not full rank
-        norm = _reg_pinv(norm_inv, rank=norm_inv.shape[0] - 1)[0]
+        norm = _reduce_rank_pinv(norm_inv)
     else:
         # Use straight inverse with full rank leadfield
         try:
-            norm = linalg.inv(norm_inv)
-        except np.linalg.linalg.LinAlgError:
+            norm = np.linalg.inv(norm_inv)
+        except np.linalg.LinAlgError:
             raise ValueError(
                 'Singular matrix detected when estimating spatial filters. '
                 'Consider reducing the rank of the forward operator by using '
                 'reduce_rank=True.'
             )
-    assert Wk.shape[0] == Gk.shape[1] == 3
-    power = np.dot(norm, np.dot(Wk, Gk))
+    power = np.matmul(norm, np.matmul(Wk, Gk))
 
     # Determine orientation of max power
-    eig_vals, eig_vecs = linalg.eig(power)
+    eig_vals, eig_vecs = np.linalg.eig(power)
     if not np.iscomplex(power).any() and np.iscomplex(eig_vecs).any():
         raise ValueError('The eigenspectrum of the leadfield at this voxel is '
                          'complex. Consider reducing the rank of the '
                          'leadfield by using reduce_rank=True.')
+    if not np.iscomplexobj(power):
+        # some other voxel had complex eigenvalues with zero imaginary part
+        eig_vals, eig_vecs = eig_vals.real, eig_vecs.real
 
-    idx_max = eig_vals.argmax()
-    max_power_ori = eig_vecs[:, idx_max]
-
-    # set the (otherwise arbitrary) sign to match the normal
-    sign = np.sign(np.dot(max_power_ori, nn))
-    sign = 1 if sign == 0 else sign
-    max_power_ori *= sign
+    idx_max = eig_vals.argmax(axis=1)
+    max_power_ori = eig_vecs[np.arange(len(eig_vecs)), :, idx_max]
+    max_power_ori *= _max_power_sign(max_power_ori, nn)[:, np.newaxis]
 
     # Compute the filter in the orientation of max power
-    Wk[:] = np.dot(max_power_ori, Wk)
-    Gk = np.dot(Gk, max_power_ori)
-    denom = np.dot(Gk.T, np.dot(Cm_inv_sq, Gk))
-    denom = np.sqrt(denom)
-    Wk /= denom
+    Wk_max = np.matmul(max_power_ori[:, np.newaxis], Wk)[:, 0]
+    Gk_max = np.matmul(Gk, max_power_ori[:, :, np.newaxis])
+    denom = np.matmul(np.swapaxes(Gk_max, 1, 2),
+                      np.dot(Cm_inv_sq, Gk_max[:, :, 0].T).T[:, :, np.newaxis])
+    denom = denom[:, 0]
+    Wk_max /= np.sqrt(denom)
 
-    return Wk
+    return Wk_max
 
 
 def _compute_beamformer(G, Cm, reg, n_orient, weight_norm, pick_ori,
@@ -209,6 +269,12 @@ def _compute_beamformer(G, Cm, reg, n_orient, weight_norm, pick_ori,
     For more detailed information on the parameters, see the docstrings of
     `make_lcmv` and `make_dics`.
 
+    The per-source computations (power, normalization and orientation of
+    max power) are done on stacks of ``(n_orient, n_channels)`` filters and
+    ``(n_channels, n_orient)`` leadfields for all sources at once, using
+    stacked (batched) matrix products and decompositions instead of a loop
+    over sources.
+
     Parameters
     ----------
     G : ndarray, shape (n_dipoles, n_channels)
@@ -242,66 +308,61 @@ def _compute_beamformer(G, Cm, reg, n_orient, weight_norm, pick_ori,
     # eq. 25 in Gross and Ioannides, 1999 Phys. Med. Biol. 44 2081
     Cm_inv, loading_factor, rank = _reg_pinv(Cm, reg, rank)
 
-    if (inversion == 'matrix' and pick_ori == 'max-power' and
-            weight_norm in ['unit-noise-gain', 'nai']):
-        Cm_inv_sq = Cm_inv.dot(Cm_inv)
-
     # Compute spatial filters
     W = np.dot(G.T, Cm_inv)
+    n_channels = G.shape[0]
     n_sources = G.shape[1] // n_orient
     assert nn.shape == (n_sources, 3)
 
-    for k in range(n_sources):
-        Wk = W[n_orient * k: n_orient * k + n_orient]
-        Gk = G[:, n_orient * k: n_orient * k + n_orient]
+    # Stack the filters and leadfields of all sources
+    Wk = W.reshape(n_sources, n_orient, W.shape[1])
+    Gk = G.reshape(n_channels, n_sources, n_orient).transpose(1, 0, 2)
 
+    if (inversion == 'matrix' and pick_ori == 'max-power' and
+            weight_norm in ['unit-noise-gain', 'nai']):
+        # In this case, take a shortcut to compute the filter
+        Cm_inv_sq = Cm_inv.dot(Cm_inv)
+        Wk[:] = _normalized_weights(
+            Wk, Gk, Cm_inv_sq, reduce_rank, nn)[:, np.newaxis]
+    else:
         # Compute power at the source
-        Ck = np.dot(Wk, Gk)
-
-        if (inversion == 'matrix' and pick_ori == 'max-power' and
-                weight_norm in ['unit-noise-gain', 'nai']):
-            # In this case, take a shortcut to compute the filter
-            Wk[:] = _normalized_weights(Wk, Gk, Cm_inv_sq, reduce_rank, nn[k])
+        Ck = np.matmul(Wk, Gk)
+
+        # Normalize the spatial filters
+        if n_orient > 1:
+            # Free source orientation
+            if inversion == 'single':
+                # Invert for each dipole separately using plain division
+                Wk /= np.diagonal(Ck, axis1=1, axis2=2)[:, :, np.newaxis]
+            elif inversion == 'matrix':
+                # Invert for all dipoles simultaneously using matrix
+                # inversion.
+                Wk[:] = np.matmul(_pinv_stacked(Ck, 0.1), Wk)
         else:
-            # Normalize the spatial filters
-            if Wk.ndim == 2 and len(Wk) > 1:
-                # Free source orientation
-                if inversion == 'single':
-                    # Invert for each dipole separately using plain division
-                    Wk /= np.diag(Ck)[:, np.newaxis]
-                elif inversion == 'matrix':
-                    # Invert for all dipoles simultaneously using matrix
-                    # inversion.
-                    Wk[:] = np.dot(linalg.pinv(Ck, 0.1), Wk)
-            else:
-                # Fixed source orientation
-                if not np.all(Ck == 0.):
-                    Wk /= Ck
-
-            if pick_ori == 'max-power':
-                # Compute the power
-                if inversion == 'single' and weight_norm == 'unit-noise-gain':
-                    # First make the filters unit gain, then apply them to the
-                    # cov matrix to compute power.
-                    Wk_norm = Wk / np.sqrt(np.sum(Wk ** 2, axis=1,
-                                                  keepdims=True))
-                    power = Wk_norm.dot(Cm).dot(Wk_norm.T)
-                elif weight_norm is None:
-                    # Compute power by applying the spatial filters to
-                    # the cov matrix.
-                    power = Wk.dot(Cm).dot(Wk.T)
-
-                # Compute the direction of max power
-                u, s, _ = np.linalg.svd(power.real)
-                max_power_ori = u[:, 0]
-
-                # set the (otherwise arbitrary) sign to match the normal
-                sign = np.sign(np.dot(nn[k], max_power_ori))
-                sign = 1 if sign == 0 else sign  # corner case
-                max_power_ori *= sign
-
-                # Re-compute the filter in the direction of max power
-                Wk[:] = max_power_ori.dot(Wk)
+            # Fixed source orientation
+            nonzero = Ck[:, 0, 0] != 0.
+            Wk[nonzero] /= Ck[nonzero]
+
+        if pick_ori == 'max-power':
+            # Compute the power
+            if inversion == 'single' and weight_norm == 'unit-noise-gain':
+                # First make the filters unit gain, then apply them to the
+                # cov matrix to compute power.
+                Wk_norm = Wk / np.sqrt(np.sum(Wk ** 2, axis=2,
+                                              keepdims=True))
+                power = _stacked_sandwich(Wk_norm, Cm)
+            elif weight_norm is None:
+                # Compute power by applying the spatial filters to
+                # the cov matrix.
+                power = _stacked_sandwich(Wk, Cm)
+
+            # Compute the direction of max power
+            u, s, _ = np.linalg.svd(power.real)
+            max_power_ori = u[:, :, 0]
+            max_power_ori *= _max_power_sign(max_power_ori, nn)[:, np.newaxis]
+
+            # Re-compute the filter in the direction of max power
+            Wk[:] = np.matmul(max_power_ori[:, np.newaxis], Wk)
 
     if pick_ori == 'normal':
         W = W[2::3]
@@ -350,6 +411,68 @@ def _compute_beamformer(G, Cm, reg, n_orient, weight_norm, pick_ori,
     return W
 
 
+def _tf_windows(tmin, tmax, tstep, win_length, tdelta):
+    """Get the time windows for time-frequency beamforming.
+
+    Parameters
+    ----------
+    tmin, tmax : float
+        The time range to consider.
+    tstep : float
+        Spacing between consecutive time windows.
+    win_length : float
+        The length of each time window.
+    tdelta : float
+        The sampling interval of the data.
+
+    Returns
+    -------
+    n_time_steps : int
+        The number of time steps.
+    windows : list of tuple
+        The ``(win_tmin, win_tmax)`` of the windows to compute a solution
+        for, in order.
+    """
+    # Multiplying by 1e3 to avoid numerical issues, e.g. 0.3 // 0.05 == 5
+    n_time_steps = int(((tmax - tmin) * 1e3) // (tstep * 1e3))
+    windows = list()
+    for i_time in range(n_time_steps):
+        win_tmin = tmin + i_time * tstep
+        win_tmax = win_tmin + win_length
+
+        # If in the last step the last time point was not covered in
+        # previous steps and will not be covered now, a solution needs to
+        # be calculated for an additional time window
+        if (i_time == n_time_steps - 1 and win_tmax - tstep < tmax and
+                win_tmax >= tmax + tdelta):
+            warn('Adding a time window to cover last time points')
+            win_tmin = tmax - win_length
+            win_tmax = tmax
+
+        if win_tmax < tmax + tdelta:
+            windows.append((win_tmin, win_tmax))
+    return n_time_steps, windows
+
+
+def _tf_average_windows(sol_single, n_time_steps, n_overlap):
+    """Average the solutions of overlapping windows for each time point."""
+    sol_overlap = []
+    for i_time in range(n_time_steps):
+        # Average over all time windows that contain the current time
+        # point, which is the current time window along with
+        # n_overlap - 1 previous ones
+        if i_time - n_overlap < 0:
+            curr_sol = np.mean(sol_single[0:i_time + 1], axis=0)
+        else:
+            curr_sol = np.mean(sol_single[i_time - n_overlap + 1:
+                                          i_time + 1], axis=0)
+
+        # The final result for the current time point in the current
+        # frequency bin
+        sol_overlap.append(curr_sol)
+    return sol_overlap
+
+
 class Beamformer(dict):
     """A computed beamformer.
 
@@ -8,16 +8,17 @@
 # License: BSD (3-clause)
 import numpy as np
 
-from ..utils import (logger, verbose, warn, _reg_pinv, _check_info_inv,
+from ..utils import (logger, verbose, _reg_pinv, _check_info_inv,
                      _check_channels_spatial_filter, _check_one_ch_type,
                      _check_rank, _check_option)
 from ..forward import _subject_from_forward
 from ..minimum_norm.inverse import combine_xyz, _check_reference
 from ..source_estimate import _make_stc, _get_src_type
 from ..time_frequency import csd_fourier, csd_multitaper, csd_morlet
+from ..parallel import parallel_func
 from ._compute_beamformer import (_check_proj_match, _prepare_beamformer_input,
-                                  _compute_beamformer,
-                                  _check_src_type, Beamformer)
+                                  _compute_beamformer, _check_src_type,
+                                  Beamformer, _tf_windows, _tf_average_windows)
 
 
 @verbose
@@ -585,6 +586,50 @@ def _apply_old_dics(data, info, tmin, forward, noise_csd, data_csd, reg,
     logger.info('[done]')
 
 
+def _dics_tf_window(epochs, win_tmin, win_tmax, mode, csd_kwargs, noise_csd,
+                    forward, reg, label, pick_ori, rank, inversion,
+                    weight_norm, normalize_fwd, reduce_rank, real_filter):
+    """Compute DICS source power in a single time-frequency window."""
+    # Counteracts unsafe floating point arithmetic ensuring all
+    # relevant samples will be taken into account when selecting
+    # data in time windows
+    win_tmin = win_tmin - 1e-10
+    win_tmax = win_tmax + 1e-10
+
+    # Calculating data CSD in current time window
+    if mode == 'fourier':
+        csd = csd_fourier(epochs, tmin=win_tmin, tmax=win_tmax,
+                          verbose=False, **csd_kwargs)
+    elif mode == 'multitaper':
+        csd = csd_multitaper(epochs, tmin=win_tmin, tmax=win_tmax,
+                             verbose=False, **csd_kwargs)
+    elif mode == 'cwt_morlet':
+        csd = csd_morlet(epochs, tmin=win_tmin, tmax=win_tmax,
+                         verbose=False, **csd_kwargs)
+    else:
+        raise ValueError('Invalid mode, choose either '
+                         "'fourier' or 'multitaper'")
+
+    csd = csd.sum()
+
+    # Scale data CSD to allow data and noise CSDs to have different
+    # length
+    csd._data /= csd.n_fft
+
+    filters = make_dics(epochs.info, forward, csd, reg=reg, label=label,
+                        pick_ori=pick_ori, rank=rank, inversion=inversion,
+                        weight_norm=weight_norm, normalize_fwd=normalize_fwd,
+                        reduce_rank=reduce_rank, real_filter=real_filter,
+                        verbose=False)
+    stc, _ = apply_dics_csd(csd, filters, verbose=False)
+
+    if noise_csd is not None:
+        # Scale signal power by noise power
+        noise_stc, _ = apply_dics_csd(noise_csd, filters, verbose=False)
+        stc /= noise_stc
+    return stc
+
+
 @verbose
 def tf_dics(epochs, forward, noise_csds, tmin, tmax, tstep, win_lengths,
             subtract_evoked=False, mode='fourier', freq_bins=None,
@@ -592,7 +637,7 @@ def tf_dics(epochs, forward, noise_csds, tmin, tmax, tstep, win_lengths,
             mt_adaptive=False, mt_low_bias=True, cwt_n_cycles=7, decim=1,
             reg=0.05, label=None, pick_ori=None, rank=None, inversion='single',
             weight_norm=None, normalize_fwd=True, real_filter=False,
-            reduce_rank=False, verbose=None):
+            reduce_rank=False, n_jobs=1, verbose=None):
     """5D time-frequency beamforming based on DICS.
 
     Calculate source power in time-frequency windows using a spatial filter
@@ -720,6 +765,14 @@ def tf_dics(epochs, forward, noise_csds, tmin, tmax, tstep, win_lengths,
         each spatial location, prior to inversion. This may be necessary when
         you use a single sphere model for MEG and ``mode='vertex'``.
         Defaults to ``False``.
+    n_jobs : int
+        Number of jobs to run in parallel. The beamformers of the time
+        windows of each frequency bin are computed in parallel. Each job needs
+        the epochs data; to share preloaded epochs between jobs through memory
+        mapping instead of copying them, set ``MNE_CACHE_DIR`` (see
+        :func:`mne.set_cache_dir`). Defaults to 1.
+
+        .. versionadded:: 0.18
     %(verbose)s
 
     Returns
@@ -779,13 +832,12 @@ def tf_dics(epochs, forward, noise_csds, tmin, tmax, tstep, win_lengths,
                          'multitaper transform bandwidth, one value must be '
                          'provided per frequency bin')
 
-    # Multiplying by 1e3 to avoid numerical issues, e.g. 0.3 // 0.05 == 5
-    n_time_steps = int(((tmax - tmin) * 1e3) // (tstep * 1e3))
-
     # Subtract evoked response
     if subtract_evoked:
         epochs = epochs.copy().subtract_evoked()
 
+    tdelta = epochs.times[-1] - epochs.times[-2]
+    parallel, p_fun, _ = parallel_func(_dics_tf_window, n_jobs)
     sol_final = []
 
     # Compute source power for each frequency bin
@@ -794,120 +846,60 @@ def tf_dics(epochs, forward, noise_csds, tmin, tmax, tstep, win_lengths,
         n_overlap = int((win_length * 1e3) // (tstep * 1e3))
 
         # Scale noise CSD to allow data and noise CSDs to have different length
+        noise_csd = None
         if noise_csds is not None:
             noise_csd = noise_csds[i_freq].copy()
             noise_csd._data /= noise_csd.n_fft
 
+        csd_kwargs = dict()
         if mode == 'cwt_morlet':
             freq_bin = frequencies[i_freq]
             fmin = np.min(freq_bin)
             fmax = np.max(freq_bin)
+            csd_kwargs.update(frequencies=freq_bin, n_cycles=cwt_n_cycles,
+                              decim=decim)
         else:
             fmin, fmax = freq_bins[i_freq]
-            if n_ffts is None:
-                n_fft = None
-            else:
-                n_fft = n_ffts[i_freq]
-            if mt_bandwidths is None:
-                mt_bandwidth = None
-            else:
-                mt_bandwidth = mt_bandwidths[i_freq]
-
-        sol_single = []
-        sol_overlap = []
-        for i_time in range(n_time_steps):
-            win_tmin = tmin + i_time * tstep
-            win_tmax = win_tmin + win_length
-
-            # If in the last step the last time point was not covered in
-            # previous steps and will not be covered now, a solution needs to
-            # be calculated for an additional time window
-            if (i_time == n_time_steps - 1 and
-                    win_tmax - tstep < tmax and
-                    win_tmax >= tmax + (epochs.times[-1] - epochs.times[-2])):
-                warn('Adding a time window to cover last time points')
-                win_tmin = tmax - win_length
-                win_tmax = tmax
-
-            if win_tmax < tmax + (epochs.times[-1] - epochs.times[-2]):
-                # Counteracts unsafe floating point arithmetic ensuring all
-                # relevant samples will be taken into account when selecting
-                # data in time windows
-                logger.info(
-                    'Computing time-frequency DICS beamformer for time '
-                    'window %d to %d ms, in frequency range %d to %d Hz' %
-                    (win_tmin * 1e3, win_tmax * 1e3, fmin, fmax)
-                )
-
-                # Calculating data CSD in current time window
-                if mode == 'fourier':
-                    csd = csd_fourier(
-                        epochs, fmin=fmin, fmax=fmax, tmin=win_tmin,
-                        tmax=win_tmax, n_fft=n_fft, verbose=False)
-                elif mode == 'multitaper':
-                    csd = csd_multitaper(
-                        epochs, fmin=fmin, fmax=fmax, tmin=win_tmin,
-                        tmax=win_tmax, n_fft=n_fft, bandwidth=mt_bandwidth,
-                        low_bias=mt_low_bias, verbose=False)
-                elif mode == 'cwt_morlet':
-                    csd = csd_morlet(
-                        epochs, frequencies=freq_bin, tmin=win_tmin,
-                        tmax=win_tmax, n_cycles=cwt_n_cycles, decim=decim,
-                        verbose=False)
-                else:
-                    raise ValueError('Invalid mode, choose either '
-                                     "'fourier' or 'multitaper'")
-
-                csd = csd.sum()
-
-                # Scale data CSD to allow data and noise CSDs to have different
-                # length
-                csd._data /= csd.n_fft
-
-                filters = make_dics(epochs.info, forward, csd, reg=reg,
-                                    label=label, pick_ori=pick_ori,
-                                    rank=rank, inversion=inversion,
-                                    weight_norm=weight_norm,
-                                    normalize_fwd=normalize_fwd,
-                                    reduce_rank=reduce_rank,
-                                    real_filter=real_filter, verbose=False)
-                stc, _ = apply_dics_csd(csd, filters, verbose=False)
-
-                if noise_csds is not None:
-                    # Scale signal power by noise power
-                    noise_stc, _ = apply_dics_csd(noise_csd, filters,
-                                                  verbose=False)
-                    stc /= noise_stc
-
-                sol_single.append(stc.data[:, 0])
-
-            # Average over all time windows that contain the current time
-            # point, which is the current time window along with
-            # n_overlap - 1 previous ones
-            if i_time - n_overlap < 0:
-                curr_sol = np.mean(sol_single[0:i_time + 1], axis=0)
-            else:
-                curr_sol = np.mean(sol_single[i_time - n_overlap + 1:
-                                              i_time + 1], axis=0)
-
-            # The final result for the current time point in the current
-            # frequency bin
-            sol_overlap.append(curr_sol)
+            csd_kwargs.update(fmin=fmin, fmax=fmax)
+            csd_kwargs['n_fft'] = None if n_ffts is None else n_ffts[i_freq]
+            if mode == 'multitaper':
+                csd_kwargs['bandwidth'] = (None if mt_bandwidths is None
+                                           else mt_bandwidths[i_freq])
+                csd_kwargs['low_bias'] = mt_low_bias
+
+        n_time_steps, windows = _tf_windows(tmin, tmax, tstep, win_length,
+                                            tdelta)
+        for win_tmin, win_tmax in windows:
+            logger.info(
+                'Computing time-frequency DICS beamformer for time '
+                'window %d to %d ms, in frequency range %d to %d Hz' %
+                (win_tmin * 1e3, win_tmax * 1e3, fmin, fmax)
+            )
+
+        # The time windows are independent, so they are distributed across
+        # jobs (preloaded epochs are memmapped if MNE_CACHE_DIR is set)
+        stcs = parallel(p_fun(epochs, win_tmin, win_tmax, mode, csd_kwargs,
+                              noise_csd, forward, reg, label, pick_ori, rank,
+                              inversion, weight_norm, normalize_fwd,
+                              reduce_rank, real_filter)
+                        for win_tmin, win_tmax in windows)
+        sol_single = [stc.data[:, 0] for stc in stcs]
+        stc = stcs[-1]
+        del stcs
 
         # Gathering solutions for all time points for current frequency bin
-        sol_final.append(sol_overlap)
+        sol_final.append(_tf_average_windows(sol_single, n_time_steps,
+                                             n_overlap))
 
     sol_final = np.array(sol_final)
 
     # Creating stc objects containing all time points for each frequency bin
     stcs = []
-    # compatibility with 0.16, add src_type as None if not present:
-    filters, warn_text = _check_src_type(filters)
-
+    src_type = _get_src_type(forward['src'], stc.vertices)
     for i_freq in range(n_freq_bins):
         stc = _make_stc(sol_final[i_freq, :, :].T, vertices=stc.vertices,
-                        src_type=filters['src_type'], tmin=tmin, tstep=tstep,
-                        subject=stc.subject, warn_text=warn_text)
+                        src_type=src_type, tmin=tmin, tstep=tstep,
+                        subject=stc.subject)
         stcs.append(stc)
 
     return stcs
@@ -14,14 +14,16 @@ from ..forward import _subject_from_forward
 from ..minimum_norm.inverse import combine_xyz, _check_reference
 from ..cov import compute_whitener, compute_covariance
 from ..source_estimate import _make_stc, SourceEstimate, _get_src_type
-from ..utils import (logger, verbose, warn, _validate_type, _reg_pinv,
+from ..utils import (logger, verbose, _validate_type, _reg_pinv,
                      _check_info_inv, _check_channels_spatial_filter,
                      _check_option)
 from ..utils import _check_one_ch_type, _check_rank
+from ..parallel import parallel_func
 from .. import Epochs
 from ._compute_beamformer import (
     _check_proj_match, _prepare_beamformer_input,
-    _compute_beamformer, _check_src_type, Beamformer)
+    _compute_beamformer, _check_src_type, Beamformer, _tf_windows,
+    _tf_average_windows)
 
 
 @verbose
@@ -468,6 +470,25 @@ def _lcmv_source_power(info, forward, noise_cov, data_cov, reg=0.05,
                           tstep=1, subject=subject)
 
 
+def _lcmv_tf_window(epochs_band, win_tmin, win_tmax, forward, noise_cov,
+                    reg, label, pick_ori, rank, weight_norm, verbose):
+    """Compute LCMV source power in a single time-frequency window."""
+    # Counteracts unsafe floating point arithmetic ensuring all
+    # relevant samples will be taken into account when selecting
+    # data in time windows
+    win_tmin = win_tmin - 1e-10
+    win_tmax = win_tmax + 1e-10
+
+    # Calculating data covariance from filtered epochs in current
+    # time window
+    data_cov = compute_covariance(epochs_band, tmin=win_tmin, tmax=win_tmax,
+                                  verbose=verbose)
+    return _lcmv_source_power(epochs_band.info, forward, noise_cov,
+                              data_cov, reg=reg, label=label,
+                              pick_ori=pick_ori, rank=rank,
+                              weight_norm=weight_norm, verbose=verbose)
+
+
 @verbose
 def tf_lcmv(epochs, forward, noise_covs, tmin, tmax, tstep, win_lengths,
             freq_bins, subtract_evoked=False, reg=0.05, label=None,
@@ -525,8 +546,12 @@ def tf_lcmv(epochs, forward, noise_covs, tmin, tmax, tstep, win_lengths,
         free orientation, a vector beamformer is computed, combining the output
         for all source orientations.
     n_jobs : int | str
-        Number of jobs to run in parallel.
-        Can be 'cuda' if ``cupy`` is installed properly.
+        Number of jobs to run in parallel. This is used for band-pass
+        filtering, where it can be 'cuda' if ``cupy`` is installed properly,
+        and to compute the beamformers of the time windows of each frequency
+        bin in parallel. Each job needs the band-pass filtered epochs; to
+        share them between jobs through memory mapping instead of copying
+        them, set ``MNE_CACHE_DIR`` (see :func:`mne.set_cache_dir`).
     rank : int | None | 'full'
         This controls the effective rank of the covariance matrix when
         computing the inverse. The rank can be set explicitly by specifying an
@@ -599,9 +624,7 @@ def tf_lcmv(epochs, forward, noise_covs, tmin, tmax, tstep, win_lengths,
     # Make sure epochs.events contains only good events:
     epochs.drop_bad()
 
-    # Multiplying by 1e3 to avoid numerical issues, e.g. 0.3 // 0.05 == 5
-    n_time_steps = int(((tmax - tmin) * 1e3) // (tstep * 1e3))
-
+    tdelta = epochs.times[-1] - epochs.times[-2]
     sol_final = []
     for (l_freq, h_freq), win_length, noise_cov in \
             zip(freq_bins, win_lengths, noise_covs):
@@ -620,60 +643,29 @@ def tf_lcmv(epochs, forward, noise_covs, tmin, tmax, tstep, win_lengths,
         if subtract_evoked:
             epochs_band.subtract_evoked()
 
-        sol_single = []
-        sol_overlap = []
-        for i_time in range(n_time_steps):
-            win_tmin = tmin + i_time * tstep
-            win_tmax = win_tmin + win_length
-
-            # If in the last step the last time point was not covered in
-            # previous steps and will not be covered now, a solution needs to
-            # be calculated for an additional time window
-            if i_time == n_time_steps - 1 and win_tmax - tstep < tmax and\
-               win_tmax >= tmax + (epochs.times[-1] - epochs.times[-2]):
-                warn('Adding a time window to cover last time points')
-                win_tmin = tmax - win_length
-                win_tmax = tmax
-
-            if win_tmax < tmax + (epochs.times[-1] - epochs.times[-2]):
-                logger.info('Computing time-frequency LCMV beamformer for '
-                            'time window %d to %d ms, in frequency range '
-                            '%d to %d Hz' % (win_tmin * 1e3, win_tmax * 1e3,
-                                             l_freq, h_freq))
-
-                # Counteracts unsafe floating point arithmetic ensuring all
-                # relevant samples will be taken into account when selecting
-                # data in time windows
-                win_tmin = win_tmin - 1e-10
-                win_tmax = win_tmax + 1e-10
-
-                # Calculating data covariance from filtered epochs in current
-                # time window
-                data_cov = compute_covariance(epochs_band, tmin=win_tmin,
-                                              tmax=win_tmax)
-
-                stc = _lcmv_source_power(epochs_band.info, forward, noise_cov,
-                                         data_cov, reg=reg, label=label,
-                                         pick_ori=pick_ori, rank=rank,
-                                         weight_norm=weight_norm,
-                                         verbose=verbose)
-                sol_single.append(stc.data[:, 0])
-
-            # Average over all time windows that contain the current time
-            # point, which is the current time window along with
-            # n_overlap - 1 previous ones
-            if i_time - n_overlap < 0:
-                curr_sol = np.mean(sol_single[0:i_time + 1], axis=0)
-            else:
-                curr_sol = np.mean(sol_single[i_time - n_overlap + 1:
-                                              i_time + 1], axis=0)
-
-            # The final result for the current time point in the current
-            # frequency bin
-            sol_overlap.append(curr_sol)
+        n_time_steps, windows = _tf_windows(tmin, tmax, tstep, win_length,
+                                            tdelta)
+        for win_tmin, win_tmax in windows:
+            logger.info('Computing time-frequency LCMV beamformer for '
+                        'time window %d to %d ms, in frequency range '
+                        '%d to %d Hz' % (win_tmin * 1e3, win_tmax * 1e3,
+                                         l_freq, h_freq))
+
+        # The time windows are independent, so they are distributed across
+        # jobs (the band-passed epochs are memmapped if MNE_CACHE_DIR is set)
+        parallel, p_fun, _ = parallel_func(
+            _lcmv_tf_window, 1 if n_jobs == 'cuda' else n_jobs)
+        stcs = parallel(p_fun(epochs_band, win_tmin, win_tmax, forward,
+                              noise_cov, reg, label, pick_ori, rank,
+                              weight_norm, verbose)
+                        for win_tmin, win_tmax in windows)
+        sol_single = [stc.data[:, 0] for stc in stcs]
+        stc = stcs[-1]
+        del epochs_band, stcs
 
         # Gathering solutions for all time points for current frequency bin
-        sol_final.append(sol_overlap)
+        sol_final.append(_tf_average_windows(sol_single, n_time_steps,
+                                             n_overlap))
 
     sol_final = np.array(sol_final)
 
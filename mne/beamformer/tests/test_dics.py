@@ -493,6 +493,13 @@ def test_tf_dics():
     # Comparing tf_dics results with dics_source_power results
     assert_allclose(stcs[1].data, np.array(source_power).squeeze().T, atol=0)
 
+    # Time windows can be computed in parallel
+    stcs_par = tf_dics(epochs, fwd_surf, None, tmin, tmax, tstep, win_lengths,
+                       mode='cwt_morlet', frequencies=frequencies, decim=10,
+                       reg=reg, label=label, n_jobs=2)
+    for stc, stc_par in zip(stcs, stcs_par):
+        assert_allclose(stc_par.data, stc.data)
+
     # Test using noise csds. We're going to use identity matrices. That way,
     # since we're using unit-noise-gain weight normalization, there should be
     # no effect.
@@ -15,10 +15,13 @@ from mne.beamformer import (make_lcmv, apply_lcmv, apply_lcmv_epochs,
                             apply_lcmv_raw, tf_lcmv, Beamformer,
                             read_beamformer)
 from mne.beamformer._lcmv import _lcmv_source_power
+from mne.beamformer._compute_beamformer import (_reduce_rank_pinv,
+                                                _pinv_stacked)
 from mne.io.compensator import set_current_comp
 from mne.minimum_norm import make_inverse_operator, apply_inverse
 from mne.simulation import simulate_evoked
-from mne.utils import run_tests_if_main, object_diff, requires_h5py
+from mne.utils import (run_tests_if_main, object_diff, requires_h5py,
+                       _reg_pinv)
 
 
 data_path = testing.data_path(download=False)
@@ -592,6 +595,13 @@ def test_tf_lcmv():
     # Comparing tf_lcmv results with _lcmv_source_power results
     assert_array_almost_equal(stc.data[:, 2], source_power[:, 0])
 
+    # Time windows can be computed in parallel
+    stcs_par = tf_lcmv(epochs, forward, noise_covs, tmin, tmax, tstep,
+                       win_lengths, freq_bins, reg=reg, label=label, raw=raw,
+                       n_jobs=2)
+    for stc_ser, stc_par in zip(stcs, stcs_par):
+        assert_allclose(stc_par.data, stc_ser.data)
+
     # Test if using unsupported max-power orientation is detected
     pytest.raises(ValueError, tf_lcmv, epochs, forward, noise_covs, tmin, tmax,
                   tstep, win_lengths, freq_bins=freq_bins,
@@ -798,4 +808,20 @@ def test_localization_bias_free(bias_params_free, reg, pick_ori, weight_norm,
     assert lower <= perc <= upper
 
 
+def test_stacked_pinv():
+    """Test stacked pseudo-inverses used to compute the filters."""
+    rng = np.random.RandomState(0)
+    x = rng.randn(10, 3, 3)
+    x = np.matmul(x, x.transpose(0, 2, 1))  # symmetric
+    x_inv = _reduce_rank_pinv(x)
+    for xx, xx_inv in zip(x, x_inv):
+        assert_allclose(xx_inv, _reg_pinv(xx, rank=2)[0])
+    x = rng.randn(10, 3, 3) + 1j * rng.randn(10, 3, 3)
+    x[:, 2] *= 1e-3  # make the cutoff matter
+    x_inv = _pinv_stacked(x, 0.1)
+    for xx, xx_inv in zip(x, x_inv):
+        assert_allclose(xx_inv, np.linalg.pinv(xx, 0.1), atol=1e-12)
+    assert np.linalg.matrix_rank(x_inv[0]) == 2
+
+
 run_tests_if_main()
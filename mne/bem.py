@@ -13,7 +13,7 @@ import shutil
 from copy import deepcopy
 
 import numpy as np
-from scipy import linalg
+from scipy import linalg, sparse
 
 from .io.constants import FIFF, FWD
 from .io.write import (start_file, start_block, write_float, write_int,
@@ -22,13 +22,13 @@ from .io.write import (start_file, start_block, write_float, write_int,
 from .io.tag import find_tag
 from .io.tree import dir_tree_find
 from .io.open import fiff_open
+from .parallel import parallel_func
 from .surface import (read_surface, write_surface, complete_surface_info,
                       _compute_nearest, _get_ico_surface, read_tri,
-                      _fast_cross_nd_sum, _get_solids)
+                      fast_cross_3d, _get_solids)
 from .transforms import _ensure_trans, apply_trans
 from .utils import (verbose, logger, run_subprocess, get_subjects_dir, warn,
                     _pl, _validate_type, _TempDir)
-from .fixes import einsum
 
 
 # ############################################################################
@@ -72,133 +72,213 @@ class ConductorModel(dict):
         return None if len(self['layers']) == 0 else self['layers'][-1]['rad']
 
 
-def _calc_beta(rk, rk_norm, rk1, rk1_norm):
+def _dot_planes(a, b):
+    """Compute the dot products of (3, ...) arrays."""
+    return a[0] * b[0] + a[1] * b[1] + a[2] * b[2]
+
+
+def _calc_beta(rk_dot, rk_norm, rk1_norm, size):
     """Compute coefficients for calculating the magic vector omega."""
-    rkk1 = rk1[0] - rk[0]
-    size = np.linalg.norm(rkk1)
-    rkk1 /= size
-    num = rk_norm + np.dot(rk, rkk1)
-    den = rk1_norm + np.dot(rk1, rkk1)
-    res = np.log(num / den) / size
+    # rk_dot is the projection of rk onto the unit edge vector rk1 - rk, and
+    # the projection of rk1 is just rk_dot + size
+    num = rk_norm + rk_dot
+    den = rk1_norm + rk_dot
+    den += size
+    res = np.log(num / den)
+    res /= size
     return res
 
 
 def _lin_pot_coeff(fros, tri_rr, tri_nn, tri_area):
-    """Compute the linear potential matrix element computations."""
-    omega = np.zeros((len(fros), 3))
+    """Compute the linear potential matrix element computations.
+
+    Parameters
+    ----------
+    fros : ndarray, shape (n_fro, 3)
+        The field points.
+    tri_rr : ndarray, shape (n_tri, 3, 3)
+        The vertex positions of each triangle.
+    tri_nn : ndarray, shape (n_tri, 3)
+        The triangle normals.
+    tri_area : ndarray, shape (n_tri,)
+        The triangle areas.
 
+    Returns
+    -------
+    omega : ndarray, shape (3, n_tri, n_fro)
+        The coefficients of each triangle vertex at each field point.
+    """
     # we replicate a little bit of the _get_solids code here for speed
-    # (we need some of the intermediate values later)
-    v1 = tri_rr[np.newaxis, 0, :] - fros
-    v2 = tri_rr[np.newaxis, 1, :] - fros
-    v3 = tri_rr[np.newaxis, 2, :] - fros
-    triples = _fast_cross_nd_sum(v1, v2, v3)
-    l1 = np.linalg.norm(v1, axis=1)
-    l2 = np.linalg.norm(v2, axis=1)
-    l3 = np.linalg.norm(v3, axis=1)
+    # (we need some of the intermediate values later). X/Y/Z go first so
+    # that each component is a contiguous (n_tri, n_fro) plane.
+    # The differences between v1, v2, and v3 are the triangle edges,
+    # which do not depend on the field point, so everything that only
+    # involves the edges is computed once per triangle.
+    v1, v2, v3 = (tri_rr.transpose(1, 2, 0)[..., np.newaxis] -
+                  fros.T[:, np.newaxis])
+    edges = [tri_rr[:, 1] - tri_rr[:, 0],  # v1 -> v2
+             tri_rr[:, 2] - tri_rr[:, 1],  # v2 -> v3
+             tri_rr[:, 0] - tri_rr[:, 2]]  # v3 -> v1
+    sizes = [np.linalg.norm(edge, axis=1, keepdims=True) for edge in edges]
+    # (v1 x v2) . v3 == v1 . (e12 x e13)
+    triples = _dot_planes(
+        v1, fast_cross_3d(edges[0], -edges[2]).T[..., np.newaxis])
+    l1 = np.sqrt(_dot_planes(v1, v1))
+    l2 = np.sqrt(_dot_planes(v2, v2))
+    l3 = np.sqrt(_dot_planes(v3, v3))
+    # projections of the start of each edge onto it
+    dots = [_dot_planes(v, (edge / size).T[..., np.newaxis])
+            for v, edge, size in zip((v1, v2, v3), edges, sizes)]
+    # v1 . v2 == l1 ** 2 + v1 . e12, etc.
     ss = l1 * l2 * l3
-    ss += einsum('ij,ij,i->i', v1, v2, l3)
-    ss += einsum('ij,ij,i->i', v1, v3, l2)
-    ss += einsum('ij,ij,i->i', v2, v3, l1)
+    ss += (l1 * l1 + dots[0] * sizes[0]) * l3
+    ss += (l3 * l3 + dots[2] * sizes[2]) * l2
+    ss += (l2 * l2 + dots[1] * sizes[1]) * l1
     solids = np.arctan2(triples, ss)
 
     # We *could* subselect the good points from v1, v2, v3, triples, solids,
     # l1, l2, and l3, but there are *very* few bad points. So instead we do
     # some unnecessary calculations, and then omit them from the final
     # solution. These three lines ensure we don't get invalid values in
-    # _calc_beta.
+    # _calc_beta. Field points that are triangle vertices are always bad
+    # (solids is only zero up to rounding for them).
     bad_mask = np.abs(solids) < np.pi / 1e6
+    bad_mask |= (l1 == 0) | (l2 == 0) | (l3 == 0)
     l1[bad_mask] = 1.
     l2[bad_mask] = 1.
     l3[bad_mask] = 1.
 
-    # Calculate the magic vector vec_omega
-    beta = [_calc_beta(v1, l1, v2, l2)[:, np.newaxis],
-            _calc_beta(v2, l2, v3, l3)[:, np.newaxis],
-            _calc_beta(v3, l3, v1, l1)[:, np.newaxis]]
-    vec_omega = (beta[2] - beta[0]) * v1
-    vec_omega += (beta[0] - beta[1]) * v2
-    vec_omega += (beta[1] - beta[2]) * v3
+    # Calculate the magic vector vec_omega, which is
+    # (beta[2] - beta[0]) * v1 + (beta[0] - beta[1]) * v2 +
+    # (beta[1] - beta[2]) * v3 == sum(beta * edges)
+    beta = [_calc_beta(dots[0], l1, l2, sizes[0]),
+            _calc_beta(dots[1], l2, l3, sizes[1]),
+            _calc_beta(dots[2], l3, l1, sizes[2])]
 
-    area2 = 2.0 * tri_area
+    area2 = 2.0 * tri_area[:, np.newaxis]
     n2 = 1.0 / (area2 * area2)
     # leave omega = 0 otherwise
     # Put it all together...
     yys = [v1, v2, v3]
-    idx = [0, 1, 2, 0, 2]
+    omega = np.empty((3,) + solids.shape)
+    solids *= 2. * area2
+    for b in beta:
+        b *= triples
     for k in range(3):
-        diff = yys[idx[k - 1]] - yys[idx[k + 1]]
-        zdots = _fast_cross_nd_sum(yys[idx[k + 1]], yys[idx[k - 1]], tri_nn)
-        omega[:, k] = -n2 * (area2 * zdots * 2. * solids -
-                             triples * (diff * vec_omega).sum(axis=-1))
+        # the edge opposite to vertex k, i.e., yys[k - 1] - yys[k + 1]
+        diff = edges[(k + 1) % 3]
+        # (yys[k + 1] x yys[k - 1]) . tri_nn == yys[k + 1] . (diff x tri_nn)
+        zdots = _dot_planes(yys[(k + 1) % 3],
+                            fast_cross_3d(diff, tri_nn).T[..., np.newaxis])
+        zdots *= solids
+        # triples * (diff . vec_omega)
+        zdots -= _dot_planes(beta, [np.sum(diff * edge, axis=1,
+                                           keepdims=True)
+                                    for edge in edges])
+        zdots *= -n2
+        omega[k] = zdots
     # omit the bad points from the solution
-    omega[bad_mask] = 0.
+    omega[:, bad_mask] = 0.
     return omega
 
 
 def _correct_auto_elements(surf, mat):
     """Improve auto-element approximation."""
     pi2 = 2.0 * np.pi
-    tris_flat = surf['tris'].ravel()
+    tris = surf['tris']
     misses = pi2 - mat.sum(axis=1)
-    for j, miss in enumerate(misses):
-        # How much is missing?
-        n_memb = len(surf['neighbor_tri'][j])
-        # The node itself receives one half
-        mat[j, j] = miss / 2.0
-        # The rest is divided evenly among the member nodes...
-        miss /= (4.0 * n_memb)
-        members = np.where(j == tris_flat)[0]
-        mods = members % 3
-        offsets = np.array([[1, 2], [-1, 1], [-1, -2]])
-        tri_1 = members + offsets[mods, 0]
-        tri_2 = members + offsets[mods, 1]
-        for t1, t2 in zip(tri_1, tri_2):
-            mat[j, tris_flat[t1]] += miss
-            mat[j, tris_flat[t2]] += miss
-    return
+    # The node itself receives one half
+    mat.flat[::len(mat) + 1] = misses / 2.0
+    # The rest is divided evenly among the member nodes...
+    n_memb = np.array([len(n) for n in surf['neighbor_tri']])
+    misses /= (4.0 * n_memb)
+    # ... i.e., for each triangle each vertex gets added to the other two
+    for k in range(3):
+        for other in ((k + 1) % 3, (k + 2) % 3):
+            np.add.at(mat, (tris[:, k], tris[:, other]), misses[tris[:, k]])
 
 
-def _fwd_bem_lin_pot_coeff(surfs):
+def _fwd_bem_lin_pot_coeff(surfs, n_jobs=1):
     """Calculate the coefficients for linear collocation approach."""
     # taken from fwd_bem_linear_collocation.c
     nps = [surf['np'] for surf in surfs]
     np_tot = sum(nps)
     coeff = np.zeros((np_tot, np_tot))
     offsets = np.cumsum(np.concatenate(([0], nps)))
+    parallel, p_fun, _ = parallel_func(_do_lin_pot_coeff, n_jobs)
     for si_1, surf1 in enumerate(surfs):
         rr_ord = np.arange(nps[si_1])
         for si_2, surf2 in enumerate(surfs):
             logger.info("        %s (%d) -> %s (%d) ..." %
                         (_bem_explain_surface(surf1['id']), nps[si_1],
                          _bem_explain_surface(surf2['id']), nps[si_2]))
-            tri_rr = surf2['rr'][surf2['tris']]
-            tri_nn = surf2['tri_nn']
-            tri_area = surf2['tri_area']
+            # No contribution from a triangle that this vertex belongs to
             submat = coeff[offsets[si_1]:offsets[si_1 + 1],
                            offsets[si_2]:offsets[si_2 + 1]]  # view
-            for k in range(surf2['ntri']):
-                tri = surf2['tris'][k]
-                if si_1 == si_2:
-                    skip_idx = ((rr_ord == tri[0]) |
-                                (rr_ord == tri[1]) |
-                                (rr_ord == tri[2]))
-                else:
-                    skip_idx = list()
-                # No contribution from a triangle that
-                # this vertex belongs to
-                # if sidx1 == sidx2 and (tri == j).any():
-                #     continue
-                # Otherwise do the hard job
-                coeffs = _lin_pot_coeff(surf1['rr'], tri_rr[k], tri_nn[k],
-                                        tri_area[k])
-                coeffs[skip_idx] = 0.
-                submat[:, tri] -= coeffs
+            submat[:] = np.concatenate(parallel(
+                p_fun(surf1['rr'][idx], idx if si_1 == si_2 else None, surf2)
+                for idx in np.array_split(rr_ord, n_jobs)))
             if si_1 == si_2:
                 _correct_auto_elements(surf1, submat)
     return coeff
 
 
+def _do_lin_pot_coeff(fros, fro_idx, surf, max_bytes=16e6):
+    """Compute linear potential coefficients (parallel-friendly).
+
+    Parameters
+    ----------
+    fros : ndarray, shape (n_fro, 3)
+        The field points.
+    fro_idx : ndarray, shape (n_fro,) | None
+        The vertex numbers of the field points if they are on ``surf``,
+        their coefficients for the triangles they belong to are omitted.
+    surf : dict
+        The surface.
+    max_bytes : float
+        Approximate size of the temporary arrays, the triangles are
+        processed in blocks to stay below it.
+
+    Returns
+    -------
+    coeff : ndarray, shape (n_fro, n_vertices)
+        The coefficients.
+    """
+    # The following is equivalent to:
+    # for tri, rr, nn, area in zip(surf['tris'], tri_rr, surf['tri_nn'],
+    #                              surf['tri_area']):
+    #     coeffs = _lin_pot_coeff(fros, rr[np.newaxis], nn[np.newaxis],
+    #                             area[np.newaxis])[:, 0].T
+    #     coeffs[(fro_idx[:, np.newaxis] == tri).any(-1)] = 0.
+    #     coeff[:, tri] -= coeffs
+    coeff = np.zeros((len(fros), surf['np']))
+    tri_rr = surf['rr'][surf['tris']]
+    if fro_idx is not None:
+        fro_pos = np.full(surf['np'], -1)
+        fro_pos[fro_idx] = np.arange(len(fro_idx))
+    # _lin_pot_coeff holds on the order of 40 floats per field
+    # point and triangle at once
+    n_block = max(int(max_bytes // (40 * 8 * max(len(fros), 1))), 1)
+    for start in range(0, surf['ntri'], n_block):
+        sl = slice(start, start + n_block)
+        tris = surf['tris'][sl]
+        omega = _lin_pot_coeff(fros, tri_rr[sl], surf['tri_nn'][sl],
+                               surf['tri_area'][sl])
+        if fro_idx is not None:
+            for pos in fro_pos[tris].T:
+                use = np.where(pos >= 0)[0]
+                omega[:, use, pos[use]] = 0.
+        # scatter the contributions of all triangle vertices at once into
+        # the columns of the vertices of this block
+        verts, cols = np.unique(tris.T, return_inverse=True)
+        scatter = sparse.csr_matrix(
+            (np.ones(tris.size), cols.ravel(), np.arange(tris.size + 1)),
+            shape=(tris.size, len(verts))).T
+        coeff[:, verts] -= scatter.dot(
+            omega.reshape(tris.size, len(fros))).T
+    return coeff
+
+
 def _fwd_bem_multi_solution(solids, gamma, nps):
     """Do multi surface solution.
 
@@ -251,7 +331,7 @@ def _fwd_bem_ip_modify_solution(solution, ip_solution, ip_mult, n_tri):
     return
 
 
-def _fwd_bem_linear_collocation_solution(m):
+def _fwd_bem_linear_collocation_solution(m, n_jobs=1):
     """Compute the linear collocation potential solution."""
     # first, add surface geometries
     for surf in m['surfs']:
@@ -259,7 +339,7 @@ def _fwd_bem_linear_collocation_solution(m):
 
     logger.info('Computing the linear collocation solution...')
     logger.info('    Matrix coefficients...')
-    coeff = _fwd_bem_lin_pot_coeff(m['surfs'])
+    coeff = _fwd_bem_lin_pot_coeff(m['surfs'], n_jobs)
     m['nsol'] = len(coeff)
     logger.info("    Inverting the coefficient matrix...")
     nps = [surf['np'] for surf in m['surfs']]
@@ -269,7 +349,7 @@ def _fwd_bem_linear_collocation_solution(m):
         if ip_mult <= FWD.BEM_IP_APPROACH_LIMIT:
             logger.info('IP approach required...')
             logger.info('    Matrix coefficients (homog)...')
-            coeff = _fwd_bem_lin_pot_coeff([m['surfs'][-1]])
+            coeff = _fwd_bem_lin_pot_coeff([m['surfs'][-1]], n_jobs)
             logger.info('    Inverting the coefficient matrix (homog)...')
             ip_solution = _fwd_bem_homog_solution(coeff,
                                                   [m['surfs'][-1]['np']])
@@ -282,13 +362,18 @@ def _fwd_bem_linear_collocation_solution(m):
 
 
 @verbose
-def make_bem_solution(surfs, verbose=None):
+def make_bem_solution(surfs, n_jobs=1, verbose=None):
     """Create a BEM solution using the linear collocation approach.
 
     Parameters
     ----------
     surfs : list of dict
         The BEM surfaces to use (`from make_bem_model`)
+    n_jobs : int
+        Number of jobs to run in parallel when computing the matrix
+        coefficients.
+
+        .. versionadded:: 0.18
     %(verbose)s
 
     Returns
@@ -322,7 +407,7 @@ def make_bem_solution(surfs, verbose=None):
     else:
         raise RuntimeError('Only 1- or 3-layer BEM computations supported')
     _check_bem_size(bem['surfs'])
-    _fwd_bem_linear_collocation_solution(bem)
+    _fwd_bem_linear_collocation_solution(bem, n_jobs)
     logger.info('BEM geometry computations complete.')
     return bem
 
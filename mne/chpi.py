@@ -45,6 +45,7 @@ from .io.ctf.trans import _make_ctf_coord_trans_set
 from .forward import (_magnetic_dipole_field_vec, _create_meg_coils,
                       _concatenate_coils)
 from .cov import make_ad_hoc_cov, compute_whitener
+from .parallel import parallel_func
 from .transforms import (apply_trans, invert_transform, _angle_between_quats,
                          quat_to_rot, rot_to_quat)
 from .utils import (verbose, logger, use_log_level, _check_fname, warn,
@@ -55,6 +56,10 @@ from .utils import (verbose, logger, use_log_level, _check_fname, warn,
 #   high-passing of data during fits
 #   parsing cHPI coil information from acq pars, then to PSD if necessary
 
+# Max. number of samples (times the number of channels) to fit cHPI
+# amplitudes for at once
+_n_fit_samples = 20000
+
 
 # ############################################################################
 # Reading from text or FIF file
@@ -611,6 +616,115 @@ def _fit_cHPI_amplitudes(raw, time_sl, hpi, fit_time, verbose=None):
     return sin_fit
 
 
+@verbose
+def _fit_all_cHPI_amplitudes(raw, fit_idxs, hpi, verbose=None):
+    """Fit cHPI amplitudes for the windows centered at each index.
+
+    This is equivalent to calling :func:`_fit_cHPI_amplitudes` for each
+    window, but full-length windows are fit together (see
+    :func:`_fit_cHPI_amplitudes_windows`) in blocks spanning up to
+    ``_n_fit_samples`` samples.
+
+    Returns
+    -------
+    fit_times : ndarray, shape (n_fits,)
+        The time of each window.
+    sin_fits : list of (ndarray, shape (n_freqs, n_channels)) or None
+        The sin amplitudes of each window, or None if it should be skipped.
+    """
+    n_window = hpi['n_window']
+    n_times = len(raw.times)
+    fit_idxs = np.array(fit_idxs, int)
+    starts = fit_idxs - n_window // 2
+    fit_times = (fit_idxs + raw.first_samp - n_window / 2.) / raw.info['sfreq']
+    is_full = (starts >= 0) & (starts + n_window <= n_times)
+    n_block = max(_n_fit_samples // n_window, 1)
+    sin_fits = list()
+    ii = 0
+    while ii < len(fit_idxs):
+        if not is_full[ii]:  # first or last windows
+            time_sl = slice(max(starts[ii], 0),
+                            min(starts[ii] + n_window, n_times))
+            sin_fits.append(_fit_cHPI_amplitudes(raw, time_sl, hpi,
+                                                 fit_times[ii]))
+            ii += 1
+            continue
+        these = np.arange(ii, min(ii + n_block, len(fit_idxs)))
+        these = these[is_full[these]]
+        ii = these[-1] + 1
+        time_sl = slice(starts[these[0]], starts[these[-1]] + n_window)
+        with use_log_level(False):
+            data = raw[hpi['meg_picks'], time_sl][0]
+            chpi_data = None
+            if hpi['hpi_pick'] is not None:
+                chpi_data = raw[hpi['hpi_pick'], time_sl][0]
+        sin_fits.extend(_fit_cHPI_amplitudes_windows(
+            data, chpi_data, starts[these] - time_sl.start, hpi,
+            fit_times[these]))
+    return fit_times, sin_fits
+
+
+def _fit_cHPI_amplitudes_windows(data, chpi_data, starts, hpi, fit_times):
+    """Fit cHPI amplitudes for full-length windows of data at once.
+
+    Parameters
+    ----------
+    data : ndarray, shape (n_channels, n_times)
+        The (calibrated) MEG data of ``hpi['meg_picks']``.
+    chpi_data : ndarray, shape (1, n_times) | None
+        The cHPI status channel data, if present.
+    starts : ndarray, shape (n_fits,)
+        The first sample of each window (of ``hpi['n_window']`` samples).
+    hpi : dict
+        The cHPI structure.
+    fit_times : ndarray, shape (n_fits,)
+        The time of each window (for logging).
+
+    Returns
+    -------
+    sin_fits : list of (ndarray, shape (n_freqs, n_channels)) or None
+        The sin amplitudes of each window, or None if it should be skipped.
+    """
+    n_freqs = hpi['n_freqs']
+    idx = starts[:, np.newaxis] + np.arange(hpi['n_window'])
+    data = data[:, idx]  # (n_channels, n_fits, n_window)
+    if chpi_data is not None:
+        ons = (np.round(chpi_data).astype(np.int64) &
+               hpi['on'][:, np.newaxis]).astype(bool)
+        n_on = np.sum(ons, axis=0)[idx].min(axis=-1)
+    else:
+        n_on = np.full(len(starts), np.inf)
+
+    # No need to detrend the data because our model has a DC term
+    X = np.matmul(data, hpi['inv_model'].T)  # (n_channels, n_fits, n_model)
+    # use SVD across all sensors to estimate the sinusoid phase
+    X_sc = np.stack((X[..., :n_freqs], X[..., n_freqs:2 * n_freqs]))
+    X_sc = X_sc.transpose(2, 3, 0, 1)  # (n_fits, n_freqs, 2, n_channels)
+    fits = np.linalg.svd(X_sc, full_matrices=False)[2][:, :, 0]
+
+    # compute amplitude correlation (for logging), protect against zero
+    gram = np.dot(hpi['model'].T, hpi['model'])
+    norm = np.einsum('ijk,ijk->ji', data, data)
+    data_diff_sq = norm - np.einsum('ijk,ijk->ji', np.matmul(X, gram), X)
+    norm_sum = norm.sum(-1)
+    norm_sum[norm_sum == 0] = np.inf
+    norm[norm == 0] = np.inf
+    g_sin = 1 - data_diff_sq.sum(-1) / norm_sum
+    g_chan = 1 - data_diff_sq / norm
+    sin_fits = list()
+    for fi, fit_time in enumerate(fit_times):
+        if not n_on[fi] >= 3:
+            logger.info(_time_prefix(fit_time) + '%s < 3 HPI coils turned on, '
+                        'skipping fit' % (n_on[fi],))
+            sin_fits.append(None)
+            continue
+        logger.debug('    HPI amplitude correlation %0.3f: %0.3f '
+                     '(%s chnls > 0.95)' % (fit_time, g_sin[fi],
+                                            (g_chan[fi] > 0.95).sum()))
+        sin_fits.append(fits[fi])
+    return sin_fits
+
+
 @verbose
 def _fit_device_hpi_positions(raw, t_win=None, initial_dev_rrs=None,
                               too_close='raise', verbose=None):
@@ -673,11 +787,89 @@ def _fit_device_hpi_positions(raw, t_win=None, initial_dev_rrs=None,
     return coil_dev_rrs, coil_g
 
 
+def _check_chpi_refit(sin_fit, fit_time, last, t_step_max):
+    """Check if the cHPI amplitudes have changed enough to refit.
+
+    The signs of ``sin_fit`` are aligned to ``last['sin_fit']`` in place, and
+    ``last['sin_fit']`` is updated when a refit is needed. ``last['fit_time']``
+    is the time of the last accepted fit, which is updated by the caller.
+    """
+    # check if data has sufficiently changed
+    if last['sin_fit'] is not None:  # first iteration
+        # The sign of our fits is arbitrary
+        flips = np.sign((sin_fit * last['sin_fit']).sum(-1, keepdims=True))
+        sin_fit *= flips
+        corr = np.corrcoef(sin_fit.ravel(), last['sin_fit'].ravel())[0, 1]
+        # check to see if we need to continue
+        if fit_time - last['fit_time'] <= t_step_max - 1e-7 and \
+                corr * corr > 0.98:
+            # don't need to refit data
+            return False
+    last['sin_fit'] = sin_fit
+    return True
+
+
+def _fit_chpi_windows(sin_fits, coil_dev_rrs, quat, hpi, hpi_dig_head_rrs,
+                      hpi_coil_dists, dist_limit, gof_limit, use_distances,
+                      too_close):
+    """Fit coil and head positions for consecutive time windows.
+
+    Each window is warm-started from the last accepted fit.
+    """
+    from scipy.spatial.distance import cdist
+    outs = list()
+    for sin_fit in sin_fits:
+        #
+        # 2. Fit magnetic dipole for each coil to obtain coil positions
+        #    in device coordinates
+        #
+        coil_fits = [_fit_magnetic_dipole(f, pos, hpi['coils'], hpi['scale'],
+                                          hpi['method'], too_close)
+                     for f, pos in zip(sin_fit, coil_dev_rrs)]
+        this_coil_dev_rrs = np.array([o[0] for o in coil_fits])
+        g_coils = [o[1] for o in coil_fits]
+
+        # filter coil fits based on the correspodnace to digitization geometry
+        use_mask = np.ones(hpi['n_freqs'], bool)
+        good = True
+        if use_distances:
+            these_dists = cdist(this_coil_dev_rrs, this_coil_dev_rrs)
+            these_dists = np.abs(hpi_coil_dists - these_dists)
+            # there is probably a better algorithm for finding the bad ones...
+            good = False
+            while not good:
+                d = these_dists[use_mask][:, use_mask]
+                d_bad = (d > dist_limit)
+                good = not d_bad.any()
+                if not good:
+                    if use_mask.sum() == 2:
+                        use_mask[:] = False
+                        break  # failure
+                    # exclude next worst point
+                    badness = (d * d_bad).sum(axis=0)
+                    exclude_coils = np.where(use_mask)[0][np.argmax(badness)]
+                    use_mask[exclude_coils] = False
+            good = use_mask.sum() >= 3
+        this_quat = g = None
+        if good:
+            #
+            # 3. Fit the head translation and rotation params (minimize error
+            #    between coil positions and the head coil digitization
+            #    positions)
+            #
+            this_quat, g = _fit_chpi_quat(this_coil_dev_rrs[use_mask],
+                                          hpi_dig_head_rrs[use_mask], quat)
+            if g >= gof_limit:
+                coil_dev_rrs, quat = this_coil_dev_rrs, this_quat
+        outs.append((this_coil_dev_rrs, g_coils, use_mask, this_quat, g))
+    return outs
+
+
 @verbose
 def _calculate_chpi_positions(raw, t_step_min=0.1, t_step_max=10.,
                               t_window=0.2, dist_limit=0.005, gof_limit=0.98,
                               use_distances=True, too_close='raise',
-                              verbose=None):
+                              n_jobs=1, verbose=None):
     """Calculate head positions using cHPI coils.
 
     Parameters
@@ -700,6 +892,12 @@ def _calculate_chpi_positions(raw, t_step_min=0.1, t_step_max=10.,
     too_close : str
         How to handle HPI positions too close to the sensors,
         can be 'raise', 'warning', or 'info'.
+    n_jobs : int
+        Number of jobs to run in parallel. If more than one, the time windows
+        to fit are determined beforehand from the cHPI amplitudes (so that
+        rejected fits also count toward ``t_step_max``) and split into
+        ``n_jobs`` contiguous chunks, each of which starts from the initial
+        head position rather than the last fit of the previous chunk.
     %(verbose)s
 
     Returns
@@ -750,85 +948,56 @@ def _calculate_chpi_positions(raw, t_step_min=0.1, t_step_max=10.,
     pos_0 = None
 
     hpi['n_freqs'] = len(hpi['freqs'])
-    for midpt in fit_idxs:
+    #
+    # 0-1. Fit amplitudes for each channel from each of the N cHPI sinusoids
+    #      in all time windows, and determine which windows need to be fit
+    #
+    fit_times, sin_fits = _fit_all_cHPI_amplitudes(raw, fit_idxs, hpi)
+    fit_args = (hpi, hpi_dig_head_rrs, hpi_coil_dists, dist_limit, gof_limit,
+                use_distances, too_close)
+    parallel, p_fun, n_jobs = parallel_func(_fit_chpi_windows, n_jobs)
+    if n_jobs == 1:
         #
-        # 0. determine samples to fit.
+        # 2-3. Fit the coil positions and head position in each window,
+        #      warm-started from the last accepted fit
         #
-        fit_time = (midpt + raw.first_samp - hpi['n_window'] / 2.) /\
-            raw.info['sfreq']
-
-        time_sl = midpt - hpi['n_window'] // 2
-        time_sl = slice(max(time_sl, 0),
-                        min(time_sl + hpi['n_window'], len(raw.times)))
-
+        def _gen_fits():
+            for fit_time, sin_fit in zip(fit_times, sin_fits):
+                # skip this window if bad
+                # logging has already been done! Maybe turn this into an
+                # Exception
+                if sin_fit is not None and _check_chpi_refit(
+                        sin_fit, fit_time, last, t_step_max):
+                    yield fit_time, _fit_chpi_windows(
+                        [sin_fit], last['coil_dev_rrs'], last['quat'],
+                        *fit_args)[0]
+        fits = _gen_fits()  # consumed one window at a time below
+    else:
+        use_fits = list()
+        for fit_time, sin_fit in zip(fit_times, sin_fits):
+            if sin_fit is not None and _check_chpi_refit(
+                    sin_fit, fit_time, last, t_step_max):
+                last['fit_time'] = fit_time
+                use_fits.append((fit_time, sin_fit))
         #
-        # 1. Fit amplitudes for each channel from each of the N cHPI sinusoids
+        # 2-3. Fit the coil positions and head position in each window, in
+        #      contiguous chunks that are each warm-started from the initial
+        #      fit
         #
-        sin_fit = _fit_cHPI_amplitudes(raw, time_sl, hpi, fit_time)
-
-        # skip this window if bad
-        # logging has already been done! Maybe turn this into an Exception
-        if sin_fit is None:
+        chunks = [chunk for chunk in np.array_split(np.arange(len(use_fits)),
+                                                    n_jobs) if len(chunk) > 0]
+        outs = parallel(p_fun([use_fits[ii][1] for ii in chunk],
+                              last['coil_dev_rrs'], last['quat'], *fit_args)
+                        for chunk in chunks)
+        outs = [out for chunk_outs in outs for out in chunk_outs]
+        fits = zip([fit_time for fit_time, _ in use_fits], outs)
+    for fit_time, out in fits:
+        this_coil_dev_rrs, g_coils, use_mask, this_quat, g = out
+        if this_quat is None:
+            warn(_time_prefix(fit_time) + '%s/%s good HPI fits, '
+                 'cannot determine the transformation!'
+                 % (use_mask.sum(), hpi['n_freqs']))
             continue
-
-        # check if data has sufficiently changed
-        if last['sin_fit'] is not None:  # first iteration
-            # The sign of our fits is arbitrary
-            flips = np.sign((sin_fit * last['sin_fit']).sum(-1, keepdims=True))
-            sin_fit *= flips
-            corr = np.corrcoef(sin_fit.ravel(), last['sin_fit'].ravel())[0, 1]
-            # check to see if we need to continue
-            if fit_time - last['fit_time'] <= t_step_max - 1e-7 and \
-                    corr * corr > 0.98:
-                # don't need to refit data
-                continue
-
-        # update 'last' sin_fit *before* inplace sign mult
-        last['sin_fit'] = sin_fit.copy()
-
-        #
-        # 2. Fit magnetic dipole for each coil to obtain coil positions
-        #    in device coordinates
-        #
-        outs = [_fit_magnetic_dipole(f, pos, hpi['coils'], hpi['scale'],
-                                     hpi['method'], too_close)
-                for f, pos in zip(sin_fit, last['coil_dev_rrs'])]
-        this_coil_dev_rrs = np.array([o[0] for o in outs])
-        g_coils = [o[1] for o in outs]
-
-        # filter coil fits based on the correspodnace to digitization geometry
-        use_mask = np.ones(hpi['n_freqs'], bool)
-        if use_distances:
-            these_dists = cdist(this_coil_dev_rrs, this_coil_dev_rrs)
-            these_dists = np.abs(hpi_coil_dists - these_dists)
-            # there is probably a better algorithm for finding the bad ones...
-            good = False
-            while not good:
-                d = these_dists[use_mask][:, use_mask]
-                d_bad = (d > dist_limit)
-                good = not d_bad.any()
-                if not good:
-                    if use_mask.sum() == 2:
-                        use_mask[:] = False
-                        break  # failure
-                    # exclude next worst point
-                    badness = (d * d_bad).sum(axis=0)
-                    exclude_coils = np.where(use_mask)[0][np.argmax(badness)]
-                    use_mask[exclude_coils] = False
-            good = use_mask.sum() >= 3
-            if not good:
-                warn(_time_prefix(fit_time) + '%s/%s good HPI fits, '
-                     'cannot determine the transformation!'
-                     % (use_mask.sum(), hpi['n_freqs']))
-                continue
-
-        #
-        # 3. Fit the head translation and rotation params (minimize error
-        #    between coil positions and the head coil digitization positions)
-        #
-        this_quat, g = _fit_chpi_quat(this_coil_dev_rrs[use_mask],
-                                      hpi_dig_head_rrs[use_mask],
-                                      last['quat'])
         if g < gof_limit:
             logger.info(_time_prefix(fit_time) +
                         'Bad coil fit! (g=%7.3f)' % (g,))
@@ -973,22 +1142,11 @@ def _calculate_chpi_coil_locs(raw, t_step_min=0.1, t_step_max=10.,
                 % (len(fit_idxs), t_end - t_begin))
 
     hpi['n_freqs'] = len(hpi['freqs'])
-    for midpt in fit_idxs:
-        #
-        # 0. determine samples to fit.
-        #
-        fit_time = (midpt + raw.first_samp - hpi['n_window'] / 2.) /\
-            raw.info['sfreq']
-
-        time_sl = midpt - hpi['n_window'] // 2
-        time_sl = slice(max(time_sl, 0),
-                        min(time_sl + hpi['n_window'], len(raw.times)))
-
-        #
-        # 1. Fit amplitudes for each channel from each of the N cHPI sinusoids
-        #
-        sin_fit = _fit_cHPI_amplitudes(raw, time_sl, hpi, fit_time)
-
+    #
+    # 0-1. Fit amplitudes for each channel from each of the N cHPI sinusoids
+    #
+    fit_times, sin_fits = _fit_all_cHPI_amplitudes(raw, fit_idxs, hpi)
+    for fit_time, sin_fit in zip(fit_times, sin_fits):
         # skip this window if bad
         # logging has already been done! Maybe turn this into an Exception
         if sin_fit is None:
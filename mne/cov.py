@@ -34,8 +34,10 @@ from .event import make_fixed_length_events
 from .rank import compute_rank
 from .utils import (check_fname, logger, verbose, check_version, _time_mask,
                     warn, copy_function_doc_to_method_doc, _pl,
-                    _undo_scaling_cov, _scaled_array, _validate_type,
+                    _undo_scaling_cov, _apply_scaling_cov,
+                    _scaled_array, _validate_type,
                     _check_option)
+from .parallel import parallel_func
 from . import viz
 
 from .fixes import BaseEstimator, EmpiricalCovariance, _logdet
@@ -303,6 +305,98 @@ def make_ad_hoc_cov(info, std=None, verbose=None):
     return Covariance(data, ch_names, info['bads'], info['projs'], nfree=0)
 
 
+class _CovAccumulator(object):
+    """Accumulate the mean and covariance of data in a single pass.
+
+    Blocks of data are merged into the running number of samples, mean and
+    (centered) scatter matrix using the pairwise update of Chan et al. [1]_,
+    which remains accurate when the data have large offsets. Accumulators
+    of different data (e.g., computed by parallel workers) are merged the
+    same way.
+
+    Parameters
+    ----------
+    n_channels : int
+        The number of channels.
+
+    References
+    ----------
+    .. [1] Chan, T. F., Golub, G. H., LeVeque, R. J. (1979). Updating
+           formulae and a pairwise algorithm for computing sample variances.
+           COMPSTAT 1982, 30-41.
+    """
+
+    def __init__(self, n_channels):
+        self.n_samples = 0
+        self.mean = np.zeros(n_channels)
+        self.scatter = np.zeros((n_channels, n_channels))
+
+    def update(self, data):
+        """Add a block of data of shape (n_channels, n_times)."""
+        if data.shape[1] > 0:
+            mean = data.mean(axis=1)
+            data = data - mean[:, np.newaxis]
+            self._merge(data.shape[1], mean, np.dot(data, data.T))
+        return self
+
+    def merge(self, acc):
+        """Merge another accumulator into this one."""
+        if acc.n_samples > 0:
+            self._merge(acc.n_samples, acc.mean, acc.scatter)
+        return self
+
+    def _merge(self, n_samples, mean, scatter):
+        n_total = self.n_samples + n_samples
+        delta = mean - self.mean
+        self.scatter += scatter
+        self.scatter += np.outer(delta, delta) * (
+            self.n_samples * n_samples / float(n_total))
+        self.mean += delta * (n_samples / float(n_total))
+        self.n_samples = n_total
+
+    def get_scatter(self, center=True):
+        """Get the sum of the outer products of the (centered) data."""
+        if center:
+            return self.scatter.copy()
+        return self.scatter + self.n_samples * np.outer(self.mean, self.mean)
+
+    def pick(self, picks):
+        """Get an accumulator restricted to a subset of the channels."""
+        acc = _CovAccumulator(len(picks))
+        acc.n_samples = self.n_samples
+        acc.mean = self.mean[picks]
+        acc.scatter = self.scatter[np.ix_(picks, picks)]
+        return acc
+
+
+def _accumulate_epochs(epochs, picks, tslice):
+    """Accumulate the covariance and sum of epochs read one at a time."""
+    acc = _CovAccumulator(len(picks))
+    data_sum, n_epochs = 0., 0
+    for epoch in epochs:
+        epoch = epoch[picks, tslice]
+        acc.update(epoch)
+        data_sum += epoch
+        n_epochs += 1
+    return acc, data_sum, n_epochs
+
+
+def _accumulate_epochs_parallel(epochs, picks, tslice, n_jobs):
+    """Accumulate the covariance and sum of epochs in parallel chunks."""
+    n_jobs = max(min(n_jobs, len(epochs.events)), 1)
+    parallel, p_fun, n_jobs = parallel_func(_accumulate_epochs, n_jobs)
+    if n_jobs == 1:
+        return _accumulate_epochs(epochs, picks, tslice)
+    out = parallel(p_fun(epochs[idx], picks, tslice) for idx in
+                   np.array_split(np.arange(len(epochs.events)), n_jobs))
+    acc, data_sum, n_epochs = out[0]
+    for this_acc, this_data_sum, this_n_epochs in out[1:]:
+        acc.merge(this_acc)
+        data_sum = data_sum + this_data_sum
+        n_epochs += this_n_epochs
+    return acc, data_sum, n_epochs
+
+
 def _check_n_samples(n_samples, n_chan):
     """Check to see if there are enough samples for reliable cov calc."""
     n_samples_min = 10 * (n_chan + 1) // 2
@@ -378,7 +472,10 @@ def compute_raw_covariance(raw, tmin=0, tmax=None, tstep=0.2, reject=None,
 
         .. versionadded:: 0.12
     n_jobs : int (default 1)
-        Number of jobs to run in parallel.
+        Number of jobs to run in parallel. With ``method='empirical'``, the
+        data segments are split across jobs and accumulated in parallel.
+        Otherwise, the estimators and their parameters are evaluated on the
+        cross-validation folds in parallel.
 
         .. versionadded:: 0.12
     return_estimators : bool (default False)
@@ -451,18 +548,12 @@ def compute_raw_covariance(raw, tmin=0, tmax=None, tstep=0.2, reject=None,
         method = 'empirical'
     if isinstance(method, str) and method == 'empirical':
         # potentially *much* more memory efficient to do it the iterative way
+        acc = _accumulate_epochs_parallel(
+            epochs, np.arange(len(picks))[pick_mask], slice(None), n_jobs)[0]
         picks = picks[pick_mask]
-        data = 0
-        n_samples = 0
-        mu = 0
-        # Read data in chunks
-        for raw_segment in epochs:
-            raw_segment = raw_segment[pick_mask]
-            mu += raw_segment.sum(axis=1)
-            data += np.dot(raw_segment, raw_segment.T)
-            n_samples += raw_segment.shape[1]
+        n_samples = acc.n_samples
         _check_n_samples(n_samples, len(picks))
-        data -= mu[:, None] * (mu[None, :] / n_samples)
+        data = acc.get_scatter()
         data /= (n_samples - 1.0)
         logger.info("Number of samples used : %d" % n_samples)
         logger.info('[done]')
@@ -627,7 +718,10 @@ def compute_covariance(epochs, keep_sample_mean=True, tmin=None, tmax=None,
         These defaults will scale data to roughly the same order of
         magnitude.
     n_jobs : int (default 1)
-        Number of jobs to run in parallel.
+        Number of jobs to run in parallel. With ``method='empirical'``, the
+        epochs are split across jobs and accumulated in parallel.
+        Otherwise, the estimators and their parameters are evaluated on the
+        cross-validation folds in parallel.
     return_estimators : bool (default False)
         Whether to return all estimators or the best. Only considered if
         method equals 'auto' or is a list of str. Defaults to False
@@ -798,48 +892,52 @@ def compute_covariance(epochs, keep_sample_mean=True, tmin=None, tmax=None,
     ch_names = [epochs[0].ch_names[k] for k in picks_meeg]
     info = epochs[0].info  # we will overwrite 'epochs'
 
-    if not keep_sample_mean:
-        # prepare mean covs
-        n_epoch_types = len(epochs)
-        data_mean = [0] * n_epoch_types
-        n_samples = np.zeros(n_epoch_types, dtype=np.int)
-        n_epochs = np.zeros(n_epoch_types, dtype=np.int)
-
+    if method == ['empirical']:
+        # single pass over the epochs, which are read one at a time
+        info = pick_info(info, picks_meeg)
+        picks_list = _picks_by_type(info)
+        acc = _CovAccumulator(len(picks_meeg))
+        data_mean = list()
+        n_samples = np.zeros(len(epochs), dtype=np.int)
+        n_epochs = np.zeros(len(epochs), dtype=np.int)
         for ii, epochs_t in enumerate(epochs):
-
             tslice = _get_tslice(epochs_t, tmin, tmax)
-            for e in epochs_t:
-                e = e[picks_meeg, tslice]
-                if not keep_sample_mean:
-                    data_mean[ii] += e
-                n_samples[ii] += e.shape[1]
-                n_epochs[ii] += 1
-
-        n_samples_epoch = n_samples // n_epochs
-        norm_const = np.sum(n_samples_epoch * (n_epochs - 1))
-        data_mean = [1.0 / n_epoch * np.dot(mean, mean.T) for n_epoch, mean
-                     in zip(n_epochs, data_mean)]
-
-    info = pick_info(info, picks_meeg)
-    tslice = _get_tslice(epochs[0], tmin, tmax)
-    epochs = [ee.get_data()[:, picks_meeg, tslice] for ee in epochs]
-    picks_meeg = np.arange(len(picks_meeg))
-    picks_list = _picks_by_type(info)
-
-    if len(epochs) > 1:
-        epochs = np.concatenate(epochs, 0)
+            this_acc, data_sum, n_epochs[ii] = _accumulate_epochs_parallel(
+                epochs_t, picks_meeg, tslice, n_jobs)
+            acc.merge(this_acc)
+            n_samples[ii] = this_acc.n_samples
+            if not keep_sample_mean:
+                data_mean.append(np.dot(data_sum, data_sum.T) / n_epochs[ii])
+        n_samples_tot = acc.n_samples
+        _check_n_samples(n_samples_tot, len(picks_meeg))
+        if not keep_sample_mean:
+            n_samples_epoch = n_samples // n_epochs
+            norm_const = np.sum(n_samples_epoch * (n_epochs - 1))
+        center = not _method_params['empirical'].get('assume_centered', True)
+        cov_data = _compute_covariance_empirical(
+            acc.get_scatter(center=center), n_samples_tot, info,
+            _method_params, scalings, picks_list, rank)
     else:
-        epochs = epochs[0]
+        info = pick_info(info, picks_meeg)
+        tslice = _get_tslice(epochs[0], tmin, tmax)
+        epochs = [ee.get_data()[:, picks_meeg, tslice] for ee in epochs]
+        picks_meeg = np.arange(len(picks_meeg))
+        picks_list = _picks_by_type(info)
+
+        if len(epochs) > 1:
+            epochs = np.concatenate(epochs, 0)
+        else:
+            epochs = epochs[0]
 
-    epochs = np.hstack(epochs)
-    n_samples_tot = epochs.shape[-1]
-    _check_n_samples(n_samples_tot, len(picks_meeg))
+        epochs = np.hstack(epochs)
+        n_samples_tot = epochs.shape[-1]
+        _check_n_samples(n_samples_tot, len(picks_meeg))
 
-    epochs = epochs.T  # sklearn | C-order
-    cov_data = _compute_covariance_auto(
-        epochs, method=method, method_params=_method_params, info=info,
-        cv=cv, n_jobs=n_jobs, stop_early=True, picks_list=picks_list,
-        scalings=scalings, rank=rank)
+        epochs = epochs.T  # sklearn | C-order
+        cov_data = _compute_covariance_auto(
+            epochs, method=method, method_params=_method_params, info=info,
+            cv=cv, n_jobs=n_jobs, stop_early=True, picks_list=picks_list,
+            scalings=scalings, rank=rank)
 
     if keep_sample_mean is False:
         cov = cov_data['empirical']['data']
@@ -898,6 +996,31 @@ def _eigvec_subspace(eig, eigvec, mask):
     return eig, eigvec
 
 
+def _compute_covariance_empirical(C, n_samples, info, method_params,
+                                  scalings, picks_list, rank):
+    """Compute the empirical covariance from the accumulated scatter."""
+    rank = compute_rank(Covariance(C / n_samples, info['ch_names'], [],
+                                   info['projs'], n_samples),
+                        rank, scalings, info)
+    # rescale to improve numerical stability
+    C = C.copy()
+    _apply_scaling_cov(C, picks_list, scalings)
+    _, eigvec, mask = _smart_eigh(C, info, rank, proj_subspace=True,
+                                  do_compute_rank=False)
+    eigvec = eigvec[mask]
+    logger.info('Reducing data rank from %s -> %s'
+                % (len(mask), eigvec.shape[0]))
+    logger.info('Estimating covariance using EMPIRICAL')
+    est = EmpiricalCovariance(**method_params['empirical'])
+    est._set_covariance(np.dot(eigvec, np.dot(C, eigvec.T)) / n_samples)
+    # project back
+    cov = np.dot(eigvec.T, np.dot(est.covariance_, eigvec))
+    # undo scaling
+    _undo_scaling_cov(cov, picks_list, scalings)
+    logger.info('Done.')
+    return dict(empirical=dict(loglik=None, data=cov, estimator=est))
+
+
 def _compute_covariance_auto(data, method, info, method_params, cv,
                              scalings, n_jobs, stop_early, picks_list, rank):
     """Compute covariance auto mode."""
@@ -924,6 +1047,12 @@ def _compute_covariance_auto(data, method, info, method_params, cv,
         if not ok_sklearn and (len(method) != 1 or method[0] != 'empirical'):
             raise ValueError('scikit-learn is not installed, `method` must be '
                              '`empirical`, got %s' % (method,))
+        # statistics of the cross-validation folds shared by all estimators
+        folds = None
+        if len(method) > 1 or any(method_ in ('shrunk', 'pca',
+                                              'factor_analysis')
+                                  for method_ in method):
+            folds = _cv_folds(data, cv)
 
         for method_ in method:
             data_ = data.copy()
@@ -977,21 +1106,12 @@ def _compute_covariance_auto(data, method, info, method_params, cv,
                 del sc
 
             elif method_ == 'shrunk':
-                try:
-                    from sklearn.model_selection import GridSearchCV
-                except Exception:  # support sklearn < 0.18
-                    from sklearn.grid_search import GridSearchCV
-                from sklearn.covariance import ShrunkCovariance
                 shrinkage = mp.pop('shrinkage')
-                tuned_parameters = [{'shrinkage': shrinkage}]
                 shrinkages = []
-                gs = GridSearchCV(ShrunkCovariance(**mp),
-                                  tuned_parameters, cv=cv, iid=True)
                 for ch_type, picks in sub_picks_list:
-                    gs.fit(data_[:, picks])
-                    shrinkages.append((ch_type, gs.best_estimator_.shrinkage,
-                                       picks))
-                shrinkages = [c[0] for c in zip(shrinkages)]
+                    shrinkages.append((ch_type, _shrunk_cv(
+                        shrinkage, folds, picks, mp['assume_centered']),
+                        picks))
                 sc = _ShrunkCovariance(shrinkage=shrinkages, **mp)
                 sc.fit(data_)
                 estimator_cov_info.append((sc, sc.covariance_, _info))
@@ -1001,7 +1121,7 @@ def _compute_covariance_auto(data, method, info, method_params, cv,
                 assert orig_rank == 'full'
                 pca, _info = _auto_low_rank_model(
                     data_, method_, n_jobs=n_jobs, method_params=mp, cv=cv,
-                    stop_early=stop_early)
+                    stop_early=stop_early, folds=folds)
                 pca.fit(data_)
                 estimator_cov_info.append((pca, pca.get_covariance(), _info))
                 del pca
@@ -1010,8 +1130,12 @@ def _compute_covariance_auto(data, method, info, method_params, cv,
                 assert orig_rank == 'full'
                 fa, _info = _auto_low_rank_model(
                     data_, method_, n_jobs=n_jobs, method_params=mp, cv=cv,
-                    stop_early=stop_early)
-                fa.fit(data_)
+                    stop_early=stop_early, folds=folds)
+                if _use_fa_cov(fa):
+                    _fit_factor_analysis(
+                        fa, _CovAccumulator(data_.shape[1]).update(data_.T))
+                else:
+                    fa.fit(data_)
                 estimator_cov_info.append((fa, fa.get_covariance(), _info))
                 del fa
             else:
@@ -1021,14 +1145,14 @@ def _compute_covariance_auto(data, method, info, method_params, cv,
 
         if len(method) > 1:
             logger.info('Using cross-validation to select the best estimator.')
+            logliks = _cross_val(data, [est for est, _, _ in
+                                        estimator_cov_info], folds, n_jobs)
+        else:
+            logliks = [None] * len(estimator_cov_info)
 
         out = dict()
-        for ei, (estimator, cov, runtime_info) in \
-                enumerate(estimator_cov_info):
-            if len(method) > 1:
-                loglik = _cross_val(data, estimator, cv, n_jobs)
-            else:
-                loglik = None
+        for ei, ((estimator, cov, runtime_info), loglik) in \
+                enumerate(zip(estimator_cov_info, logliks)):
             # project back
             cov = np.dot(eigvec.T, np.dot(cov, eigvec))
             # undo scaling
@@ -1041,30 +1165,256 @@ def _compute_covariance_auto(data, method, info, method_params, cv,
     return out
 
 
-def _gaussian_loglik_scorer(est, X, y=None):
-    """Compute the Gaussian log likelihood of X under the model in est."""
-    # compute empirical covariance of the test set
-    precision = est.get_precision()
-    n_samples, n_features = X.shape
-    log_like = -.5 * (X * (np.dot(X, precision))).sum(axis=1)
+def _gaussian_loglik(precision, test_cov):
+    """Compute the mean Gaussian log likelihood of data given its scatter."""
+    n_features = len(precision)
+    log_like = -.5 * np.sum(test_cov * precision)
     log_like -= .5 * (n_features * log(2. * np.pi) - _logdet(precision))
-    out = np.mean(log_like)
-    return out
+    return log_like
+
 
+def _gaussian_loglik_eig(eig, test_var):
+    """Compute the mean Gaussian log likelihood in an eigenbasis.
 
-def _cross_val(data, est, cv, n_jobs):
-    """Compute cross validation."""
+    ``eig`` (..., n_features) are the eigenvalues of the model covariance and
+    ``test_var`` the variance of the (uncentered) test data along the
+    corresponding eigenvectors.
+    """
+    n_features = eig.shape[-1]
+    precision = 1. / eig
+    # same regularization of the log det as _logdet
+    tol = precision.max(axis=-1, keepdims=True) * n_features * \
+        np.finfo(np.float64).eps
+    log_like = -.5 * np.sum(test_var * precision, axis=-1)
+    log_like -= .5 * (n_features * log(2. * np.pi) -
+                      np.sum(np.log(np.maximum(precision, tol)), axis=-1))
+    return log_like
+
+
+def _cv_folds(data, cv):
+    """Compute the sufficient statistics of the cross-validation folds.
+
+    The mean and scatter of the training and test samples of each fold are
+    computed once and shared by all estimators and candidate parameters. When
+    the test sets partition the data (e.g., KFold), the training statistics
+    are obtained by merging those of the other test sets.
+    """
     try:
-        from sklearn.model_selection import cross_val_score
+        from sklearn.model_selection import check_cv
     except ImportError:
         # XXX support sklearn < 0.18
-        from sklearn.cross_validation import cross_val_score
-    return np.mean(cross_val_score(est, data, cv=cv, n_jobs=n_jobs,
-                                   scoring=_gaussian_loglik_scorer))
+        from sklearn.cross_validation import check_cv
+        splits = list(check_cv(cv, data))
+    else:
+        splits = list(check_cv(cv).split(data))
+    n_samples, n_features = data.shape
+    test_accs = [_CovAccumulator(n_features).update(data[test].T)
+                 for _, test in splits]
+    all_test = np.sort(np.concatenate([test for _, test in splits]))
+    partition = (np.array_equal(all_test, np.arange(n_samples)) and
+                 all(len(train) + len(test) == n_samples
+                     for train, test in splits))
+    folds = list()
+    for fi, (train, _) in enumerate(splits):
+        if partition:
+            train_acc = _CovAccumulator(n_features)
+            for acc in test_accs[:fi] + test_accs[fi + 1:]:
+                train_acc.merge(acc)
+        else:
+            train_acc = _CovAccumulator(n_features).update(data[train].T)
+        folds.append((train, train_acc, test_accs[fi]))
+    return folds
+
+
+def _set_empirical(est, acc):
+    """Set an empirical covariance estimator from accumulated statistics."""
+    if est.assume_centered:
+        est.location_ = np.zeros(len(acc.mean))
+    else:
+        est.location_ = acc.mean.copy()
+    est._set_covariance(acc.get_scatter(center=not est.assume_centered) /
+                        acc.n_samples)
+    return est
+
+
+def _fit_factor_analysis(est, acc):
+    """Fit a FactorAnalysis estimator from accumulated statistics.
+
+    This runs the EM iterations of FactorAnalysis.fit, with the SVD of the
+    scaled data replaced by the eigendecomposition of the scaled covariance,
+    so that each iteration does not depend on the number of samples. The
+    result is the one of ``svd_method='lapack'``.
+    """
+    n_features = len(acc.mean)
+    n_components = est.n_components
+    if n_components is None:
+        n_components = n_features
+    cov = acc.get_scatter() / acc.n_samples
+    var = np.diag(cov).copy()
+    llconst = n_features * log(2.0 * np.pi) + n_components
+    if est.noise_variance_init is None:
+        psi = np.ones(n_features)
+    else:
+        if len(est.noise_variance_init) != n_features:
+            raise ValueError('noise_variance_init dimension does not match '
+                             'the number of features: %d != %d'
+                             % (len(est.noise_variance_init), n_features))
+        psi = np.array(est.noise_variance_init, float)
+    loglike = list()
+    old_ll = -np.inf
+    SMALL = 1e-12
+    for ii in range(est.max_iter):
+        sqrt_psi = np.sqrt(psi) + SMALL
+        this_cov = cov / np.outer(sqrt_psi, sqrt_psi)
+        eig, eigvec = linalg.eigh(this_cov)
+        eig = np.maximum(eig[::-1][:n_components], 0.)
+        W = np.sqrt(np.maximum(eig - 1., 0.))[:, np.newaxis] * \
+            eigvec[:, ::-1][:, :n_components].T
+        W *= sqrt_psi
+        unexp_var = np.trace(this_cov) - np.sum(eig)
+        ll = llconst + np.sum(np.log(eig)) + unexp_var + np.sum(np.log(psi))
+        ll *= -acc.n_samples / 2.
+        loglike.append(ll)
+        if (ll - old_ll) < est.tol:
+            break
+        old_ll = ll
+        psi = np.maximum(var - np.sum(W ** 2, axis=0), SMALL)
+    else:
+        warn('FactorAnalysis did not converge. You might want to increase '
+             'the number of iterations.')
+    est.mean_ = acc.mean.copy()
+    est.components_ = W
+    est.noise_variance_ = psi
+    est.loglike_ = loglike
+    est.n_iter_ = ii + 1
+    return est
+
+
+def _use_fa_cov(est):
+    """Check if a FactorAnalysis estimator can be fit from its covariance."""
+    from sklearn.decomposition import FactorAnalysis
+    return (isinstance(est, FactorAnalysis) and
+            getattr(est, 'rotation', None) is None)
+
+
+def _score_fold(est, data, fold):
+    """Fit an estimator on the training set of a fold and score it."""
+    from sklearn.base import clone
+    train, train_acc, test_acc = fold
+    est = clone(est)
+    if isinstance(est, (_RegCovariance, _ShrunkCovariance)):
+        est._fit_empirical(_set_empirical(EmpiricalCovariance(
+            store_precision=est.store_precision,
+            assume_centered=est.assume_centered), train_acc))
+    elif isinstance(est, EmpiricalCovariance):
+        _set_empirical(est, train_acc)
+    elif _use_fa_cov(est):
+        _fit_factor_analysis(est, train_acc)
+    else:
+        est.fit(data[train])
+    test_cov = test_acc.get_scatter(center=False) / test_acc.n_samples
+    return _gaussian_loglik(est.get_precision(), test_cov)
+
+
+def _cross_val(data, ests, folds, n_jobs):
+    """Compute the cross-validated log likelihood of estimators."""
+    parallel, p_fun, _ = parallel_func(_score_fold, n_jobs)
+    scores = parallel(p_fun(est, data, fold) for est in ests
+                      for fold in folds)
+    return np.reshape(scores, (len(ests), len(folds))).mean(axis=1)
+
+
+def _shrunk_cv(shrinkages, folds, picks, assume_centered):
+    """Choose the shrinkage with the best cross-validated log likelihood.
+
+    This is equivalent to a grid search over ShrunkCovariance estimators,
+    but the eigendecomposition of the empirical covariance of each training
+    set is shared by all shrinkage values.
+    """
+    shrinkages = np.array(shrinkages, float)
+    scores = np.zeros(len(shrinkages))
+    for _, train_acc, test_acc in folds:
+        train_acc, test_acc = train_acc.pick(picks), test_acc.pick(picks)
+        if assume_centered:
+            location = np.zeros(len(picks))
+        else:
+            location = train_acc.mean
+        cov = train_acc.get_scatter(center=not assume_centered)
+        cov /= train_acc.n_samples
+        delta = test_acc.mean - location
+        test_cov = test_acc.get_scatter() / test_acc.n_samples
+        test_cov += np.outer(delta, delta)
+        eig, eigvec = linalg.eigh(cov)
+        test_var = np.sum(eigvec * np.dot(test_cov, eigvec), axis=0)
+        mu = np.mean(eig)
+        eig = ((1. - shrinkages[:, np.newaxis]) * eig +
+               shrinkages[:, np.newaxis] * mu)
+        # weight the folds by the number of test samples (iid)
+        scores += test_acc.n_samples * _gaussian_loglik_eig(eig, test_var)
+    return shrinkages[np.argmax(scores)]
+
+
+def _score_n_components(est, n_components, data, fold):
+    """Score a latent variable model with a given number of components."""
+    from sklearn.base import clone
+    est = clone(est)
+    est.n_components = n_components
+    try:  # this may fail depending on rank and split
+        return _score_fold(est, data, fold)
+    except ValueError:
+        return np.inf
+
+
+def _pca_cv_scores(folds, n_features, iter_n_components):
+    """Compute the cross-validated log likelihood of PCA models.
+
+    The probabilistic PCA model of each number of components is derived from
+    a single eigendecomposition of the covariance of each training set.
+    """
+    scores = np.zeros(len(iter_n_components))
+    for _, train_acc, test_acc in folds:
+        n_max = min(train_acc.n_samples, n_features)
+        cov = train_acc.get_scatter() / (train_acc.n_samples - 1.)
+        eig, eigvec = linalg.eigh(cov)
+        eig, eigvec = np.maximum(eig[::-1], 0.), eigvec[:, ::-1]
+        test_cov = test_acc.get_scatter(center=False) / test_acc.n_samples
+        test_var = np.sum(eigvec * np.dot(test_cov, eigvec), axis=0)
+        for ii, n in enumerate(iter_n_components):
+            if not 0 < n <= n_max:  # PCA would raise an error
+                scores[ii] = np.inf
+                continue
+            this_eig = eig.copy()
+            if n < n_features:
+                this_eig[n:] = eig[n:n_max].mean() if n < n_max else 0.
+            with np.errstate(divide='ignore', invalid='ignore'):
+                scores[ii] += _gaussian_loglik_eig(this_eig, test_var)
+    return scores / len(folds)
+
+
+def _iter_low_rank_scores(data, est, iter_n_components, folds, n_jobs):
+    """Yield the cross-validated log likelihood of each number of components.
+
+    The (n_components x fold) grid is evaluated in parallel, n_jobs numbers of
+    components at a time so that the search can stop early.
+    """
+    from sklearn.decomposition import PCA
+    if isinstance(est, PCA) and not est.whiten:
+        scores = _pca_cv_scores(folds, data.shape[1], iter_n_components)
+        for n, score in zip(iter_n_components, scores):
+            yield n, score
+        return
+    parallel, p_fun, n_jobs = parallel_func(_score_n_components, n_jobs)
+    for start in range(0, len(iter_n_components), n_jobs):
+        batch = iter_n_components[start:start + n_jobs]
+        scores = parallel(p_fun(est, n, data, fold) for n in batch
+                          for fold in folds)
+        scores = np.reshape(scores, (len(batch), len(folds))).mean(axis=1)
+        for n, score in zip(batch, scores):
+            yield n, score
 
 
 def _auto_low_rank_model(data, mode, n_jobs, method_params, cv,
-                         stop_early=True, verbose=None):
+                         stop_early=True, folds=None, verbose=None):
     """Compute latent variable models."""
     method_params = deepcopy(method_params)
     iter_n_components = method_params.pop('iter_n_components')
@@ -1086,13 +1436,11 @@ def _auto_low_rank_model(data, mode, n_jobs, method_params, cv,
     if max_n > data.shape[1]:
         warn('You are trying to estimate %i components on matrix '
              'with %i features.' % (max_n, data.shape[1]))
+    if folds is None:
+        folds = _cv_folds(data, cv)
 
-    for ii, n in enumerate(iter_n_components):
-        est.n_components = n
-        try:  # this may fail depending on rank and split
-            score = _cross_val(data=data, est=est, cv=cv, n_jobs=n_jobs)
-        except ValueError:
-            score = np.inf
+    for ii, (n, score) in enumerate(_iter_low_rank_scores(
+            data, est, iter_n_components, folds, n_jobs)):
         if np.isinf(score) or score > 0:
             logger.info('... infinite values encountered. stopping estimation')
             break
@@ -1147,11 +1495,14 @@ class _RegCovariance(BaseEstimator):
     def fit(self, X):
         """Fit covariance model with classical diagonal regularization."""
         from sklearn.covariance import EmpiricalCovariance
-        self.estimator_ = EmpiricalCovariance(
+        return self._fit_empirical(EmpiricalCovariance(
             store_precision=self.store_precision,
-            assume_centered=self.assume_centered)
+            assume_centered=self.assume_centered).fit(X))
 
-        self.covariance_ = self.estimator_.fit(X).covariance_
+    def _fit_empirical(self, estimator):
+        """Regularize a fitted EmpiricalCovariance instance."""
+        self.estimator_ = estimator
+        self.covariance_ = estimator.covariance_
         self.covariance_ = 0.5 * (self.covariance_ + self.covariance_.T)
         cov_ = Covariance(
             data=self.covariance_, names=self.info['ch_names'],
@@ -1186,13 +1537,16 @@ class _ShrunkCovariance(BaseEstimator):
 
     def fit(self, X):
         """Fit covariance model with oracle shrinkage regularization."""
-        from sklearn.covariance import shrunk_covariance
         from sklearn.covariance import EmpiricalCovariance
-        self.estimator_ = EmpiricalCovariance(
+        return self._fit_empirical(EmpiricalCovariance(
             store_precision=self.store_precision,
-            assume_centered=self.assume_centered)
+            assume_centered=self.assume_centered).fit(X))
 
-        cov = self.estimator_.fit(X).covariance_
+    def _fit_empirical(self, estimator):
+        """Shrink a fitted EmpiricalCovariance instance."""
+        from sklearn.covariance import shrunk_covariance
+        self.estimator_ = estimator
+        cov = estimator.covariance_
 
         if not isinstance(self.shrinkage, (list, tuple)):
             shrinkage = [('all', self.shrinkage, np.arange(len(cov)))]
@@ -16,10 +16,12 @@
 import numpy as np
 from copy import deepcopy
 
-from ..surface import fast_cross_3d, _project_onto_surface
+from ..surface import (fast_cross_3d, _project_onto_surface,
+                       _accumulate_normals)
 from ..io.constants import FIFF, FWD
 from ..transforms import apply_trans
-from ..utils import logger, verbose, _pl, warn
+from ..utils import (logger, verbose, _pl, warn, object_hash,
+                     _LRUCache)
 from ..parallel import parallel_func
 from ..io.compensator import get_current_comp, make_compensator
 from ..io.pick import pick_types
@@ -29,6 +31,12 @@ from ..fixes import einsum
 # #############################################################################
 # COIL SPECIFICATION AND FIELD COMPUTATION MATRIX
 
+# MEG field computation matrices of the BEM, keyed by the coil geometry and
+# the BEM solution (see _bem_specify_coils). Each is (n_coils, n_BEM_vertices),
+# so with a 3-layer ico-4 BEM and 306 channels one takes ~19 MB.
+_bem_coil_cache = _LRUCache()
+
+
 def _dup_coil_set(coils, coord_frame, t):
     """Make a duplicate."""
     if t is not None and coord_frame != t['from']:
@@ -86,16 +94,22 @@ def _lin_field_coeff(surf, mult, rmags, cosmags, ws, bins, n_jobs):
         Linear coefficients with lead fields for each BEM vertex on each sensor
         (?)
     """
+    # The contribution of a triangle to each of its vertices only depends on
+    # the triangle through tri_area * tri_nn, so the triangles can be summed
+    # up front into an area-weighted normal for each vertex
+    bem_nn = _accumulate_normals(
+        surf['tris'], surf['tri_area'][:, np.newaxis] * surf['tri_nn'],
+        len(surf['rr']))
     parallel, p_fun, _ = parallel_func(_do_lin_field_coeff, n_jobs)
     nas = np.array_split
-    coeffs = parallel(p_fun(surf['rr'], t, tn, ta, rmags, cosmags, ws, bins)
-                      for t, tn, ta in zip(nas(surf['tris'], n_jobs),
-                                           nas(surf['tri_nn'], n_jobs),
-                                           nas(surf['tri_area'], n_jobs)))
-    return mult * np.sum(coeffs, axis=0)
+    coeffs = parallel(p_fun(rr, nn, rmags, cosmags, ws, bins)
+                      for rr, nn in zip(nas(surf['rr'], n_jobs),
+                                        nas(bem_nn, n_jobs)))
+    return mult * np.concatenate(coeffs, axis=1)
 
 
-def _do_lin_field_coeff(bem_rr, tris, tn, ta, rmags, cosmags, ws, bins):
+def _do_lin_field_coeff(bem_rr, bem_nn, rmags, cosmags, ws, bins,
+                        max_bytes=16e6):
     """Compute field coefficients (parallel-friendly).
 
     See section IV of Mosher et al., 1999 (specifically equation 35).
@@ -105,12 +119,9 @@ def _do_lin_field_coeff(bem_rr, tris, tn, ta, rmags, cosmags, ws, bins):
     bem_rr : ndarray, shape (n_BEM_vertices, 3)
         Positions on one BEM surface in 3-space. 2562 BEM vertices for BEM with
         5120 triangles (ico-4)
-    tris : ndarray, shape (n_BEM_vertices, 3)
-        Vertex indices for each triangle (referring to bem_rr)
-    tn : ndarray, shape (n_BEM_vertices, 3)
-        Triangle unit normal vectors
-    ta : ndarray, shape (n_BEM_vertices,)
-        Triangle areas
+    bem_nn : ndarray, shape (n_BEM_vertices, 3)
+        Sum of the area-weighted unit normals of the triangles each vertex
+        belongs to
     rmag : ndarray, shape (n_sensor_pts, 3)
         3D positions of MEG coil integration points (from coil['rmag'])
     cosmag : ndarray, shape (n_sensor_pts, 3)
@@ -118,39 +129,44 @@ def _do_lin_field_coeff(bem_rr, tris, tn, ta, rmags, cosmags, ws, bins):
     ws : ndarray, shape (n_sensor_pts,)
         Weights for MEG coil integration points
     bins : ndarray, shape (n_sensor_pts,)
-        The sensor assignments for each rmag/cosmag/w.
+        The sensor assignments for each rmag/cosmag/w (sorted).
+    max_bytes : float
+        Approximate size of the temporary arrays, the BEM vertices are
+        processed in blocks to stay below it.
 
     Returns
     -------
     coeff : ndarray, shape (n_MEG_sensors, n_BEM_vertices)
         Linear coefficients with effect of each BEM vertex on each sensor (?)
     """
-    coeff = np.zeros((bins[-1] + 1, len(bem_rr)))
+    # Simple version (bem_lin_field_coeffs_simple)
+    # The following is equivalent to:
+    # for tri, tri_nn, tri_area in zip(tris, tn, ta):
+    #     for ti in range(3):
+    #         diff = rmags - bem_rr[tri[ti]]
+    #         x = np.sum(fast_cross_3d(diff, tri_nn) * w_cosmags, axis=-1)
+    #         x *= tri_area / (3 * np.linalg.norm(diff, axis=-1) ** 3)
+    #         coeff[:, tri[ti]] += np.bincount(bins, weights=x)
+    #
+    # Summing over the triangles gives bem_nn, and the triple product
+    # (rmag - rr) x nn . w == (w x rmag) . nn - w . (rr x nn)
+    # turns the numerator into a product of two small matrices.
+    from scipy.spatial.distance import cdist
     w_cosmags = ws[:, np.newaxis] * cosmags
-    diff = rmags[:, np.newaxis, :] - bem_rr
-    den = np.sum(diff * diff, axis=-1)
-    den *= np.sqrt(den)
-    den *= 3
-    for tri, tri_nn, tri_area in zip(tris, tn, ta):
-        # Accumulate the coefficients for each triangle node and add to the
-        # corresponding coefficient matrix
-
-        # Simple version (bem_lin_field_coeffs_simple)
-        # The following is equivalent to:
-        # tri_rr = bem_rr[tri]
-        # for j, coil in enumerate(coils['coils']):
-        #     x = func(coil['rmag'], coil['cosmag'],
-        #              tri_rr, tri_nn, tri_area)
-        #     res = np.sum(coil['w'][np.newaxis, :] * x, axis=1)
-        #     coeff[j][tri + off] += mult * res
-
-        c = fast_cross_3d(diff[:, tri], tri_nn)
-        c *= w_cosmags[:, np.newaxis]
-        for ti in range(3):
-            x = np.sum(c[:, ti], axis=-1)
-            x /= den[:, tri[ti]] / tri_area
-            coeff[:, tri[ti]] += \
-                np.bincount(bins, weights=x, minlength=bins[-1] + 1)
+    lhs = np.concatenate([fast_cross_3d(w_cosmags, rmags), -w_cosmags], axis=1)
+    rhs = np.concatenate([bem_nn, fast_cross_3d(bem_rr, bem_nn)], axis=1)
+    # each sensor has at least one integration point (_concatenate_coils)
+    starts = np.concatenate([[0], np.where(np.diff(bins))[0] + 1])
+    coeff = np.empty((len(starts), len(bem_rr)))
+    n_block = max(int(max_bytes // (3 * 8 * len(rmags))), 1)
+    for start in range(0, len(bem_rr), n_block):
+        sl = slice(start, start + n_block)
+        den = cdist(rmags, bem_rr[sl])
+        den *= den * den
+        den *= 3
+        x = np.dot(lhs, rhs[sl].T)
+        x /= den
+        coeff[:, sl] = np.add.reduceat(x, starts, axis=0)
     return coeff
 
 
@@ -202,6 +218,15 @@ def _bem_specify_coils(bem, coils, coord_frame, mults, n_jobs):
 
     # Process each of the surfaces
     rmags, cosmags, ws, bins = _concatenate_coils(coils)
+
+    # The result only depends on the coil geometry relative to the BEM, which
+    # is often the same across calls (e.g., for repeated head positions)
+    key = object_hash([_bem_hash(bem), rmags, cosmags, ws, bins, mults])
+    sol = _bem_coil_cache.get(key)
+    if sol is not None:
+        logger.info('    Using cached field computation matrix')
+        return sol
+
     lens = np.cumsum(np.r_[0, [len(s['rr']) for s in bem['surfs']]])
     sol = np.zeros((bins[-1] + 1, bem['solution'].shape[1]))
 
@@ -215,9 +240,27 @@ def _bem_specify_coils(bem, coils, coord_frame, mults, n_jobs):
             sol[start:stop] += np.dot(coeff[start:stop],
                                       bem['solution'][o1:o2])
     sol *= mults
+    sol.flags.writeable = False  # it can be shared through the cache
+    _bem_coil_cache[key] = sol
     return sol
 
 
+def _bem_hash(bem):
+    """Hash the parts of a BEM solution that define the coil coefficients.
+
+    The solution matrix is large (e.g., ~470 MB for a three-layer ico-4 BEM),
+    so instead of hashing (and copying) all of it, only its column sums and
+    a subsample of its values are hashed, which still changes with any of
+    its values.
+    """
+    sol = bem['solution']
+    return object_hash([[(surf['rr'], surf['tris'], surf['sigma'])
+                         for surf in bem['surfs']],
+                        bem['bem_method'], bem['field_mult'],
+                        sol.shape, str(sol.dtype), sol.sum(axis=0),
+                        sol.flat[::max(sol.size // 10000, 1)]])
+
+
 def _bem_specify_els(bem, els, mults):
     """Set up for computing the solution at a set of EEG electrodes.
 
@@ -646,10 +689,13 @@ def _magnetic_dipole_field_vec(rrs, coils, too_close='raise'):
     else:
         rmags, cosmags, ws, bins = _concatenate_coils(coils)
     del coils
+    # the points of each coil are contiguous (see _concatenate_coils)
+    starts = np.concatenate([[0], np.flatnonzero(np.diff(bins)) + 1])
+    assert len(starts) == bins[-1] + 1
     fwd = np.empty((3 * len(rrs), bins[-1] + 1))
     for ri, rr in enumerate(rrs):
         diff = rmags - rr
-        dist2 = np.sum(diff * diff, axis=1)[:, np.newaxis]
+        dist2 = np.einsum('ij,ij->i', diff, diff)
         dist = np.sqrt(dist2)
         if (dist < 1e-5).any():
             msg = 'Coil too close (dist = %g m)' % dist.min()
@@ -658,11 +704,11 @@ def _magnetic_dipole_field_vec(rrs, coils, too_close='raise'):
             else:  # warning
                 func = warn if too_close == 'warning' else logger.info
                 func('Coil too close (dist = %g m)' % dist.min())
-        sum_ = ws[:, np.newaxis] * (3 * diff * np.sum(diff * cosmags,
-                                                      axis=1)[:, np.newaxis] -
-                                    dist2 * cosmags) / (dist2 * dist2 * dist)
-        for ii in range(3):
-            fwd[3 * ri + ii] = np.bincount(bins, sum_[:, ii], bins[-1] + 1)
+        fact = ws / (dist2 * dist2 * dist)
+        sum_ = diff * (3 * fact * np.einsum('ij,ij->i', diff, cosmags))[
+            :, np.newaxis]
+        sum_ -= cosmags * (fact * dist2)[:, np.newaxis]
+        fwd[3 * ri:3 * ri + 3] = np.add.reduceat(sum_, starts).T
     fwd *= 1e-7
     return fwd
 
@@ -19,7 +19,7 @@ from ..io.constants import FIFF, FWD
 from ..transforms import (_ensure_trans, transform_surface_to, apply_trans,
                           _get_trans, _print_coord_trans, _coord_frame_name,
                           Transform)
-from ..utils import logger, verbose, warn, _pl
+from ..utils import logger, verbose, warn, _pl, object_size
 from ..parallel import check_n_jobs
 from ..source_space import (_ensure_src, _filter_source_spaces,
                             _make_discrete_source_space, SourceSpaces)
@@ -618,6 +618,91 @@ def make_forward_solution(info, trans, src, bem, meg=True, eeg=True,
     return fwd
 
 
+@verbose
+def cache_bem_fields(info, trans, bem, head_pos=None, ignore_ref=False,
+                     n_jobs=1, verbose=None):
+    """Precompute and cache the MEG field computation matrices of a BEM.
+
+    Computing a BEM forward solution for MEG first requires a field
+    computation matrix that couples the MEG coils to the BEM surfaces. It only
+    depends on the coil geometry relative to the BEM (i.e., on the MEG sensor
+    definitions, the device->head and head->MRI transforms, and the BEM
+    solution), and it is kept in an in-memory cache for reuse by subsequent
+    calls to :func:`mne.make_forward_solution` and
+    :func:`mne.simulation.simulate_raw` with the same geometry. This function
+    fills the cache for a set of head positions in advance, e.g. to compute
+    forward solutions for movement-compensated data.
+
+    Parameters
+    ----------
+    info : instance of mne.Info
+        The measurement info.
+    trans : dict | str | None
+        The head<->MRI transform (see :func:`mne.make_forward_solution`).
+    bem : dict | str
+        Filename of the BEM solution (e.g.,
+        "sample-5120-5120-5120-bem-sol.fif") to use, or a loaded BEM solution.
+        Sphere models do not need any field computation matrices.
+    head_pos : None | array | list of dict
+        The head positions. If array, should be of the form returned by
+        :func:`mne.chpi.read_head_pos`. If list, each entry should be a
+        device->head transform. If None, ``info['dev_head_t']`` is used.
+    ignore_ref : bool
+        If True, do not include reference channels in compensation (see
+        :func:`mne.make_forward_solution`).
+    n_jobs : int
+        Number of jobs to run in parallel.
+    %(verbose)s
+
+    Notes
+    -----
+    Each matrix is of shape ``(n_coils, n_BEM_vertices)``, e.g. about 19 MB
+    for 306 MEG channels and a three-layer ico-4 BEM. The size of the cache
+    is given by the ``MNE_CACHE_MAX_SIZE`` config value (default ``'256M'``,
+    ``'0'`` disables it, see :func:`mne.set_config`). This function enlarges
+    the cache to hold the matrices of all requested head positions, so for
+    many head positions consider quantizing them first. The cache keeps this
+    size (which no longer follows ``MNE_CACHE_MAX_SIZE``) for the rest of
+    the Python session.
+
+    .. versionadded:: 0.18
+    """
+    from ..chpi import head_pos_to_trans_rot_t
+    from ._compute_forward import _prep_field_computation, _bem_coil_cache
+    mri_head_t, trans = _get_trans(trans)
+    n_jobs = check_n_jobs(n_jobs)
+    bem_extra = bem if isinstance(bem, str) else 'instance of ConductorModel'
+    bem = _setup_bem(bem, bem_extra, 0, mri_head_t)
+    if bem['is_sphere']:
+        raise ValueError('bem must be a BEM solution, not a sphere model')
+    if head_pos is None:
+        dev_head_ts = [info['dev_head_t']]
+    elif isinstance(head_pos, np.ndarray):
+        transs, rots, _ = head_pos_to_trans_rot_t(head_pos)
+        dev_head_ts = [np.r_[np.c_[r, t[:, np.newaxis]], [[0, 0, 0, 1]]]
+                       for r, t in zip(rots, transs)]
+    else:
+        dev_head_ts = list(head_pos)
+    dev_head_ts = [Transform('meg', 'head', t['trans'] if isinstance(t, dict)
+                             else t) for t in dev_head_ts]
+    megcoils, compcoils, _, meg_info = _prep_meg_channels(
+        info, ignore_ref=ignore_ref, verbose=False)
+    for ti, dev_head_t in enumerate(dev_head_ts):
+        logger.info('Computing field matrices for transform #%s/%s'
+                    % (ti + 1, len(dev_head_ts)))
+        _transform_orig_meg_coils(megcoils, dev_head_t)
+        _transform_orig_meg_coils(compcoils, dev_head_t)
+        fwd_data = dict(coils_list=[megcoils], ccoils_list=[compcoils],
+                        infos=[meg_info], coil_types=['meg'])
+        _prep_field_computation(None, bem, fwd_data, n_jobs, verbose=False)
+        if ti == 0 and _bem_coil_cache.max_bytes > 0:  # make room for all
+            nbytes = object_size([fwd_data['solutions'][0],
+                                  fwd_data['csolutions'][0]])
+            _bem_coil_cache.resize(max(
+                _bem_coil_cache.max_bytes,
+                _bem_coil_cache.nbytes + len(dev_head_ts) * nbytes))
+
+
 @verbose
 def make_forward_dipole(dipole, bem, info, trans=None, n_jobs=1, verbose=None):
     """Convert dipole object to source estimate and calculate forward operator.
@@ -1,4 +1,5 @@
 from itertools import product
+from copy import deepcopy
 import os
 import os.path as op
 
@@ -17,8 +18,9 @@ from mne import (read_forward_solution, write_forward_solution,
 from mne.utils import (requires_mne, requires_nibabel, _TempDir,
                        run_tests_if_main, run_subprocess)
 from mne.forward._make_forward import _create_meg_coils, make_forward_dipole
-from mne.forward._compute_forward import _magnetic_dipole_field_vec
-from mne.forward import Forward, _do_forward_solution
+from mne.forward._compute_forward import (_magnetic_dipole_field_vec,
+                                          _bem_coil_cache, _bem_hash)
+from mne.forward import Forward, _do_forward_solution, cache_bem_fields
 from mne.dipole import Dipole, fit_dipole
 from mne.simulation import simulate_evoked
 from mne.source_estimate import VolSourceEstimate
@@ -241,6 +243,51 @@ def test_make_forward_solution_discrete():
     convert_forward_solution(fwd, surf_ori=True)
 
 
+def test_bem_hash():
+    """Test that the BEM hash depends on the whole solution."""
+    rng = np.random.RandomState(0)
+    surf = dict(rr=rng.randn(4, 3), tris=np.array([[0, 1, 2], [0, 2, 3]]),
+                sigma=0.3)
+    bem = dict(surfs=[surf], bem_method=2, field_mult=[1.],
+               solution=rng.randn(4, 4))
+    bem_2 = deepcopy(bem)
+    assert _bem_hash(bem_2) == _bem_hash(bem)
+    bem_2['solution'][0, 1] += 1.
+    assert _bem_hash(bem_2) != _bem_hash(bem)
+
+
+@testing.requires_testing_data
+def test_cache_bem_fields():
+    """Test caching of the BEM field computation matrices."""
+    src = read_source_spaces(fname_src)[0]
+    src = setup_volume_source_space(
+        pos=dict(rr=src['rr'][src['vertno'][:3]].copy(),
+                 nn=src['nn'][src['vertno'][:3]].copy()))
+    info = read_info(fname_raw)
+    _bem_coil_cache.clear()
+    fwd = make_forward_solution(info, fname_trans, src, fname_bem, eeg=False)
+    assert len(_bem_coil_cache) == 1
+    fwd_cached = make_forward_solution(info, fname_trans, src, fname_bem,
+                                       eeg=False)
+    assert len(_bem_coil_cache) == 1
+    assert_array_equal(fwd_cached['sol']['data'], fwd['sol']['data'])
+    # precompute for a new head position
+    dev_head_t = info['dev_head_t']['trans'].copy()
+    dev_head_t[:3, 3] += [0.001, -0.002, 0.003]
+    cache_bem_fields(info, fname_trans, fname_bem,
+                     head_pos=[info['dev_head_t'], dev_head_t])
+    assert len(_bem_coil_cache) == 2
+    info['dev_head_t']['trans'] = dev_head_t
+    fwd_cached = make_forward_solution(info, fname_trans, src, fname_bem,
+                                       eeg=False)
+    assert len(_bem_coil_cache) == 2
+    _bem_coil_cache.clear()
+    fwd = make_forward_solution(info, fname_trans, src, fname_bem, eeg=False)
+    assert_array_equal(fwd_cached['sol']['data'], fwd['sol']['data'])
+    pytest.raises(ValueError, cache_bem_fields, info, fname_trans,
+                  make_sphere_model())
+
+
 @testing.requires_testing_data
 @requires_mne
 @pytest.mark.timeout(90)  # can take longer than 60 sec on Travis
@@ -6,6 +6,7 @@
 
 from collections import defaultdict
 from colorsys import hsv_to_rgb, rgb_to_hsv
+import heapq
 import os
 import os.path as op
 import copy as cp
@@ -14,14 +15,14 @@ import re
 import numpy as np
 from scipy import linalg, sparse
 
-from .fixes import _sparse_argmax
+from .fixes import _sparse_argmax, _get_read_geometry
 from .parallel import parallel_func, check_n_jobs
 from .source_estimate import (SourceEstimate, _center_of_mass,
                               spatial_src_connectivity)
 from .source_space import add_source_space_distances, SourceSpaces
 from .stats.cluster_level import _find_clusters, _get_components
 from .surface import (read_surface, fast_cross_3d, mesh_edges, mesh_dist,
-                      read_morph_map)
+                      read_morph_map, _read_cached)
 from .utils import (get_subjects_dir, _check_subject, logger, verbose, warn,
                     check_random_state, _validate_type, fill_doc,
                     _check_option)
@@ -1406,38 +1407,107 @@ def _verts_within_dist(graph, sources, max_dist):
     dist : array
         Distances from source vertex.
     """
-    dist_map = {}
-    verts_added_last = []
-    for source in sources:
-        dist_map[source] = 0
-        verts_added_last.append(source)
-
-    # add neighbors until no more neighbors within max_dist can be found
-    while len(verts_added_last) > 0:
-        verts_added = []
-        for i in verts_added_last:
-            v_dist = dist_map[i]
-            row = graph[i, :]
-            neighbor_vert = row.indices
-            neighbor_dist = row.data
-            for j, d in zip(neighbor_vert, neighbor_dist):
-                n_dist = v_dist + d
-                if j in dist_map:
-                    if n_dist < dist_map[j]:
-                        dist_map[j] = n_dist
-                else:
-                    if n_dist <= max_dist:
-                        dist_map[j] = n_dist
-                        # we found a new vertex within max_dist
-                        verts_added.append(j)
-        verts_added_last = verts_added
-
-    verts = np.sort(np.array(list(dist_map.keys()), int))
-    dist = np.array([dist_map[v] for v in verts], int)
+    from scipy.sparse.csgraph import dijkstra
+    dist = dijkstra(graph, indices=np.atleast_1d(sources), limit=max_dist)
+    dist = np.min(dist, axis=0)
+    verts = np.where(dist <= max_dist)[0]
+    dist = dist[verts].astype(int)
 
     return verts, dist
 
 
+def _grow_regions(graph, seeds, extents=None):
+    """Grow non-overlapping regions from seeds on a surface.
+
+    Parameters
+    ----------
+    graph : scipy.sparse.csr_matrix
+        Sparse matrix with distances between adjacent vertices.
+    seeds : list of array of int
+        The seed vertices of each region.
+    extents : None | array of float
+        The maximum geodesic distance of the vertices of each region from its
+        seeds. None (default) means no limit.
+
+    Returns
+    -------
+    parc : array of int
+        The region of each vertex (-1 for vertices outside of all regions).
+    dist : array of float
+        The distance of each vertex from the seeds of its region.
+
+    Notes
+    -----
+    All regions are grown at once, each vertex being assigned to the closest
+    seed whose region can reach it without entering another region.
+    """
+    from scipy.sparse.csgraph import dijkstra
+    n_vertices = graph.shape[0]
+    seeds = [np.unique(seed) for seed in seeds]
+    seed_verts = np.concatenate(seeds)
+    seed_parc = np.repeat(np.arange(len(seeds)), [len(seed) for seed in seeds])
+    parc = np.full(n_vertices, -1, int)
+    if extents is not None and np.any(extents != extents[0]):
+        # regions with different extents compete for the vertices
+        dist = np.full(n_vertices, np.inf)
+        heap = [(0., vert, label)
+                for vert, label in zip(seed_verts, seed_parc)]
+        heapq.heapify(heap)
+        while heap:
+            this_dist, vert, label = heapq.heappop(heap)
+            if parc[vert] >= 0:
+                continue
+            parc[vert] = label
+            dist[vert] = this_dist
+            sl = slice(graph.indptr[vert], graph.indptr[vert + 1])
+            for vert_to, d in zip(graph.indices[sl], graph.data[sl]):
+                if parc[vert_to] < 0 and this_dist + d <= extents[label]:
+                    heapq.heappush(heap, (this_dist + d, vert_to, label))
+        return parc, dist
+
+    # a single search from an extra vertex connected to all seeds (with a unit
+    # distance) finds the closest seed of all vertices
+    graph = graph.tocoo()
+    graph = sparse.csr_matrix(
+        (np.concatenate([graph.data, np.ones(len(seed_verts))]),
+         (np.concatenate([graph.row, np.full(len(seed_verts), n_vertices)]),
+          np.concatenate([graph.col, seed_verts]))),
+        shape=(n_vertices + 1, n_vertices + 1))
+    limit = np.inf if extents is None else extents[0]
+    dist, pred = dijkstra(graph, indices=n_vertices, limit=limit + 1.,
+                          return_predecessors=True)
+    dist = dist[:n_vertices] - 1.
+    # follow the predecessors of all vertices up to their seed
+    root = np.where(np.isfinite(dist), pred[:n_vertices],
+                    np.arange(n_vertices))
+    root[seed_verts] = seed_verts
+    while True:
+        next_root = root[root]
+        if np.array_equal(next_root, root):
+            break
+        root = next_root
+    parc[seed_verts] = seed_parc
+    parc = parc[root]
+    return parc, dist
+
+
+def _read_surface_graph(fname):
+    """Read a surface and the distances between its adjacent vertices."""
+    # read the file directly, read_surface would cache the surface again
+    vert, tris = _get_read_geometry()(fname)
+    return vert, mesh_dist(tris, vert)
+
+
+def _load_surface_graphs(subject, hemis, surface, subjects_dir):
+    """Load the vertices and distance graphs of the hemispheres."""
+    vert, dist = {}, {}
+    for hemi in set(hemis):
+        surf_fname = op.join(subjects_dir, subject, 'surf', hemi + '.' +
+                             surface)
+        vert[hemi], dist[hemi] = _read_cached(surf_fname, _read_surface_graph)
+    return vert, dist
+
+
 def _grow_labels(seeds, extents, hemis, names, dist, vert, subject):
     """Parallelize grow_labels."""
     labels = []
@@ -1552,13 +1622,8 @@ def grow_labels(subject, seeds, extents, hemis, subjects_dir=None, n_jobs=1,
                 names[i] = '-'.join((names[i], hemi))
     names = np.array(names)
 
-    # load the surfaces and create the distance graphs
-    tris, vert, dist = {}, {}, {}
-    for hemi in set(hemis):
-        surf_fname = op.join(subjects_dir, subject, 'surf', hemi + '.' +
-                             surface)
-        vert[hemi], tris[hemi] = read_surface(surf_fname)
-        dist[hemi] = mesh_dist(tris[hemi], vert[hemi])
+    # load the surfaces and the distance graphs
+    vert, dist = _load_surface_graphs(subject, hemis, surface, subjects_dir)
 
     if overlap:
         # create the patches
@@ -1593,51 +1658,14 @@ def _grow_nonoverlapping_labels(subject, seeds_, extents_, hemis, vertices_,
         extents = extents_[hemi_index]
         names = names_[hemi_index]
         graph = graphs[hemi]  # distance graph
-        n_vertices = len(vertices_[hemi])
         n_labels = len(seeds)
 
-        # prepare parcellation
-        parc = np.empty(n_vertices, dtype='int32')
-        parc[:] = -1
-
-        # initialize active sources
-        sources = {}  # vert -> (label, dist_from_seed)
-        edge = []  # queue of vertices to process
-        for label, seed in enumerate(seeds):
-            if np.any(parc[seed] >= 0):
-                raise ValueError("Overlapping seeds")
-            parc[seed] = label
-            for s in np.atleast_1d(seed):
-                sources[s] = (label, 0.)
-                edge.append(s)
-
-        # grow from sources
-        while edge:
-            vert_from = edge.pop(0)
-            label, old_dist = sources[vert_from]
-
-            # add neighbors within allowable distance
-            row = graph[vert_from, :]
-            for vert_to, dist in zip(row.indices, row.data):
-                new_dist = old_dist + dist
-
-                # abort if outside of extent
-                if new_dist > extents[label]:
-                    continue
-
-                vert_to_label = parc[vert_to]
-                if vert_to_label >= 0:
-                    _, vert_to_dist = sources[vert_to]
-                    # abort if the vertex is occupied by a closer seed
-                    if new_dist > vert_to_dist:
-                        continue
-                    elif vert_to in edge:
-                        edge.remove(vert_to)
+        seed_verts = np.concatenate([np.unique(seed) for seed in seeds])
+        if len(np.unique(seed_verts)) < len(seed_verts):
+            raise ValueError("Overlapping seeds")
 
-                # assign label value
-                parc[vert_to] = label
-                sources[vert_to] = (label, new_dist)
-                edge.append(vert_to)
+        # grow all labels at once
+        parc, _ = _grow_regions(graph, seeds, extents)
 
         # convert parc to labels
         for i in range(n_labels):
@@ -1655,7 +1683,11 @@ def random_parcellation(subject, n_parcel, hemi, subjects_dir=None,
 
     This function generates a number of labels which don't intersect and
     cover the whole surface. Regions are growing around randomly chosen
-    seeds.
+    seeds, each vertex being assigned to the closest seed along the surface.
+
+    .. versionchanged:: 0.18
+       The regions are grown simultaneously from all seeds instead of one
+       after the other up to a maximum size.
 
     Parameters
     ----------
@@ -1683,14 +1715,12 @@ def random_parcellation(subject, n_parcel, hemi, subjects_dir=None,
     if hemi == 'both':
         hemi = ['lh', 'rh']
     hemis = np.atleast_1d(hemi)
+    if n_parcel < len(hemis):
+        raise ValueError('n_parcel must be at least the number of hemispheres '
+                         '(%d), got %s' % (len(hemis), n_parcel))
 
-    # load the surfaces and create the distance graphs
-    tris, vert, dist = {}, {}, {}
-    for hemi in set(hemis):
-        surf_fname = op.join(subjects_dir, subject, 'surf', hemi + '.' +
-                             surface)
-        vert[hemi], tris[hemi] = read_surface(surf_fname)
-        dist[hemi] = mesh_dist(tris[hemi], vert[hemi])
+    # load the surfaces and the distance graphs
+    vert, dist = _load_surface_graphs(subject, hemis, surface, subjects_dir)
 
     # create the patches
     labels = _cortex_parcellation(subject, n_parcel, hemis, vert, dist,
@@ -1710,72 +1740,27 @@ def _cortex_parcellation(subject, n_parcel, hemis, vertices_, graphs,
     labels = []
     rng = check_random_state(random_state)
     for hemi in set(hemis):
-        parcel_size = len(hemis) * len(vertices_[hemi]) // n_parcel
         graph = graphs[hemi]  # distance graph
         n_vertices = len(vertices_[hemi])
 
-        # prepare parcellation
-        parc = np.full(n_vertices, -1, dtype='int32')
-
-        # initialize active sources
-        s = rng.choice(range(n_vertices))
-        label_idx = 0
-        edge = [s]  # queue of vertices to process
-        parc[s] = label_idx
-        label_size = 1
-        rest = len(parc) - 1
-        # grow from sources
-        while rest:
-            # if there are not free neighbors, start new parcel
-            if not edge:
-                rest_idx = np.where(parc < 0)[0]
-                s = rng.choice(rest_idx)
-                edge = [s]
-                label_idx += 1
-                label_size = 1
-                parc[s] = label_idx
-                rest -= 1
-
-            vert_from = edge.pop(0)
-
-            # add neighbors within allowable distance
-            # row = graph[vert_from, :]
-            # row_indices, row_data = row.indices, row.data
-            sl = slice(graph.indptr[vert_from], graph.indptr[vert_from + 1])
-            row_indices, row_data = graph.indices[sl], graph.data[sl]
-            for vert_to, dist in zip(row_indices, row_data):
-                vert_to_label = parc[vert_to]
-
-                # abort if the vertex is already occupied
-                if vert_to_label >= 0:
-                    continue
-
-                # abort if outside of extent
-                if label_size > parcel_size:
-                    label_idx += 1
-                    label_size = 1
-                    edge = [vert_to]
-                    parc[vert_to] = label_idx
-                    rest -= 1
-                    break
-
-                # assign label value
-                parc[vert_to] = label_idx
-                label_size += 1
-                edge.append(vert_to)
-                rest -= 1
+        # grow the parcels from random seeds, adding a seed to the parts of
+        # the surface that are not connected to any seed
+        seeds = list(rng.choice(n_vertices, n_parcel // len(hemis),
+                                replace=False))
+        while True:
+            parc, _ = _grow_regions(graph, [[seed] for seed in seeds])
+            rest_idx = np.where(parc < 0)[0]
+            if len(rest_idx) == 0:
+                break
+            seeds.append(rng.choice(rest_idx))
 
         # merging small labels
         # label connectivity matrix
-        n_labels = label_idx + 1
-        label_sizes = np.empty(n_labels, dtype=int)
+        n_labels = len(seeds)
+        label_sizes = np.bincount(parc, minlength=n_labels)
         label_conn = np.zeros([n_labels, n_labels], dtype='bool')
-        for i in range(n_labels):
-            vertices = np.nonzero(parc == i)[0]
-            label_sizes[i] = len(vertices)
-            neighbor_vertices = graph[vertices, :].indices
-            neighbor_labels = np.unique(np.array(parc[neighbor_vertices]))
-            label_conn[i, neighbor_labels] = 1
+        edges = graph.tocoo()
+        label_conn[parc[edges.row], parc[edges.col]] = 1
         np.fill_diagonal(label_conn, 0)
 
         # merging
@@ -1800,8 +1785,9 @@ def _cortex_parcellation(subject, n_parcel, hemis, vertices_, graphs,
             label_id = np.delete(label_id, i, 0)
 
         # convert parc to labels
-        for i in range(n_labels):
-            vertices = np.nonzero(parc == label_id[i])[0]
+        order = np.argsort(parc, kind='mergesort')
+        bounds = np.searchsorted(parc[order], label_id)
+        for i, vertices in enumerate(np.split(order, bounds[1:])):
             name = 'label_' + str(i)
             label_ = Label(vertices, hemi=hemi, name=name, subject=subject)
             labels.append(label_)
@@ -1842,6 +1828,11 @@ def _read_annot(fname):
         else:
             raise IOError('No such file %s, candidate parcellations in '
                           'that directory: %s' % (fname, ', '.join(cands)))
+    return _read_cached(fname, _read_annot_file)
+
+
+def _read_annot_file(fname):
+    """Read the contents of a .annot file."""
     with open(fname, "rb") as fid:
         n_verts = np.fromfile(fid, '>i4', 1)[0]
         data = np.fromfile(fid, '>i4', n_verts * 2).reshape(n_verts, 2)
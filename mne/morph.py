@@ -4,20 +4,24 @@
 
 # License: BSD (3-clause)
 
+from collections.abc import Iterator
+from itertools import islice
 import os.path as op
 import warnings
 import copy
 import numpy as np
 from scipy import sparse
 
-from .parallel import parallel_func
+from .parallel import parallel_func, check_n_jobs
 from .source_estimate import (VolSourceEstimate, SourceEstimate,
                               VolVectorSourceEstimate, VectorSourceEstimate,
-                              _get_ico_tris)
+                              _BaseSourceEstimate, _get_ico_tris)
 from .source_space import SourceSpaces
 from .surface import read_morph_map, mesh_edges, read_surface, _compute_nearest
 from .utils import (logger, verbose, check_version, get_subjects_dir,
-                    warn as warn_, deprecated, fill_doc, _check_option)
+                    warn as warn_, deprecated, fill_doc, _check_option,
+                    object_hash, _validate_type, _read_cache_dir,
+                    _write_cache_dir)
 from .externals.h5io import read_hdf5, write_hdf5
 
 
@@ -100,6 +104,10 @@ def compute_source_morph(src, subject_from=None, subject_to='fsaverage',
     comparisons between hemispheres, use of the symmetric ``fsaverage_sym``
     model is recommended to minimize bias [1]_.
 
+    The registration of volume source spaces is slow. If ``MNE_CACHE_DIR``
+    is set (see :func:`mne.set_cache_dir`), its result is saved there and
+    reused for identical MRIs and registration parameters.
+
     .. versionadded:: 0.17.0
 
     References
@@ -320,16 +328,20 @@ class SourceMorph(object):
         # used by both
         self.src_data = src_data
         self.verbose = verbose
+        # precomputed when applying a volume morph
+        self._vol_interpolator = None
+        self._vol_vertices_to = None
 
     @verbose
     def apply(self, stc_from, output='stc', mri_resolution=False,
-              mri_space=False, verbose=None):
+              mri_space=False, n_jobs=1, verbose=None):
         """Morph source space data.
 
         Parameters
         ----------
-        stc_from : VolSourceEstimate | VolVectorSourceEstimate | SourceEstimate | VectorSourceEstimate
-            The source estimate to morph.
+        stc_from : VolSourceEstimate | VolVectorSourceEstimate | SourceEstimate | VectorSourceEstimate | list | generator
+            The source estimate to morph. Can also be a list or a generator
+            of source estimates, see Notes.
         output : str
             Can be 'stc' (default), 'nifti1', or 'nifti2'.
             If a V
@@ -340,33 +352,50 @@ class SourceMorph(object):
         mri_space : bool
             Whether the image to world registration should be in mri space. The
             default is mri_space=mri_resolution.
+        n_jobs : int
+            Number of jobs to run in parallel when morphing a list or a
+            generator of surface source estimates.
+
+            .. versionadded:: 0.18
         %(verbose_meth)s
 
         Returns
         -------
-        stc_to : VolSourceEstimate | SourceEstimate | VectorSourceEstimate | Nifti1Image | Nifti2Image
-            The morphed source estimates.
+        stc_to : VolSourceEstimate | SourceEstimate | VectorSourceEstimate | Nifti1Image | Nifti2Image | list | generator
+            The morphed source estimates. A list (or a generator) is returned
+            if ``stc_from`` is a list (or a generator).
+
+        Notes
+        -----
+        When morphing a list of surface source estimates, the time courses
+        of all source estimates are concatenated and morphed with a single
+        sparse matrix product, split in ``n_jobs`` chunks of time points.
+        The data of the returned source estimates are views of this stacked
+        array. A generator of source estimates is consumed ``n_jobs``
+        source estimates at a time, so that the data of all source estimates
+        never need to be held in memory.
         """  # noqa: E501
-        stc = copy.deepcopy(stc_from)
-
         mri_space = mri_resolution if mri_space is None else mri_space
-        if stc.subject is None:
-            stc.subject = self.subject_from
-        if self.subject_from is None:
-            self.subject_from = stc.subject
-        if stc.subject != self.subject_from:
-            raise ValueError('stc_from.subject and '
-                             'morph.subject_from must match. (%s != %s)' %
-                             (stc.subject, self.subject_from))
         if not isinstance(output, str):
             raise TypeError('output must be str, got type %s (%s)'
                             % (type(output), output))
-        out = _apply_morph_data(self, stc)
-        if output != 'stc':  # convert to volume
-            out = _morphed_stc_as_volume(
-                self, out, mri_resolution=mri_resolution, mri_space=mri_space,
-                output=output)
-        return out
+
+        def _as_output(stc_to):
+            if output != 'stc':  # convert to volume
+                stc_to = _morphed_stc_as_volume(
+                    self, stc_to, mri_resolution=mri_resolution,
+                    mri_space=mri_space, output=output)
+            return stc_to
+
+        _validate_type(stc_from, (_BaseSourceEstimate, list, tuple, Iterator),
+                       'stc_from', 'source estimate, list or generator')
+        if isinstance(stc_from, (list, tuple)):
+            return [_as_output(stc_to) for stc_to in
+                    _apply_morph_data_list(self, stc_from, n_jobs)]
+        elif isinstance(stc_from, Iterator):
+            return (_as_output(stc_to) for stc_to in
+                    _iter_morph_data(self, stc_from, n_jobs))
+        return _as_output(_apply_morph_data_list(self, [stc_from])[0])
 
     def __repr__(self):  # noqa: D105
         s = u"%s" % self.kind
@@ -439,17 +468,24 @@ def read_source_morph(fname):
         The loaded morph.
     """
     vals = read_hdf5(fname)
-    if vals['pre_affine'] is not None:  # reconstruct
+    vals['pre_affine'], vals['sdr_morph'] = _reconstruct_sdr(
+        vals['pre_affine'], vals['sdr_morph'])
+    return SourceMorph(**vals)
+
+
+def _reconstruct_sdr(pre_affine, sdr_morph):
+    """Reconstruct the dipy classes of a volume morph from their dicts."""
+    if pre_affine is not None:
         from dipy.align.imaffine import AffineMap
-        affine = vals['pre_affine']
-        vals['pre_affine'] = AffineMap(None)
-        vals['pre_affine'].__dict__ = affine
-    if vals['sdr_morph'] is not None:
+        affine = pre_affine
+        pre_affine = AffineMap(None)
+        pre_affine.__dict__ = affine
+    if sdr_morph is not None:
         from dipy.align.imwarp import DiffeomorphicMap
-        morph = vals['sdr_morph']
-        vals['sdr_morph'] = DiffeomorphicMap(None, [])
-        vals['sdr_morph'].__dict__ = morph
-    return SourceMorph(**vals)
+        morph = sdr_morph
+        sdr_morph = DiffeomorphicMap(None, [])
+        sdr_morph.__dict__ = morph
+    return pre_affine, sdr_morph
 
 
 ###############################################################################
@@ -624,31 +660,25 @@ def _interpolate_data(stc, morph, mri_resolution=True, mri_space=True,
 
     # setup volume parameters
     n_times = stc.data.shape[1]
-    shape = (n_times,) + shape3d
-    vols = np.zeros(shape)
-
-    n_vertices_seen = 0
-    for this_inuse in inuse:
-        mask3d = this_inuse.reshape(shape3d).astype(np.bool)
-        n_vertices = np.sum(mask3d)
-        stc_slice = slice(n_vertices_seen, n_vertices_seen + n_vertices)
-
-        for k, vol in enumerate(vols):  # loop over time instants
-            vol[mask3d] = stc.data[stc_slice, k]
-
-        n_vertices_seen += n_vertices
 
     # use mri resolution as represented in src
     if mri_resolution:
+        # interpolate all time instants at once
         mri_shape3d = morph.src_data['src_shape_full']
-        mri_shape = (n_times,) + mri_shape3d
-        mri_vol = np.zeros(mri_shape)
-
-        interpolator = morph.src_data['interpolator']
-
-        for k, vol in enumerate(vols):
-            mri_vol[k] = (interpolator * vol.ravel()).reshape(mri_shape3d)
-        vols = mri_vol
+        keep, interpolator = _get_vol_interpolator(morph, inuse)
+        data = stc.data if keep is None else stc.data[keep]
+        vols = np.reshape((interpolator * data).T,
+                          (n_times,) + mri_shape3d)
+    else:
+        vols = np.zeros((n_times, np.prod(shape3d)))
+        n_vertices_seen = 0
+        for this_inuse in inuse:
+            vertices = np.flatnonzero(this_inuse)
+            stc_slice = slice(n_vertices_seen,
+                              n_vertices_seen + len(vertices))
+            vols[:, vertices] = stc.data[stc_slice].T
+            n_vertices_seen += len(vertices)
+        vols.shape = (n_times,) + shape3d
 
     vols = vols.T
 
@@ -682,6 +712,29 @@ def _interpolate_data(stc, morph, mri_resolution=True, mri_space=True,
     return img
 
 
+def _get_vol_interpolator(morph, inuse):
+    """Get the sparse matrix interpolating source voxels to MRI voxels."""
+    vol_interpolator = getattr(morph, '_vol_interpolator', None)
+    if vol_interpolator is None:
+        # only keep the columns of the voxels in use, in the order of the
+        # source estimate data (with overlapping sub-volumes, the last value
+        # of a voxel is used)
+        vertices = np.concatenate([np.flatnonzero(this_inuse)
+                                   for this_inuse in inuse])
+        keep = len(vertices) - 1 - np.unique(
+            vertices[::-1], return_index=True)[1]
+        if len(keep) == len(vertices):
+            keep = None
+        else:
+            keep = np.sort(keep)
+            vertices = vertices[keep]
+        vol_interpolator = (keep, sparse.csr_matrix(
+            morph.src_data['interpolator'][:, vertices]))
+        if isinstance(morph, SourceMorph):  # reused by subsequent applies
+            morph._vol_interpolator = vol_interpolator
+    return vol_interpolator
+
+
 ###############################################################################
 # Morph for VolSourceEstimate
 
@@ -706,6 +759,13 @@ def _compute_morph_sdr(mri_from, mri_to, niter_affine=(100, 100, 10),
         raise ValueError('zooms must be None, a singleton, or have shape (3,),'
                          ' got shape %s' % (zooms.shape,))
 
+    # the registration only depends on the MRIs and parameters
+    key = _sdr_key(mri_from, mri_to, niter_affine, niter_sdr, zooms)
+    sdr = _read_sdr(key)
+    if sdr is not None:
+        logger.info('Using cached registration')
+        return sdr
+
     # reslice mri_from
     mri_from_res, mri_from_res_affine = reslice(
         mri_from.get_data(), mri_from.affine, mri_from.header.get_zooms()[:3],
@@ -760,8 +820,41 @@ def _compute_morph_sdr(mri_from, mri_to, niter_affine=(100, 100, 10),
         metrics.CCMetric(3), list(niter_sdr))
     sdr_morph = sdr.optimize(mri_to, pre_affine.transform(mri_from))
     shape = tuple(sdr_morph.domain_shape)  # should be tuple of int
+    sdr = (shape, zooms, affine, pre_affine, sdr_morph)
+    _write_sdr(key, sdr)
     logger.info('done.')
-    return shape, zooms, affine, pre_affine, sdr_morph
+    return sdr
+
+
+def _sdr_key(mri_from, mri_to, niter_affine, niter_sdr, zooms):
+    """Hash everything that defines a volume registration."""
+    import dipy
+    from . import __version__
+    return '%032x' % object_hash([
+        __version__, dipy.__version__,
+        np.asarray(mri_from.dataobj), mri_from.affine,
+        np.asarray(mri_to.dataobj), mri_to.affine,
+        list(niter_affine), list(niter_sdr), zooms])
+
+
+def _read_sdr(key):
+    """Read a volume registration from MNE_CACHE_DIR."""
+    def read(fname):
+        vals = read_hdf5(fname)
+        pre_affine, sdr_morph = _reconstruct_sdr(vals['pre_affine'],
+                                                 vals['sdr_morph'])
+        return (tuple(int(s) for s in vals['shape']), vals['zooms'],
+                vals['affine'], pre_affine, sdr_morph)
+    return _read_cache_dir('sdr_morph', key, '.h5', read)
+
+
+def _write_sdr(key, sdr):
+    """Write a volume registration to MNE_CACHE_DIR."""
+    shape, zooms, affine, pre_affine, sdr_morph = sdr
+    _write_cache_dir('sdr_morph', key, '.h5', lambda fname: write_hdf5(
+        fname, dict(shape=np.array(shape), zooms=zooms, affine=affine,
+                    pre_affine=pre_affine.__dict__,
+                    sdr_morph=sdr_morph.__dict__), overwrite=True))
 
 
 ###############################################################################
@@ -991,16 +1084,6 @@ def _morph_buffer(data, idx_use, e, smooth, n_vertices, nearest, maps,
     data_morphed : array, or csr sparse matrix
         The morphed data (same type as input).
     """
-    # When operating on vector data, morph each dimension separately
-    if data.ndim == 3:
-        data_morphed = np.zeros((len(nearest), 3, data.shape[2]),
-                                dtype=data.dtype)
-        for dim in range(3):
-            data_morphed[:, dim, :] = _morph_buffer(
-                data=data[:, dim, :], idx_use=idx_use, e=e, smooth=smooth,
-                n_vertices=n_vertices, nearest=nearest, maps=maps, warn=warn)
-        return data_morphed
-
     n_iter = 99  # max nb of smoothing iterations (minus one)
     if smooth is not None:
         if smooth <= 0:
@@ -1009,56 +1092,46 @@ def _morph_buffer(data, idx_use, e, smooth, n_vertices, nearest, maps,
         smooth -= 1
     # make sure we're in CSR format
     e = e.tocsr()
+    shape = data.shape
     if sparse.issparse(data):
         use_sparse = True
-        if not isinstance(data, sparse.csr_matrix):
-            data = data.tocsr()
+        data = data.tocsr()
     else:
+        # When operating on vector data, morph all dimensions at once
         use_sparse = False
+        data = data.reshape(shape[0], -1)
+    # Only the first iteration needs to select the vertices with data. After
+    # that, the data are defined on all vertices (with zeros outside of the
+    # smoothed region), so the full edge matrix can be used and no
+    # intermediate product needs to be re-indexed.
+    this_e = e[:, idx_use]
 
-    done = False
     # do the smoothing
     for k in range(n_iter + 1):
         # get the row sum
         mult = np.zeros(e.shape[1])
         mult[idx_use] = 1
-        idx_use_data = idx_use
         data_sum = e * mult
 
         # new indices are non-zero sums
         idx_use = np.where(data_sum)[0]
 
-        # typically want to make the next iteration have these indices
-        idx_out = idx_use
+        # do standard smoothing multiplication and normalization
+        data = this_e * data
+        this_e = e
+        data_sum[data_sum == 0] = 1
+        if use_sparse:
+            data.data /= data_sum.repeat(np.diff(data.indptr))
+        else:
+            data /= data_sum[:, np.newaxis]
 
         # figure out if this is the last iteration
         if smooth is None:
             if k == n_iter or len(idx_use) >= n_vertices:
                 # stop when vertices filled
-                idx_out = None
-                done = True
+                break
         elif k == smooth:
-            idx_out = None
-            done = True
-
-        # do standard smoothing multiplication
-        data = _morph_mult(data, e, use_sparse, idx_use_data, idx_out)
-
-        if done is True:
             break
-
-        # do standard normalization
-        if use_sparse:
-            data.data /= data_sum[idx_use].repeat(np.diff(data.indptr))
-        else:
-            data /= data_sum[idx_use][:, None]
-
-    # do special normalization for last iteration
-    if use_sparse:
-        data_sum[data_sum == 0] = 1
-        data.data /= data_sum.repeat(np.diff(data.indptr))
-    else:
-        data[idx_use, :] /= data_sum[idx_use][:, None]
     if len(idx_use) != len(data_sum) and warn:
         warn_('%s/%s vertices not included in smoothing, consider increasing '
               'the number of steps'
@@ -1067,36 +1140,11 @@ def _morph_buffer(data, idx_use, e, smooth, n_vertices, nearest, maps,
     logger.info('    %d smooth iterations done.' % (k + 1))
 
     data_morphed = maps[nearest, :] * data
+    if not use_sparse:
+        data_morphed.shape = (len(nearest),) + shape[1:]
     return data_morphed
 
 
-def _morph_mult(data, e, use_sparse, idx_use_data, idx_use_out=None):
-    """Help morphing.
-
-    Equivalent to "data = (e[:, idx_use_data] * data)[idx_use_out]"
-    but faster.
-    """
-    if len(idx_use_data) < e.shape[1]:
-        if use_sparse:
-            data = e[:, idx_use_data] * data
-        else:
-            # constructing a new sparse matrix is faster than sub-indexing
-            # e[:, idx_use_data]!
-            col, row = np.meshgrid(np.arange(data.shape[1]), idx_use_data)
-            d_sparse = sparse.csr_matrix((data.ravel(),
-                                          (row.ravel(), col.ravel())),
-                                         shape=(e.shape[1], data.shape[1]))
-            data = e * d_sparse
-            data = np.asarray(data.todense())
-    else:
-        data = e * data
-
-    # trim data
-    if idx_use_out is not None:
-        data = data[idx_use_out]
-    return data
-
-
 def _sparse_argmax_nnz_row(csr_mat):
     """Return index of the maximum non-zero index in each row."""
     n_rows = csr_mat.shape[0]
@@ -1160,12 +1208,15 @@ def _apply_morph_data(morph, stc_from):
             return img_to
 
         # First get the vertices (vertices_to) you will need the values for
-        stc_ones = VolSourceEstimate(np.ones((stc_from.data.shape[0], 1),
-                                             stc_from.data.dtype),
-                                     stc_from.vertices,
-                                     tmin=0., tstep=1.)
-        img_to = _morph_one(stc_ones)
-        vertices_to = np.where(img_to.sum(axis=1) != 0)[0]
+        vertices_to = morph._vol_vertices_to
+        if vertices_to is None:
+            stc_ones = VolSourceEstimate(np.ones((stc_from.data.shape[0], 1),
+                                                 stc_from.data.dtype),
+                                         stc_from.vertices,
+                                         tmin=0., tstep=1.)
+            img_to = _morph_one(stc_ones)
+            vertices_to = np.where(img_to.sum(axis=1) != 0)[0]
+            morph._vol_vertices_to = vertices_to  # reused by later applies
         data = np.empty((len(vertices_to), n_times))
         data_from = np.reshape(stc_from.data, (stc_from.data.shape[0], -1))
         # Loop over time points to save memory
@@ -1176,34 +1227,96 @@ def _apply_morph_data(morph, stc_from):
             data[:, k] = this_img_to[vertices_to, 0]
         data.shape = (len(vertices_to),) + stc_from.data.shape[1:]
     else:
-        assert morph.kind == 'surface'
-        if not isinstance(stc_from, (SourceEstimate, VectorSourceEstimate)):
-            raise ValueError('stc_from was type %s but must be a surface '
-                             'source estimate' % (type(stc_from),))
-        morph_mat = morph.morph_mat
-        vertices_to = morph.vertices_to
-        for hemi, v1, v2 in zip(('left', 'right'),
-                                morph.src_data['vertices_from'],
-                                stc_from.vertices):
-            if not np.array_equal(v1, v2):
-                raise ValueError('vertices do not match between morph (%s) '
-                                 'and stc (%s) for the %s hemisphere:\n%s\n%s'
-                                 % (len(v1), len(v2), hemi, v1, v2))
-
-        # select correct data - since vertices_to can have empty hemispheres,
-        # the correct data needs to be selected in order to apply the morph_mat
-        # correctly
-        data = stc_from.data
-        # apply morph and return new morphed instance of (Vector)SourceEstimate
-        if isinstance(stc_from, VectorSourceEstimate):
-            # Morph the locations of the dipoles, but not their orientation
-            n_verts, _, n_samples = stc_from.data.shape
-            data = morph_mat * data.reshape(n_verts, 3 * n_samples)
-            data = data.reshape(morph_mat.shape[0], 3, n_samples)
-            klass = VectorSourceEstimate
-        else:
-            data = morph_mat * data
-            klass = SourceEstimate
+        return _apply_morph_data_list(morph, [stc_from])[0]
     stc_to = klass(data, vertices_to, stc_from.tmin, stc_from.tstep,
                    morph.subject_to)
     return stc_to
+
+
+def _check_morph_subject(morph, stc_from):
+    """Check (and set if unknown) the subject a source estimate is from."""
+    if morph.subject_from is None:
+        morph.subject_from = stc_from.subject
+    if stc_from.subject is not None and \
+            stc_from.subject != morph.subject_from:
+        raise ValueError('stc_from.subject and '
+                         'morph.subject_from must match. (%s != %s)' %
+                         (stc_from.subject, morph.subject_from))
+
+
+def _check_surface_vertices(morph, stc_from):
+    """Check that a source estimate can be morphed with morph.morph_mat."""
+    if not isinstance(stc_from, (SourceEstimate, VectorSourceEstimate)):
+        raise ValueError('stc_from was type %s but must be a surface '
+                         'source estimate' % (type(stc_from),))
+    for hemi, v1, v2 in zip(('left', 'right'),
+                            morph.src_data['vertices_from'],
+                            stc_from.vertices):
+        if not np.array_equal(v1, v2):
+            raise ValueError('vertices do not match between morph (%s) '
+                             'and stc (%s) for the %s hemisphere:\n%s\n%s'
+                             % (len(v1), len(v2), hemi, v1, v2))
+
+
+def _sparse_dot(morph_mat, data):
+    """Multiply data by a sparse matrix."""
+    return morph_mat * data
+
+
+def _apply_morph_data_list(morph, stcs_from, n_jobs=1):
+    """Morph a list of source estimates with a single matrix product."""
+    for stc_from in stcs_from:
+        _check_morph_subject(morph, stc_from)
+    if morph.kind == 'volume':
+        return [_apply_morph_data(morph, stc_from) for stc_from in stcs_from]
+    assert morph.kind == 'surface'
+    if len(stcs_from) == 0:
+        return list()
+    # source estimates of the same source space usually share their vertices
+    last_vertices = None
+    for stc_from in stcs_from:
+        if last_vertices is None or not all(
+                v1 is v2 for v1, v2 in zip(last_vertices, stc_from.vertices)):
+            _check_surface_vertices(morph, stc_from)
+            last_vertices = stc_from.vertices
+
+    # stack the time courses (and orientations, for vector source estimates:
+    # the locations of the dipoles are morphed, but not their orientation)
+    n_verts = morph.morph_mat.shape[1]
+    data = [stc_from.data.reshape(n_verts, -1) for stc_from in stcs_from]
+    bounds = np.cumsum([0] + [d.shape[1] for d in data])
+    data = data[0] if len(data) == 1 else np.concatenate(data, axis=1)
+    morph_mat = morph.morph_mat
+    if data.dtype == np.float32:  # keep single precision
+        morph_mat = morph_mat.astype(np.float32)
+    n_jobs = min(check_n_jobs(n_jobs), data.shape[1])
+    if n_jobs > 1:
+        parallel, p_fun, _ = parallel_func(_sparse_dot, n_jobs)
+        data = np.concatenate(parallel(
+            p_fun(morph_mat, d) for d in np.array_split(data, n_jobs, axis=1)),
+            axis=1)
+    else:
+        data = morph_mat * data
+
+    # return new morphed instances of (Vector)SourceEstimate
+    stcs_to = list()
+    for stc_from, start, stop in zip(stcs_from, bounds[:-1], bounds[1:]):
+        klass = VectorSourceEstimate if isinstance(
+            stc_from, VectorSourceEstimate) else SourceEstimate
+        this_data = data[:, start:stop].reshape(
+            (data.shape[0],) + stc_from.data.shape[1:])
+        stcs_to.append(klass(this_data, morph.vertices_to, stc_from.tmin,
+                             stc_from.tstep, morph.subject_to))
+    return stcs_to
+
+
+def _iter_morph_data(morph, stcs_from, n_jobs=1):
+    """Morph a generator of source estimates, n_jobs at a time."""
+    stcs_from = iter(stcs_from)
+    n_stcs = check_n_jobs(n_jobs)
+    while True:
+        stcs = list(islice(stcs_from, n_stcs))
+        if len(stcs) == 0:
+            break
+        for stc_to in _apply_morph_data_list(morph, stcs, n_jobs):
+            yield stc_to
@@ -9,6 +9,7 @@
 from inspect import isfunction
 from collections import namedtuple
 from copy import deepcopy
+from functools import partial
 from numbers import Integral
 from time import time
 
@@ -23,7 +24,7 @@ from .ecg import (qrs_detector, _get_ecg_channel_index, _make_ecg,
 from .eog import _find_eog_events, _get_eog_channel_index
 from .infomax_ import infomax
 
-from ..cov import compute_whitener
+from ..cov import compute_whitener, _CovAccumulator
 from .. import Covariance, Evoked
 from ..io.pick import (pick_types, pick_channels, pick_info,
                        _picks_to_idx, _DATA_CH_TYPES_SPLIT)
@@ -46,14 +47,15 @@ from ..channels.channels import _contains_ch_type, ContainsMixin
 from ..io.write import start_file, end_file, write_id
 from ..utils import (check_version, logger, check_fname, verbose,
                      _reject_data_segments, check_random_state, _validate_type,
-                     compute_corr, _get_inst_data, _ensure_int,
+                     _get_inst_data, _ensure_int,
                      copy_function_doc_to_method_doc, _pl, warn,
                      _check_preload, _check_compensation_grade, fill_doc,
-                     _check_option, _PCA)
+                     _check_option, _PCA, use_log_level)
 from ..utils.check import _check_all_same_channel_names
 
 from ..fixes import _get_args
 from ..filter import filter_data
+from ..parallel import parallel_func
 from .bads import find_outliers
 from .ctps_ import ctps
 from ..io.pick import channel_type, pick_channels_regexp
@@ -388,7 +390,7 @@ class ICA(ContainsMixin):
     @verbose
     def fit(self, inst, picks=None, start=None, stop=None, decim=None,
             reject=None, flat=None, tstep=2.0, reject_by_annotation=True,
-            verbose=None):
+            n_init=1, n_jobs=1, incremental=False, verbose=None):
         """Run the ICA decomposition on raw data.
 
         Caveat! If supplying a noise covariance keep track of the projections
@@ -442,6 +444,26 @@ class ICA(ContainsMixin):
 
             .. versionadded:: 0.14.0
 
+        n_init : int
+            Number of times the ICA algorithm is run with different random
+            initializations (drawn from ``random_state``). If larger than 1,
+            the most stable solution is kept, i.e. the one whose components
+            best match the components of the other runs on average.
+
+            .. versionadded:: 0.18
+        n_jobs : int
+            Number of ICA runs (see ``n_init``) to compute in parallel.
+
+            .. versionadded:: 0.18
+        incremental : bool
+            If True, the data covariance used for the PCA is accumulated over
+            blocks of Raw data read one at a time, and only the PCA sources
+            retained for ICA (``n_components``) are kept in memory. This
+            allows fitting ICA on recordings that do not fit in memory, e.g.
+            when ``inst`` is not preloaded. Only supported for Raw data.
+            Defaults to False.
+
+            .. versionadded:: 0.18
         %(verbose_meth)s
 
         Returns
@@ -450,17 +472,28 @@ class ICA(ContainsMixin):
             Returns the modified instance.
         """
         _validate_type(inst, (BaseRaw, BaseEpochs), 'inst', 'Raw or Epochs')
+        n_init = _ensure_int(n_init, 'n_init')
+        if n_init < 1:
+            raise ValueError('n_init must be at least 1, got %s' % (n_init,))
+        if incremental and not isinstance(inst, BaseRaw):
+            raise ValueError('incremental fitting is only supported for Raw '
+                             'data, got %s' % (type(inst).__name__,))
         picks = _picks_to_idx(inst.info, picks, allow_empty=False,
                               with_ref_meg=self.allow_ref_meg)
         _check_for_unsupported_ica_channels(
             picks, inst.info, allow_ref_meg=self.allow_ref_meg)
 
         t_start = time()
-        if isinstance(inst, BaseRaw):
+        if incremental:
+            self._fit_raw_incremental(inst, picks, start, stop, decim, reject,
+                                      flat, tstep, reject_by_annotation,
+                                      n_init, n_jobs)
+        elif isinstance(inst, BaseRaw):
             self._fit_raw(inst, picks, start, stop, decim, reject, flat,
-                          tstep, reject_by_annotation, verbose)
+                          tstep, reject_by_annotation, n_init, n_jobs,
+                          verbose)
         elif isinstance(inst, BaseEpochs):
-            self._fit_epochs(inst, picks, decim, verbose)
+            self._fit_epochs(inst, picks, decim, n_init, n_jobs, verbose)
 
         # sort ICA components by explained variance
         var = _ica_explained_variance(self, inst)
@@ -486,7 +519,7 @@ class ICA(ContainsMixin):
             del self.reject_
 
     def _fit_raw(self, raw, picks, start, stop, decim, reject, flat, tstep,
-                 reject_by_annotation, verbose):
+                 reject_by_annotation, n_init, n_jobs, verbose):
         """Aux method."""
         if self.current_fit != 'unfitted':
             self._reset()
@@ -523,11 +556,107 @@ class ICA(ContainsMixin):
         # this may operate inplace or make a copy
         data, self.pre_whitener_ = self._pre_whiten(data, raw.info, picks)
 
-        self._fit(data, self.max_pca_components, 'raw')
+        self._fit(data, self.max_pca_components, 'raw', n_init, n_jobs)
+
+        return self
+
+    def _fit_raw_incremental(self, raw, picks, start, stop, decim, reject,
+                             flat, tstep, reject_by_annotation, n_init,
+                             n_jobs):
+        """Fit ICA on raw data read block by block."""
+        if self.current_fit != 'unfitted':
+            self._reset()
+
+        logger.info('Fitting ICA incrementally to data using %i channels '
+                    '(please be patient, this may take a while)' % len(picks))
+
+        if self.max_pca_components is None:
+            self.max_pca_components = len(picks)
+            logger.info('Inferring max_pca_components from picks')
+
+        self.info = pick_info(raw.info, picks)
+        if self.info['comps']:
+            self.info['comps'] = []
+        self.ch_names = self.info['ch_names']
+        start, stop = _check_start_stop(raw, start, stop)
+        start = 0 if start is None else start
+        stop = len(raw.times) if stop is None else stop
+        if reject is not None or flat is not None:
+            self.reject_ = reject
+        blocks = partial(_iter_ica_raw_blocks, raw, picks, start, stop, decim,
+                         reject, flat, tstep, reject_by_annotation, self.info)
+
+        # first pass: accumulate the mean and scatter matrix of the data
+        acc = _CovAccumulator(len(picks))
+        drop_inds = list()
+        for data in blocks(drop_inds):
+            acc.update(data)
+        n_samples, mean, scatter = acc.n_samples, acc.mean, acc.scatter
+        if (reject is not None) or (flat is not None):
+            self.drop_inds_ = drop_inds
+        if n_samples < 2:
+            raise RuntimeError('Not enough clean samples (%d) to fit ICA'
+                               % (n_samples,))
+        self.n_samples_ = n_samples
+
+        # pre-whitening
+        if self.noise_cov is None:
+            pre_whitener = np.empty([len(picks), 1])
+            for this_picks in _get_ch_type_picks(self.info):
+                # pooled variance across the channels of this type
+                var = (np.trace(scatter[np.ix_(this_picks, this_picks)]) +
+                       n_samples * np.sum((mean[this_picks] -
+                                           mean[this_picks].mean()) ** 2))
+                var /= n_samples * len(this_picks)
+                pre_whitener[this_picks] = np.sqrt(var)
+        else:
+            pre_whitener, _ = compute_whitener(self.noise_cov, raw.info,
+                                               picks)
+        self.pre_whitener_ = pre_whitener
+        whitener, _ = self._get_whitener_matrix()
+
+        # PCA from the covariance of the pre-whitened data
+        cov = np.dot(np.dot(whitener, scatter), whitener.T)
+        cov /= n_samples - 1
+        mean = np.dot(whitener, mean)
+        explained_variance, components = linalg.eigh(cov)
+        explained_variance = np.maximum(explained_variance[::-1], 0.)
+        components = components[:, ::-1].T
+        # flip eigenvectors' sign to enforce deterministic output
+        max_abs = np.argmax(np.abs(components), axis=1)
+        components *= np.sign(
+            components[np.arange(len(components)), max_abs])[:, np.newaxis]
+        explained_variance_ratio = \
+            explained_variance / explained_variance.sum()
+        n_pca = self.max_pca_components
+        self._set_pca(mean, components[:n_pca], explained_variance[:n_pca],
+                      explained_variance_ratio[:n_pca])
+
+        # second pass: compute the whitened PCA sources kept for ICA
+        norm = np.sqrt(self.pca_explained_variance_[:self.n_components_])
+        op = np.dot(self.pca_components_[:self.n_components_], whitener)
+        op /= norm[:, np.newaxis]
+        offset = -np.dot(self.pca_components_[:self.n_components_], mean)
+        offset /= norm
+        data_pca = np.empty((n_samples, self.n_components_))
+        idx = 0
+        with use_log_level(False):
+            for data in blocks(list()):
+                data_pca[idx:idx + data.shape[1]] = np.dot(data.T, op.T)
+                idx += data.shape[1]
+        assert idx == n_samples
+        data_pca += offset
+        # flip signs as done for the PCA of the whole data (based on sources)
+        signs = np.sign(data_pca[np.argmax(np.abs(data_pca), axis=0),
+                                 np.arange(self.n_components_)])
+        data_pca *= signs
+        self.pca_components_[:self.n_components_] *= signs[:, np.newaxis]
+
+        self._fit_ica(np.ascontiguousarray(data_pca), 'raw', n_init, n_jobs)
 
         return self
 
-    def _fit_epochs(self, epochs, picks, decim, verbose):
+    def _fit_epochs(self, epochs, picks, decim, n_init, n_jobs, verbose):
         """Aux method."""
         if self.current_fit != 'unfitted':
             self._reset()
@@ -559,7 +688,7 @@ class ICA(ContainsMixin):
         data, self.pre_whitener_ = \
             self._pre_whiten(np.hstack(data), epochs.info, picks)
 
-        self._fit(data, self.max_pca_components, 'epochs')
+        self._fit(data, self.max_pca_components, 'epochs', n_init, n_jobs)
 
         return self
 
@@ -569,29 +698,9 @@ class ICA(ContainsMixin):
         if not has_pre_whitener and self.noise_cov is None:
             # use standardization as whitener
             # Scale (z-score) the data by channel type
-            info = pick_info(info, picks)
             pre_whitener = np.empty([len(data), 1])
-            for ch_type in _DATA_CH_TYPES_SPLIT + ('eog', "ref_meg"):
-                if _contains_ch_type(info, ch_type):
-                    if ch_type == 'seeg':
-                        this_picks = pick_types(info, meg=False, seeg=True)
-                    elif ch_type == 'ecog':
-                        this_picks = pick_types(info, meg=False, ecog=True)
-                    elif ch_type == 'eeg':
-                        this_picks = pick_types(info, meg=False, eeg=True)
-                    elif ch_type in ('mag', 'grad'):
-                        this_picks = pick_types(info, meg=ch_type)
-                    elif ch_type == 'eog':
-                        this_picks = pick_types(info, meg=False, eog=True)
-                    elif ch_type in ('hbo', 'hbr'):
-                        this_picks = pick_types(info, meg=False, fnirs=ch_type)
-                    elif ch_type == 'ref_meg':
-                        this_picks = pick_types(info, meg=False, ref_meg=True)
-                    else:
-                        raise RuntimeError('Should not be reached.'
-                                           'Unsupported channel {}'
-                                           .format(ch_type))
-                    pre_whitener[this_picks] = np.std(data[this_picks])
+            for this_picks in _get_ch_type_picks(pick_info(info, picks)):
+                pre_whitener[this_picks] = np.std(data[this_picks])
             data /= pre_whitener
         elif not has_pre_whitener and self.noise_cov is not None:
             pre_whitener, _ = compute_whitener(self.noise_cov, info, picks)
@@ -606,14 +715,22 @@ class ICA(ContainsMixin):
 
         return data, pre_whitener
 
-    def _fit(self, data, max_pca_components, fit_type):
+    def _fit(self, data, max_pca_components, fit_type, n_init=1, n_jobs=1):
         """Aux function."""
-        random_state = check_random_state(self.random_state)
         pca = _PCA(n_components=max_pca_components, whiten=True)
         data = pca.fit_transform(data.T)
+        self._set_pca(pca.mean_, pca.components_, pca.explained_variance_,
+                      pca.explained_variance_ratio_)
+        del pca
+        # the memory layout of the data can change the ICA solution
+        self._fit_ica(np.ascontiguousarray(data[:, :self.n_components_]),
+                      fit_type, n_init, n_jobs)
 
+    def _set_pca(self, mean, components, explained_variance,
+                 explained_variance_ratio):
+        """Store the PCA and select the number of ICA components."""
         if isinstance(self.n_components, float):
-            n_components_ = np.sum(pca.explained_variance_ratio_.cumsum() <=
+            n_components_ = np.sum(explained_variance_ratio.cumsum() <=
                                    self.n_components)
             if n_components_ < 1:
                 raise RuntimeError('One PCA component captures most of the '
@@ -630,14 +747,13 @@ class ICA(ContainsMixin):
                             self.n_components)
             else:  # None case
                 logger.info('Using all PCA components: %i'
-                            % len(pca.components_))
-                sel = slice(len(pca.components_))
+                            % len(components))
+                sel = slice(len(components))
 
         # the things to store for PCA
-        self.pca_mean_ = pca.mean_
-        self.pca_components_ = pca.components_
-        self.pca_explained_variance_ = exp_var = pca.explained_variance_
-        del pca
+        self.pca_mean_ = mean
+        self.pca_components_ = components
+        self.pca_explained_variance_ = explained_variance
         # update number of components
         self.n_components_ = sel.stop
         self._update_ica_names()
@@ -645,24 +761,26 @@ class ICA(ContainsMixin):
             if self.n_pca_components > len(self.pca_components_):
                 self.n_pca_components = len(self.pca_components_)
 
-        # take care of ICA
-        if self.method == 'fastica':
-            from sklearn.decomposition import FastICA
-            ica = FastICA(whiten=False, random_state=random_state,
-                          **self.fit_params)
-            ica.fit(data[:, sel])
-            self.unmixing_matrix_ = ica.components_
-        elif self.method in ('infomax', 'extended-infomax'):
-            self.unmixing_matrix_ = infomax(data[:, sel],
-                                            random_state=random_state,
-                                            **self.fit_params)
-        elif self.method == 'picard':
-            from picard import picard
-            _, W, _ = picard(data[:, sel].T, whiten=False,
-                             random_state=random_state, **self.fit_params)
-            del _
-            self.unmixing_matrix_ = W
-        self.unmixing_matrix_ /= np.sqrt(exp_var[sel])[None, :]  # whitening
+    def _fit_ica(self, data, fit_type, n_init, n_jobs):
+        """Fit ICA on the (whitened) PCA sources."""
+        random_state = check_random_state(self.random_state)
+        if n_init == 1:
+            self.unmixing_matrix_ = _ica_unmixing(
+                data, self.method, self.fit_params, random_state)
+        else:
+            logger.info('Running ICA %d times' % (n_init,))
+            seeds = random_state.randint(np.iinfo(np.int32).max, size=n_init)
+            parallel, p_fun, _ = parallel_func(_ica_unmixing, n_jobs)
+            unmixings = parallel(p_fun(data, self.method, self.fit_params,
+                                       seed) for seed in seeds)
+            best, scores = _most_stable_unmixing(unmixings)
+            logger.info('Using run %d, whose components match those of the '
+                        'other runs with a mean |r| of %0.3f'
+                        % (best + 1, scores[best]))
+            self.unmixing_matrix_ = unmixings[best]
+        # whitening
+        self.unmixing_matrix_ /= np.sqrt(
+            self.pca_explained_variance_[:self.n_components_])[None, :]
         self.mixing_matrix_ = linalg.pinv(self.unmixing_matrix_)
         self.current_fit = fit_type
 
@@ -681,7 +799,15 @@ class ICA(ContainsMixin):
         sources = np.dot(self.unmixing_matrix_, pca_data)
         return sources
 
-    def _transform_raw(self, raw, start, stop, reject_by_annotation=False):
+    def _get_whitener_matrix(self):
+        """Get the pre-whitening as a matrix and its inverse."""
+        if self.noise_cov is None:
+            pre_whitener = self.pre_whitener_[:, 0]
+            return np.diag(1. / pre_whitener), np.diag(pre_whitener)
+        return self.pre_whitener_, linalg.pinv(self.pre_whitener_, cond=1e-14)
+
+    def _transform_raw(self, raw, start, stop, reject_by_annotation=False,
+                       n_jobs=1):
         """Transform raw data."""
         if not hasattr(self, 'mixing_matrix_'):
             raise RuntimeError('No fit available. Please fit ICA.')
@@ -696,12 +822,36 @@ class ICA(ContainsMixin):
                                'ica.ch_names' % (len(self.ch_names),
                                                  len(picks)))
 
-        if reject_by_annotation:
-            data = raw.get_data(picks, start, stop, 'omit')
-        else:
-            data = raw[picks, start:stop][0]
-        data, _ = self._pre_whiten(data, raw.info, picks)
-        return self._transform(data)
+        start = 0 if start is None else start
+        stop = len(raw.times) if stop is None else stop
+
+        # pre-whitening, PCA and unmixing fused into a single operator
+        whitener, _ = self._get_whitener_matrix()
+        unmixing = np.dot(self.unmixing_matrix_,
+                          self.pca_components_[:self.n_components_])
+        op = np.dot(unmixing, whitener)
+        offset = np.zeros(len(op))
+        if self.pca_mean_ is not None:
+            offset -= np.dot(unmixing, self.pca_mean_)
+
+        # process the data in chunks to limit memory usage, in parallel when
+        # the data need to be read from disk
+        bounds = np.append(np.arange(start, stop, _apply_chunk_size(raw)),
+                           stop)
+        if raw.preload:
+            n_jobs = 1
+        parallel, p_fun, n_jobs = parallel_func(_transform_raw_chunk, n_jobs)
+        if n_jobs == 1 and not reject_by_annotation:
+            sources = np.empty((len(op), stop - start))
+            for c_start, c_stop in zip(bounds[:-1], bounds[1:]):
+                sources[:, c_start - start:c_stop - start] = \
+                    _transform_raw_chunk(raw, picks, c_start, c_stop, False,
+                                         op, offset)
+            return sources
+        sources = parallel(p_fun(raw, picks, c_start, c_stop,
+                                 reject_by_annotation, op, offset)
+                           for c_start, c_stop in zip(bounds[:-1], bounds[1:]))
+        return np.concatenate(sources, axis=1)
 
     def _transform_epochs(self, epochs, concatenate):
         """Aux method."""
@@ -759,7 +909,8 @@ class ICA(ContainsMixin):
         return np.dot(self.mixing_matrix_[:, :self.n_components_].T,
                       self.pca_components_[:self.n_components_]).T
 
-    def get_sources(self, inst, add_channels=None, start=None, stop=None):
+    def get_sources(self, inst, add_channels=None, start=None, stop=None,
+                    n_jobs=1):
         """Estimate sources given the unmixing matrix.
 
         This method will return the sources in the container format passed.
@@ -782,6 +933,11 @@ class ICA(ContainsMixin):
         stop : int | float | None
             Last sample to not include. If float, data will be interpreted as
             time in seconds. If None, the entire data will be used.
+        n_jobs : int
+            Number of jobs to run in parallel when computing the sources of
+            Raw data that are not preloaded.
+
+            .. versionadded:: 0.18
 
         Returns
         -------
@@ -791,7 +947,8 @@ class ICA(ContainsMixin):
         if isinstance(inst, BaseRaw):
             _check_compensation_grade(self.info, inst.info, 'ICA', 'Raw',
                                       ch_names=self.ch_names)
-            sources = self._sources_as_raw(inst, add_channels, start, stop)
+            sources = self._sources_as_raw(inst, add_channels, start, stop,
+                                           n_jobs)
         elif isinstance(inst, BaseEpochs):
             _check_compensation_grade(self.info, inst.info, 'ICA', 'Epochs',
                                       ch_names=self.ch_names)
@@ -805,10 +962,11 @@ class ICA(ContainsMixin):
                              'type')
         return sources
 
-    def _sources_as_raw(self, raw, add_channels, start, stop):
+    def _sources_as_raw(self, raw, add_channels, start, stop, n_jobs=1):
         """Aux method."""
         # merge copied instance and picked data with sources
-        sources = self._transform_raw(raw, start=start, stop=stop)
+        sources = self._transform_raw(raw, start=start, stop=stop,
+                                      n_jobs=n_jobs)
         if raw.preload:  # get data and temporarily delete
             data = raw._data
             del raw._data
@@ -1382,12 +1540,25 @@ class ICA(ContainsMixin):
         picks = pick_types(raw.info, meg=False, include=self.ch_names,
                            exclude='bads', ref_meg=False)
 
-        data = raw[picks, start:stop][0]
-        data, _ = self._pre_whiten(data, raw.info, picks)
-
-        data = self._pick_sources(data, include, exclude)
+        start = 0 if start is None else start
+        stop = len(raw.times) if stop is None else stop
 
-        raw[picks, start:stop] = data
+        # pre-whitening, projection and re-coloring fused into one operator
+        whitener, colorer = self._get_whitener_matrix()
+        proj_mat = self._get_proj_mat(include, exclude)
+        op = np.dot(colorer, np.dot(proj_mat, whitener))
+        offset = np.zeros(len(op))
+        if self.pca_mean_ is not None:
+            offset += np.dot(colorer, self.pca_mean_ -
+                             np.dot(proj_mat, self.pca_mean_))
+
+        # process the data in chunks to limit memory usage
+        step = _apply_chunk_size(raw)
+        for c_start in range(start, stop, step):
+            c_stop = min(c_start + step, stop)
+            data = np.dot(op, raw._data[picks, c_start:c_stop])
+            data += offset[:, np.newaxis]
+            raw._data[picks, c_start:c_stop] = data
         return raw
 
     def _apply_epochs(self, epochs, include, exclude, n_pca_components):
@@ -1451,6 +1622,26 @@ class ICA(ContainsMixin):
 
     def _pick_sources(self, data, include, exclude):
         """Aux function."""
+        proj_mat = self._get_proj_mat(include, exclude)
+
+        if self.pca_mean_ is not None:
+            data -= self.pca_mean_[:, None]
+
+        data = np.dot(proj_mat, data)
+
+        if self.pca_mean_ is not None:
+            data += self.pca_mean_[:, None]
+
+        # restore scaling
+        if self.noise_cov is None:  # revert standardization
+            data *= self.pre_whitener_
+        else:
+            data = np.dot(linalg.pinv(self.pre_whitener_, cond=1e-14), data)
+
+        return data
+
+    def _get_proj_mat(self, include, exclude):
+        """Get the projection on the kept components in pre-whitened space."""
         if exclude is None:
             exclude = self.exclude
         else:
@@ -1465,10 +1656,6 @@ class ICA(ContainsMixin):
         n_components = self.n_components_
         logger.info('Transforming to ICA space (%i components)' % n_components)
 
-        # Apply first PCA
-        if self.pca_mean_ is not None:
-            data -= self.pca_mean_[:, None]
-
         sel_keep = np.arange(n_components)
         if include not in (None, []):
             sel_keep = np.unique(include)
@@ -1490,20 +1677,7 @@ class ICA(ContainsMixin):
             sel_keep = np.concatenate(
                 (sel_keep, range(n_components, _n_pca_comp)))
 
-        proj_mat = np.dot(mixing[:, sel_keep], unmixing[sel_keep, :])
-
-        data = np.dot(proj_mat, data)
-
-        if self.pca_mean_ is not None:
-            data += self.pca_mean_[:, None]
-
-        # restore scaling
-        if self.noise_cov is None:  # revert standardization
-            data *= self.pre_whitener_
-        else:
-            data = np.dot(linalg.pinv(self.pre_whitener_, cond=1e-14), data)
-
-        return data
+        return np.dot(mixing[:, sel_keep], unmixing[sel_keep, :])
 
     @verbose
     def save(self, fname):
@@ -1725,6 +1899,123 @@ class ICA(ContainsMixin):
         return _n_pca_comp
 
 
+def _get_ch_type_picks(info):
+    """Get the picks of each channel type that is standardized separately."""
+    out = list()
+    for ch_type in _DATA_CH_TYPES_SPLIT + ('eog', "ref_meg"):
+        if _contains_ch_type(info, ch_type):
+            if ch_type == 'seeg':
+                this_picks = pick_types(info, meg=False, seeg=True)
+            elif ch_type == 'ecog':
+                this_picks = pick_types(info, meg=False, ecog=True)
+            elif ch_type == 'eeg':
+                this_picks = pick_types(info, meg=False, eeg=True)
+            elif ch_type in ('mag', 'grad'):
+                this_picks = pick_types(info, meg=ch_type)
+            elif ch_type == 'eog':
+                this_picks = pick_types(info, meg=False, eog=True)
+            elif ch_type in ('hbo', 'hbr'):
+                this_picks = pick_types(info, meg=False, fnirs=ch_type)
+            elif ch_type == 'ref_meg':
+                this_picks = pick_types(info, meg=False, ref_meg=True)
+            else:
+                raise RuntimeError('Should not be reached.'
+                                   'Unsupported channel {}'
+                                   .format(ch_type))
+            out.append(this_picks)
+    return out
+
+
+def _iter_ica_raw_blocks(raw, picks, start, stop, decim, reject, flat, tstep,
+                         reject_by_annotation, info, drop_inds):
+    """Yield the blocks of Raw data used to fit ICA incrementally."""
+    decim = 1 if decim is None else decim
+    reject_by_annotation = 'omit' if reject_by_annotation else None
+    # data are passed on in whole (decimated) rejection segments, the
+    # remaining samples being carried over to the next block
+    step = 1
+    if (reject is not None) or (flat is not None):
+        step = int(np.ceil(np.ceil(tstep * raw.info['sfreq']) / decim))
+    n_read = n_seen = 0  # samples read, and kept by decimation, so far
+    carry = np.zeros((len(picks), 0))
+    for b_start in range(start, stop, _apply_chunk_size(raw)):
+        data = raw.get_data(picks, b_start,
+                            min(b_start + _apply_chunk_size(raw), stop),
+                            reject_by_annotation)
+        n_read_block = data.shape[1]
+        data = np.concatenate([carry, data[:, (-n_read) % decim::decim]],
+                              axis=1)
+        n_read += n_read_block
+        n_use = (data.shape[1] // step) * step
+        data, carry = data[:, :n_use], data[:, n_use:]
+        if n_use == 0:
+            continue
+        if (reject is not None) or (flat is not None):
+            try:
+                data, this_drop_inds = _reject_data_segments(
+                    data, reject, flat, decim, info, tstep)
+            except RuntimeError:  # no clean segment in this block
+                data = data[:, :0]
+                this_drop_inds = [(first, first + step)
+                                  for first in range(0, n_use, step)]
+            drop_inds.extend((first + n_seen, last + n_seen)
+                             for first, last in this_drop_inds)
+        n_seen += n_use
+        if data.shape[1] > 0:
+            yield data
+
+
+def _apply_chunk_size(raw):
+    """Get the number of samples to process at once (about 10 sec)."""
+    return max(int(round(10. * raw.info['sfreq'])), 1)
+
+
+def _transform_raw_chunk(raw, picks, start, stop, reject_by_annotation, op,
+                         offset):
+    """Compute the ICA sources of a chunk of raw data."""
+    if reject_by_annotation:
+        data = raw.get_data(picks, start, stop, 'omit')
+    else:
+        data = raw[picks, start:stop][0]
+    sources = np.dot(op, data)
+    sources += offset[:, np.newaxis]
+    return sources
+
+
+def _ica_unmixing(data, method, fit_params, random_state):
+    """Compute the ICA unmixing matrix of whitened data."""
+    if method == 'fastica':
+        from sklearn.decomposition import FastICA
+        ica = FastICA(whiten=False, random_state=random_state, **fit_params)
+        ica.fit(data)
+        unmixing = ica.components_
+    elif method in ('infomax', 'extended-infomax'):
+        unmixing = infomax(data, random_state=random_state, **fit_params)
+    elif method == 'picard':
+        from picard import picard
+        _, unmixing, _ = picard(data.T, whiten=False,
+                                random_state=random_state, **fit_params)
+        del _
+    return unmixing
+
+
+def _most_stable_unmixing(unmixings):
+    """Find the ICA solution whose components best match the other ones."""
+    # The data are white, so the correlation between two sources is the dot
+    # product of their (normalized) unmixing vectors
+    unmixings = [u / np.linalg.norm(u, axis=1, keepdims=True)
+                 for u in unmixings]
+    n_init = len(unmixings)
+    sim = np.zeros((n_init, n_init))
+    for ii in range(n_init):
+        for jj in range(ii + 1, n_init):
+            corr = np.abs(np.dot(unmixings[ii], unmixings[jj].T))
+            sim[ii, jj] = corr.max(axis=1).mean()
+            sim[jj, ii] = corr.max(axis=0).mean()
+    scores = sim.sum(axis=1) / (n_init - 1)
+    return np.argmax(scores), scores
+
+
 def _check_start_stop(raw, start, stop):
     """Aux function."""
     out = list()
@@ -2369,9 +2660,8 @@ def _band_pass_filter(ica, sources, target, l_freq, h_freq, verbose=None):
 # #############################################################################
 # CORRMAP
 
-def _find_max_corrs(all_maps, target, threshold):
+def _find_max_corrs(all_maps, target, threshold, all_corrs):
     """Compute correlations between template and target components."""
-    all_corrs = [compute_corr(target, subj.T) for subj in all_maps]
     abs_corrs = [np.abs(a) for a in all_corrs]
     corr_polarities = [np.sign(a) for a in all_corrs]
 
@@ -2394,11 +2684,10 @@ def _find_max_corrs(all_maps, target, threshold):
 
     if len(maxmaps) == 0:
         return [], 0, 0, []
-    newtarget = np.zeros(maxmaps[0].size)
-    std_of_maps = np.std(np.asarray(maxmaps))
-    mean_of_maps = np.std(np.asarray(maxmaps))
-    for maxmap, polarity in zip(maxmaps, polarities):
-        newtarget += (maxmap / std_of_maps - mean_of_maps) * polarity
+    maxmaps = np.array(maxmaps)
+    std_of_maps = np.std(maxmaps)
+    mean_of_maps = np.std(maxmaps)
+    newtarget = np.dot(polarities, maxmaps / std_of_maps - mean_of_maps)
 
     newtarget /= len(maxmaps)
     newtarget *= std_of_maps
@@ -2408,10 +2697,31 @@ def _find_max_corrs(all_maps, target, threshold):
     return newtarget, median_corr_with_target, sim_i_o, max_corrs
 
 
+def _find_max_corrs_thresholds(all_maps, target, thresholds, all_corrs):
+    """Find the components matching a template for several thresholds."""
+    return [_find_max_corrs(all_maps, target, threshold, all_corrs)
+            for threshold in thresholds]
+
+
+def _corrmap_paths(all_maps, norm_maps, target, thresholds, n_jobs):
+    """Match the components of all ICAs to a template for each threshold."""
+    # correlations with all (normalized) maps at once
+    norm_target = target - np.mean(target)
+    norm_target /= np.linalg.norm(norm_target)
+    all_corrs = np.split(np.dot(norm_maps, norm_target),
+                         np.cumsum([len(maps) for maps in all_maps])[:-1])
+    parallel, p_fun, n_jobs = parallel_func(
+        _find_max_corrs_thresholds, min(n_jobs, len(thresholds)))
+    paths = parallel(p_fun(all_maps, target, these_thresholds, all_corrs)
+                     for these_thresholds in np.array_split(thresholds,
+                                                            n_jobs))
+    return sum(paths, list())
+
+
 @verbose
 def corrmap(icas, template, threshold="auto", label=None, ch_type="eeg",
             plot=True, show=True, verbose=None, outlines='head', layout=None,
-            sensors=True, contours=6, cmap=None):
+            sensors=True, contours=6, cmap=None, n_jobs=1):
     """Find similar Independent Components across subjects by map similarity.
 
     Corrmap (Viola et al. 2009 Clin Neurophysiol) identifies the best group
@@ -2495,6 +2805,10 @@ def corrmap(icas, template, threshold="auto", label=None, ch_type="eeg",
     cmap : None | matplotlib colormap
         Colormap for the plot. If ``None``, defaults to 'Reds_r' for norm data,
         otherwise to 'RdBu_r'.
+    n_jobs : int
+        Number of jobs to run in parallel when several thresholds are tried.
+
+        .. versionadded:: 0.18
 
     Returns
     -------
@@ -2517,6 +2831,11 @@ def corrmap(icas, template, threshold="auto", label=None, ch_type="eeg",
         threshold = np.arange(60, 95, dtype=np.float64) / 100.
 
     all_maps = [ica.get_components().T for ica in icas]
+    # the maps of all ICAs are stacked and normalized, so that correlations
+    # with a template are computed with a single matrix product
+    norm_maps = np.concatenate(all_maps)
+    norm_maps = norm_maps - norm_maps.mean(axis=1, keepdims=True)
+    norm_maps /= np.linalg.norm(norm_maps, axis=1, keepdims=True)
 
     # check if template is an index to one IC in one ICA object, or an array
     if len(template) == 2:
@@ -2552,9 +2871,11 @@ def corrmap(icas, template, threshold="auto", label=None, ch_type="eeg",
             logger.info('No component detected using find_outliers.'
                         ' Consider using threshold="auto"')
             return icas
-        nt, mt, s, mx = _find_max_corrs(all_maps, target, threshold)
+        nt, mt, s, mx = _corrmap_paths(all_maps, norm_maps, target,
+                                       [threshold], n_jobs)[0]
     elif len(threshold) > 1:
-        paths = [_find_max_corrs(all_maps, target, t) for t in threshold]
+        paths = _corrmap_paths(all_maps, norm_maps, target, threshold,
+                               n_jobs)
         # find iteration with highest avg correlation with target
         nt, mt, s, mx = paths[np.argmax([path[2] for path in paths])]
 
@@ -2565,9 +2886,10 @@ def corrmap(icas, template, threshold="auto", label=None, ch_type="eeg",
                 logger.info('No component detected using find_outliers. '
                             'Consider using threshold="auto"')
             return icas
-        nt, mt, s, mx = _find_max_corrs(all_maps, nt, threshold)
+        nt, mt, s, mx = _corrmap_paths(all_maps, norm_maps, nt,
+                                       [threshold], n_jobs)[0]
     elif len(threshold) > 1:
-        paths = [_find_max_corrs(all_maps, nt, t) for t in threshold]
+        paths = _corrmap_paths(all_maps, norm_maps, nt, threshold, n_jobs)
         # find iteration with highest avg correlation with target
         nt, mt, s, mx = paths[np.argmax([path[1] for path in paths])]
 
@@ -28,9 +28,12 @@ from ..io.meas_info import _simplify_info
 from ..io.proc_history import _read_ctc
 from ..io.write import _generate_meas_id, DATE_NONE
 from ..io import _loc_to_coil_trans, _coil_trans_to_loc, BaseRaw
+from ..io.base import _allocate_data
 from ..io.pick import pick_types, pick_info
 from ..utils import (verbose, logger, _clean_names, warn, _time_mask, _pl,
-                     _check_option)
+                     _check_option, object_hash, _LRUCache, _read_cache_dir,
+                     _write_cache_dir)
+from ..parallel import check_n_jobs, parallel_func
 from ..fixes import _get_args, _safe_svd, einsum
 from ..channels.channels import _get_T1T2_mag_inds
 
@@ -39,6 +42,11 @@ from ..channels.channels import _get_T1T2_mag_inds
 # truncated versions of constants (e.g., μ0), which could lead to small
 # differences between algorithms
 
+# Cache of the SSS basis decompositions, which are reused for identical head
+# positions and parameters across calls (see _get_decomp). When MNE_CACHE_DIR
+# is set, they are also persisted there to be reused by other processes.
+_decomp_cache = _LRUCache()
+
 
 @verbose
 def maxwell_filter(raw, origin='auto', int_order=8, ext_order=3,
@@ -46,7 +54,8 @@ def maxwell_filter(raw, origin='auto', int_order=8, ext_order=3,
                    st_correlation=0.98, coord_frame='head', destination=None,
                    regularize='in', ignore_ref=False, bad_condition='error',
                    head_pos=None, st_fixed=True, st_only=False, mag_scale=100.,
-                   skip_by_annotation=('edge', 'bad_acq_skip'), verbose=None):
+                   skip_by_annotation=('edge', 'bad_acq_skip'), n_jobs=1,
+                   preload=True, verbose=None):
     u"""Apply Maxwell filter to data using multipole moments.
 
     .. warning:: Automatic bad channel detection is not currently implemented.
@@ -161,6 +170,25 @@ def maxwell_filter(raw, origin='auto', int_order=8, ext_order=3,
         To disable, provide an empty list.
 
         .. versionadded:: 0.17
+    n_jobs : int
+        Number of jobs to run in parallel. The data windows (of duration
+        ``st_duration`` when doing tSSS, and 10 sec otherwise) are then
+        processed in parallel, which mostly helps for tSSS, where each window
+        requires several SVDs. Each job holds the data of its window in
+        memory, so the memory used is about ``n_jobs`` times that of a
+        single window in addition to the data itself.
+
+        .. versionadded:: 0.18
+    preload : True | str
+        If True (default), the output data are held in memory. If a string,
+        it is the file name of a memory-mapped file used to store the output
+        data on the hard drive. In that case, if ``raw`` is not preloaded,
+        its data are read from disk one window at a time while processing,
+        so that only a few windows (rather than several copies of the whole
+        recording) are held in memory at once. The result can then be
+        written to disk with :meth:`raw_sss.save <mne.io.Raw.save>`.
+
+        .. versionadded:: 0.18
     %(verbose)s
 
     Returns
@@ -304,6 +332,9 @@ def maxwell_filter(raw, origin='auto', int_order=8, ext_order=3,
             raise ValueError('st_correlation must be between 0. and 1.')
     _check_option('bad_condition', bad_condition,
                   ['error', 'warning', 'ignore', 'info'])
+    if preload is not True and not isinstance(preload, str):
+        raise ValueError('preload must be True or a file name, got %r'
+                         % (preload,))
     if raw.info['dev_head_t'] is None and coord_frame == 'head':
         raise RuntimeError('coord_frame cannot be "head" because '
                            'info["dev_head_t"] is None; if this is an '
@@ -321,8 +352,8 @@ def maxwell_filter(raw, origin='auto', int_order=8, ext_order=3,
 
     logger.info('Maxwell filtering raw data')
     add_channels = (head_pos[0] is not None) and not st_only
-    raw_sss, pos_picks = _copy_preload_add_channels(
-        raw, add_channels=add_channels)
+    raw_sss, pos_picks, raw_in = _copy_preload_add_channels(
+        raw, add_channels=add_channels, preload=preload)
     del raw
     if not st_only:
         # remove MEG projectors, they won't apply now
@@ -478,98 +509,60 @@ def maxwell_filter(raw, origin='auto', int_order=8, ext_order=3,
     # Loop through buffer windows of data
     n_sig = int(np.floor(np.log10(max(len(starts), 0)))) + 1
     logger.info('    Processing %s data chunk%s' % (len(starts), _pl(starts)))
-    for ii, (start, stop) in enumerate(zip(starts, stops)):
-        tsss_valid = (stop - start) >= st_duration
-        rel_times = raw_sss.times[start:stop]
-        t_str = '%8.3f - %8.3f sec' % tuple(rel_times[[0, -1]])
-        t_str += ('(#%d/%d)' % (ii + 1, len(starts))).rjust(2 * n_sig + 5)
-
-        # Get original data
-        orig_data = raw_sss._data[meg_picks[good_picks], start:stop]
-        # This could just be np.empty if not st_only, but shouldn't be slow
-        # this way so might as well just always take the original data
-        out_meg_data = raw_sss._data[meg_picks, start:stop]
-        # Apply cross-talk correction
-        if cross_talk is not None:
-            orig_data = ctc.dot(orig_data)
-        out_pos_data = np.empty((len(pos_picks), stop - start))
-
-        # Figure out which positions to use
-        t_s_s_q_a = _trans_starts_stops_quats(head_pos, start, stop,
-                                              this_pos_quat)
-        n_positions = len(t_s_s_q_a[0])
-
-        # Set up post-tSSS or do pre-tSSS
-        if st_correlation is not None:
-            # If doing tSSS before movecomp...
-            resid = orig_data.copy()  # to be safe let's operate on a copy
-            if st_when == 'after':
-                orig_in_data = np.empty((len(meg_picks), stop - start))
-            else:  # 'before'
-                avg_trans = t_s_s_q_a[-1]
-                if avg_trans is not None:
-                    # if doing movecomp
-                    S_decomp_st, pS_decomp_st, _, n_use_in_st = \
-                        _get_this_decomp_trans(avg_trans, t=rel_times[0])
+    n_jobs = check_n_jobs(n_jobs)
+    parallel, p_fun, _ = parallel_func(_maxwell_block, n_jobs)
+    # The decomposition and position of the end of a block are used at the
+    # start of the next one. They only change when doing movement
+    # compensation, in which case the blocks processed in parallel get
+    # them from the last position before their start.
+    decomp = (S_decomp, pS_decomp, reg_moments, n_use_in)
+    decomp_0, this_pos_quat_0 = decomp, this_pos_quat
+    carry = head_pos[0] is None or (st_only and st_when != 'after')
+    n_read = 0
+    for bi in range(0, len(starts), n_jobs):
+        blocks = list(range(bi, min(bi + n_jobs, len(starts))))
+        args = list()
+        for ii in blocks:
+            start, stop = starts[ii], stops[ii]
+            if raw_in is not None:  # read the data we need from disk
+                n_read = _stream_data(raw_in, raw_sss, n_read, stop,
+                                      st_duration)
+            rel_times = raw_sss.times[start:stop]
+            t_str = '%8.3f - %8.3f sec' % tuple(rel_times[[0, -1]])
+            t_str += ('(#%d/%d)' % (ii + 1, len(starts))).rjust(2 * n_sig + 5)
+            prev_trans = None
+            if ii != bi and not carry:
+                pi = np.searchsorted(head_pos[1], start)
+                if pi == 0:
+                    decomp, this_pos_quat = decomp_0, this_pos_quat_0
                 else:
-                    S_decomp_st, pS_decomp_st = S_decomp, pS_decomp
-                    n_use_in_st = n_use_in
-                orig_in_data = np.dot(np.dot(S_decomp_st[:, :n_use_in_st],
-                                             pS_decomp_st[:n_use_in_st]),
-                                      resid)
-                resid -= np.dot(np.dot(S_decomp_st[:, n_use_in_st:],
-                                       pS_decomp_st[n_use_in_st:]), resid)
-                resid -= orig_in_data
-                # Here we operate on our actual data
-                proc = out_meg_data if st_only else orig_data
-                _do_tSSS(proc, orig_in_data, resid, st_correlation,
-                         n_positions, t_str, tsss_valid)
-
-        if not st_only or st_when == 'after':
-            # Do movement compensation on the data
-            for trans, rel_start, rel_stop, this_pos_quat in \
-                    zip(*t_s_s_q_a[:4]):
-                # Recalculate bases if necessary (trans will be None iff the
-                # first position in this interval is the same as last of the
-                # previous interval)
-                if trans is not None:
-                    S_decomp, pS_decomp, reg_moments, n_use_in = \
-                        _get_this_decomp_trans(trans, t=rel_times[rel_start])
-
-                # Determine multipole moments for this interval
-                mm_in = np.dot(pS_decomp[:n_use_in],
-                               orig_data[:, rel_start:rel_stop])
-
-                # Our output data
-                if not st_only:
-                    out_meg_data[:, rel_start:rel_stop] = \
-                        np.dot(S_recon.take(reg_moments[:n_use_in], axis=1),
-                               mm_in)
-                if len(pos_picks) > 0:
-                    out_pos_data[:, rel_start:rel_stop] = \
-                        this_pos_quat[:, np.newaxis]
-
-                # Transform orig_data to store just the residual
-                if st_when == 'after':
-                    # Reconstruct data using original location from external
-                    # and internal spaces and compute residual
-                    rel_resid_data = resid[:, rel_start:rel_stop]
-                    orig_in_data[:, rel_start:rel_stop] = \
-                        np.dot(S_decomp[:, :n_use_in], mm_in)
-                    rel_resid_data -= np.dot(np.dot(S_decomp[:, n_use_in:],
-                                                    pS_decomp[n_use_in:]),
-                                             rel_resid_data)
-                    rel_resid_data -= orig_in_data[:, rel_start:rel_stop]
-
-        # If doing tSSS at the end
-        if st_when == 'after':
-            _do_tSSS(out_meg_data, orig_in_data, resid, st_correlation,
-                     n_positions, t_str, tsss_valid)
-        elif st_when == 'never' and head_pos[0] is not None:
-            logger.info('        Used % 2d head position%s for %s'
-                        % (n_positions, _pl(n_positions), t_str))
-        raw_sss._data[meg_picks, start:stop] = out_meg_data
-        raw_sss._data[pos_picks, start:stop] = out_pos_data
+                    decomp, prev_trans = None, head_pos[0][pi - 1]
+                    this_pos_quat = head_pos[2][pi - 1]
+            # Get original data
+            orig_data = raw_sss._data[meg_picks[good_picks], start:stop]
+            # This could just be np.empty if not st_only, but shouldn't be
+            # slow this way so might as well just always take the original
+            # data
+            out_meg_data = raw_sss._data[meg_picks, start:stop]
+            # Apply cross-talk correction
+            if cross_talk is not None:
+                orig_data = ctc.dot(orig_data)
+            args.append((orig_data, out_meg_data, start, stop, rel_times,
+                         t_str, this_pos_quat, decomp, prev_trans))
+        out = parallel(p_fun(
+            *this_args, head_pos=head_pos, n_pos=len(pos_picks),
+            get_decomp=_get_this_decomp_trans, S_recon=S_recon,
+            st_duration=st_duration, st_correlation=st_correlation,
+            st_when=st_when, st_only=st_only) for this_args in args)
+        for ii, (out_meg_data, out_pos_data, this_pos_quat, decomp) in \
+                zip(blocks, out):
+            start, stop = starts[ii], stops[ii]
+            raw_sss._data[meg_picks, start:stop] = out_meg_data
+            raw_sss._data[pos_picks, start:stop] = out_pos_data
+        del out, args
+    if raw_in is not None:  # the data after the last window
+        _stream_data(raw_in, raw_sss, n_read, len(raw_sss.times), st_duration)
+        del raw_in
 
     # Update info
     if not st_only:
@@ -581,6 +574,95 @@ def maxwell_filter(raw, origin='auto', int_order=8, ext_order=3,
     return raw_sss
 
 
+def _maxwell_block(orig_data, out_meg_data, start, stop, rel_times, t_str,
+                   this_pos_quat, decomp, prev_trans, head_pos, n_pos,
+                   get_decomp, S_recon, st_duration, st_correlation, st_when,
+                   st_only):
+    """Maxwell filter one block of data."""
+    if decomp is None:  # get the decomposition in use at our start
+        decomp = get_decomp(prev_trans, t=rel_times[0])
+    S_decomp, pS_decomp, reg_moments, n_use_in = decomp
+    tsss_valid = (stop - start) >= st_duration
+    out_pos_data = np.empty((n_pos, stop - start))
+
+    # Figure out which positions to use
+    t_s_s_q_a = _trans_starts_stops_quats(head_pos, start, stop,
+                                          this_pos_quat)
+    n_positions = len(t_s_s_q_a[0])
+
+    # Set up post-tSSS or do pre-tSSS
+    if st_correlation is not None:
+        # If doing tSSS before movecomp...
+        resid = orig_data.copy()  # to be safe let's operate on a copy
+        if st_when == 'after':
+            orig_in_data = np.empty(out_meg_data.shape)
+        else:  # 'before'
+            avg_trans = t_s_s_q_a[-1]
+            if avg_trans is not None:
+                # if doing movecomp
+                S_decomp_st, pS_decomp_st, _, n_use_in_st = \
+                    get_decomp(avg_trans, t=rel_times[0])
+            else:
+                S_decomp_st, pS_decomp_st = S_decomp, pS_decomp
+                n_use_in_st = n_use_in
+            orig_in_data = np.dot(np.dot(S_decomp_st[:, :n_use_in_st],
+                                         pS_decomp_st[:n_use_in_st]),
+                                  resid)
+            resid -= np.dot(np.dot(S_decomp_st[:, n_use_in_st:],
+                                   pS_decomp_st[n_use_in_st:]), resid)
+            resid -= orig_in_data
+            # Here we operate on our actual data
+            proc = out_meg_data if st_only else orig_data
+            _do_tSSS(proc, orig_in_data, resid, st_correlation,
+                     n_positions, t_str, tsss_valid)
+
+    if not st_only or st_when == 'after':
+        # Do movement compensation on the data
+        for trans, rel_start, rel_stop, this_pos_quat in \
+                zip(*t_s_s_q_a[:4]):
+            # Recalculate bases if necessary (trans will be None iff the
+            # first position in this interval is the same as last of the
+            # previous interval)
+            if trans is not None:
+                S_decomp, pS_decomp, reg_moments, n_use_in = \
+                    get_decomp(trans, t=rel_times[rel_start])
+
+            # Determine multipole moments for this interval
+            mm_in = np.dot(pS_decomp[:n_use_in],
+                           orig_data[:, rel_start:rel_stop])
+
+            # Our output data
+            if not st_only:
+                out_meg_data[:, rel_start:rel_stop] = \
+                    np.dot(S_recon.take(reg_moments[:n_use_in], axis=1),
+                           mm_in)
+            if n_pos > 0:
+                out_pos_data[:, rel_start:rel_stop] = \
+                    this_pos_quat[:, np.newaxis]
+
+            # Transform orig_data to store just the residual
+            if st_when == 'after':
+                # Reconstruct data using original location from external
+                # and internal spaces and compute residual
+                rel_resid_data = resid[:, rel_start:rel_stop]
+                orig_in_data[:, rel_start:rel_stop] = \
+                    np.dot(S_decomp[:, :n_use_in], mm_in)
+                rel_resid_data -= np.dot(np.dot(S_decomp[:, n_use_in:],
+                                                pS_decomp[n_use_in:]),
+                                         rel_resid_data)
+                rel_resid_data -= orig_in_data[:, rel_start:rel_stop]
+
+    # If doing tSSS at the end
+    if st_when == 'after':
+        _do_tSSS(out_meg_data, orig_in_data, resid, st_correlation,
+                 n_positions, t_str, tsss_valid)
+    elif st_when == 'never' and head_pos[0] is not None:
+        logger.info('        Used % 2d head position%s for %s'
+                    % (n_positions, _pl(n_positions), t_str))
+    decomp = (S_decomp, pS_decomp, reg_moments, n_use_in)
+    return out_meg_data, out_pos_data, this_pos_quat, decomp
+
+
 def _get_coil_scale(meg_picks, mag_picks, grad_picks, mag_scale, info):
     """Get the magnetometer scale factor."""
     if isinstance(mag_scale, str):
@@ -752,25 +834,43 @@ def _do_tSSS(clean_data, orig_in_data, resid, st_correlation,
     clean_data -= np.dot(np.dot(clean_data, t_proj), t_proj.T)
 
 
-def _copy_preload_add_channels(raw, add_channels):
-    """Load data for processing and (maybe) add cHPI pos channels."""
+def _copy_preload_add_channels(raw, add_channels, preload=True):
+    """Load data for processing and (maybe) add cHPI pos channels.
+
+    If ``preload`` is a str, the data are stored in a memmap, and if ``raw``
+    is not preloaded they are not read here. The raw instance to read them
+    from (see _stream_data) is returned as ``raw_in``, otherwise it is None.
+    """
     raw = raw.copy()
-    if add_channels:
+    raw_in = None
+    if add_channels or isinstance(preload, str):
         kinds = [FIFF.FIFFV_QUAT_1, FIFF.FIFFV_QUAT_2, FIFF.FIFFV_QUAT_3,
                  FIFF.FIFFV_QUAT_4, FIFF.FIFFV_QUAT_5, FIFF.FIFFV_QUAT_6,
                  FIFF.FIFFV_HPI_G, FIFF.FIFFV_HPI_ERR, FIFF.FIFFV_HPI_MOV]
+        kinds = kinds if add_channels else []
         out_shape = (len(raw.ch_names) + len(kinds), len(raw.times))
-        out_data = np.zeros(out_shape, np.float64)
-        msg = '    Appending head position result channels and '
+        out_data = _allocate_data(
+            None, preload if isinstance(preload, str) else None, out_shape,
+            np.float64)
+        msg = '    Appending head position result channels and ' \
+            if add_channels else '    '
         if raw.preload:
             logger.info(msg + 'copying original raw data')
             out_data[:len(raw.ch_names)] = raw._data
             raw._data = out_data
+        elif isinstance(preload, str):
+            logger.info(msg + 'reading raw data from disk while processing')
+            raw_in = raw.copy()
+            raw._data = out_data
+            raw.preload = True
+            raw._comp = None  # raw_in applies it while reading
         else:
             logger.info(msg + 'loading raw data from disk')
             raw._preload_data(out_data[:len(raw.ch_names)], verbose=False)
             raw._data = out_data
         assert raw.preload is True
+        if not add_channels:
+            return raw, np.array([], int), raw_in
         off = len(raw.ch_names)
         chpi_chs = [
             dict(ch_name='CHPI%03d' % (ii + 1), logno=ii + 1,
@@ -785,14 +885,24 @@ def _copy_preload_add_channels(raw, add_channels):
         # Return the pos picks
         pos_picks = np.arange(len(raw.ch_names) - len(chpi_chs),
                               len(raw.ch_names))
-        return raw, pos_picks
+        return raw, pos_picks, raw_in
     else:
         if not raw.preload:
             logger.info('    Loading raw data from disk')
             raw.load_data(verbose=False)
         else:
             logger.info('    Using loaded raw data')
-        return raw, np.array([], int)
+        return raw, np.array([], int), raw_in
+
+
+def _stream_data(raw_in, raw_sss, start, stop, n_chunk):
+    """Read data from disk into the output, n_chunk samples at a time."""
+    n_ch = raw_in.info['nchan']
+    for this_start in range(start, stop, n_chunk):
+        this_stop = min(this_start + n_chunk, stop)
+        raw_sss._data[:n_ch, this_start:this_stop] = raw_in._read_segment(
+            this_start, this_stop, verbose=False)
+    return max(start, stop)
 
 
 def _check_pos(pos, head_frame, raw, st_fixed, sfreq):
@@ -834,21 +944,45 @@ def _get_decomp(trans, all_coils, cal, regularize, exp, ignore_ref,
                 coil_scale, grad_picks, mag_picks, good_picks, mag_or_fine,
                 bad_condition, t, mag_scale):
     """Get a decomposition matrix and pseudoinverse matrices."""
-    #
-    # Fine calibration processing (point-like magnetometers and calib. coeffs)
-    #
-    S_decomp = _get_s_decomp(exp, all_coils, trans, coil_scale, cal,
-                             ignore_ref, grad_picks, mag_picks, good_picks,
-                             mag_scale)
-
-    #
-    # Regularization
-    #
-    S_decomp, pS_decomp, sing, reg_moments, n_use_in = _regularize(
-        regularize, exp, S_decomp, mag_or_fine, t=t)
+    # The decomposition only depends on the geometry and parameters, so it
+    # can be reused across (quantized) head positions and runs
+    key = _decomp_key(trans, all_coils, cal, regularize, exp, ignore_ref,
+                      coil_scale, grad_picks, mag_picks, good_picks,
+                      mag_or_fine, mag_scale)
+    decomp = _decomp_cache.get(key)
+    if decomp is None:
+        decomp = _read_decomp(key)
+    if decomp is None:
+        #
+        # Fine calibration processing (point-like magnetometers and calib.
+        # coeffs)
+        #
+        S_decomp = _get_s_decomp(exp, all_coils, trans, coil_scale, cal,
+                                 ignore_ref, grad_picks, mag_picks,
+                                 good_picks, mag_scale)
+
+        #
+        # Regularization
+        #
+        S_decomp, pS_decomp, sing, reg_moments, n_use_in = _regularize(
+            regularize, exp, S_decomp, mag_or_fine, t=t)
+
+        # Pseudo-inverse of total multipolar moment basis set (Part of Eq. 37)
+        cond = sing[0] / sing[-1]
+
+        # Build in our data scaling here
+        pS_decomp *= coil_scale[good_picks].T
+        S_decomp /= coil_scale[good_picks]
+        decomp = (S_decomp, pS_decomp, reg_moments, n_use_in, cond)
+        _write_decomp(key, decomp)
+    else:
+        logger.debug('    Using cached decomposition')
+        _log_regularization(regularize, exp, decomp[2], decomp[3], t)
+    for x in decomp[:3]:
+        x.flags.writeable = False  # it can be shared through the cache
+    _decomp_cache[key] = decomp
+    S_decomp, pS_decomp, reg_moments, n_use_in, cond = decomp
 
-    # Pseudo-inverse of total multipolar moment basis set (Part of Eq. 37)
-    cond = sing[0] / sing[-1]
     logger.debug('    Decomposition matrix condition: %0.1f' % cond)
     if bad_condition != 'ignore' and cond >= 1000.:
         msg = 'Matrix is badly conditioned: %0.0f >= 1000' % cond
@@ -858,13 +992,40 @@ def _get_decomp(trans, all_coils, cal, regularize, exp, ignore_ref,
             warn(msg)
         else:  # condition == 'info'
             logger.info(msg)
-
-    # Build in our data scaling here
-    pS_decomp *= coil_scale[good_picks].T
-    S_decomp /= coil_scale[good_picks]
     return S_decomp, pS_decomp, reg_moments, n_use_in
 
 
+def _decomp_key(trans, all_coils, cal, regularize, exp, ignore_ref,
+                coil_scale, grad_picks, mag_picks, good_picks, mag_or_fine,
+                mag_scale):
+    """Hash everything that defines a decomposition."""
+    if isinstance(trans, Transform):
+        trans = trans['trans']
+    if cal is not None:
+        cal = [cal['grad_imbalances'], cal['mag_cals'],
+               [coils[:5] for coils in cal['grad_coilsets']]]
+    return '%032x' % object_hash([
+        __version__, trans, all_coils[:5], cal, regularize, exp, ignore_ref,
+        coil_scale, grad_picks, mag_picks, good_picks, mag_or_fine,
+        mag_scale])
+
+
+def _read_decomp(key):
+    """Read a decomposition from MNE_CACHE_DIR."""
+    def read(fname):
+        with np.load(fname) as fid:
+            return (fid['S_decomp'], fid['pS_decomp'], fid['reg_moments'],
+                    int(fid['n_use_in']), float(fid['cond']))
+    return _read_cache_dir('sss_decomp', key, '.npz', read)
+
+
+def _write_decomp(key, decomp):
+    """Write a decomposition to MNE_CACHE_DIR."""
+    _write_cache_dir('sss_decomp', key, '.npz', lambda fname: np.savez(
+        fname, **dict(zip(('S_decomp', 'pS_decomp', 'reg_moments',
+                           'n_use_in', 'cond'), decomp))))
+
+
 def _get_s_decomp(exp, all_coils, trans, coil_scale, cal, ignore_ref,
                   grad_picks, mag_picks, good_picks, mag_scale):
     """Get S_decomp."""
@@ -889,7 +1050,6 @@ def _regularize(regularize, exp, S_decomp, mag_or_fine, t, verbose=None):
     # (homogeneous field) components
     int_order, ext_order = exp['int_order'], exp['ext_order']
     n_in, n_out = _get_n_moments([int_order, ext_order])
-    t_str = '%8.3f' % t
     if regularize is not None:  # regularize='in'
         in_removes, out_removes = _regularize_in(
             int_order, ext_order, S_decomp, mag_or_fine)
@@ -900,16 +1060,22 @@ def _regularize(regularize, exp, S_decomp, mag_or_fine, t, verbose=None):
     reg_out_moments = np.setdiff1d(np.arange(n_in, n_in + n_out),
                                    out_removes)
     n_use_in = len(reg_in_moments)
-    n_use_out = len(reg_out_moments)
     reg_moments = np.concatenate((reg_in_moments, reg_out_moments))
     S_decomp = S_decomp.take(reg_moments, axis=1)
     pS_decomp, sing = _col_norm_pinv(S_decomp.copy())
+    _log_regularization(regularize, exp, reg_moments, n_use_in, t)
+    return S_decomp, pS_decomp, sing, reg_moments, n_use_in
+
+
+def _log_regularization(regularize, exp, reg_moments, n_use_in, t):
+    """Log the number of components used."""
+    n_in, n_out = _get_n_moments([exp['int_order'], exp['ext_order']])
+    n_use_out = len(reg_moments) - n_use_in
     if regularize is not None or n_use_out != n_out:
-        logger.info('        Using %s/%s harmonic components for %s  '
+        logger.info('        Using %s/%s harmonic components for %8.3f  '
                     '(%s/%s in, %s/%s out)'
-                    % (n_use_in + n_use_out, n_in + n_out, t_str,
+                    % (n_use_in + n_use_out, n_in + n_out, t,
                        n_use_in, n_in, n_use_out, n_out))
-    return S_decomp, pS_decomp, sing, reg_moments, n_use_in
 
 
 def _get_mf_picks(info, int_order, ext_order, ignore_ref=False):
@@ -1171,11 +1337,8 @@ def _sss_basis(exp, all_coils):
     rmags, cosmags, bins, n_coils = all_coils[:4]
     int_order, ext_order = exp['int_order'], exp['ext_order']
     n_in, n_out = _get_n_moments([int_order, ext_order])
-    S_tot = np.empty((n_coils, n_in + n_out), np.float64)
 
     rmags = rmags - exp['origin']
-    S_in = S_tot[:, :n_in]
-    S_out = S_tot[:, n_in:]
 
     # do the heavy lifting
     max_order = max(int_order, ext_order)
@@ -1192,139 +1355,96 @@ def _sss_basis(exp, all_coils):
     sin_az = rmags[:, 1] / r_xy  # sin(phi)
     sin_az[z_only] = 0.
     del rmags
-    # Appropriate vector spherical harmonics terms
-    #  JNE 2012-02-08: modified alm -> 2*alm, blm -> -2*blm
-    r_nn2 = r_n.copy()
-    r_nn1 = 1.0 / (r_n * r_n)
-    for degree in range(max_order + 1):
-        if degree <= ext_order:
-            r_nn1 *= r_n  # r^(l-1)
-        if degree <= int_order:
-            r_nn2 *= r_n  # r^(l+2)
-
+    # The components of the (weighted) coil normals along the spherical unit
+    # vectors, so that the field of all moments can be projected at once
+    # (r_fact, az_fact and pol_fact in the degree loop below)
+    c_r = (sin_pol * cos_az * cosmags[:, 0] +
+           sin_pol * sin_az * cosmags[:, 1] + cos_pol * cosmags[:, 2])
+    c_pol = (cos_pol * cos_az * cosmags[:, 0] +
+             cos_pol * sin_az * cosmags[:, 1] - sin_pol * cosmags[:, 2])
+    c_az = cos_az * cosmags[:, 1] - sin_az * cosmags[:, 0]
+    c_az /= np.where(z_only, np.inf, sin_pol)  # b_az is zero on the z axis
+
+    # Trigonometric terms of all orders
+    ord_phi = np.arange(max_order + 1)[:, np.newaxis] * phi
+    cos_order = np.cos(ord_phi)
+    sin_order = np.sin(ord_phi)
+    del ord_phi
+    # Compute the terms of all orders (and integration points) of each degree
+    # at once. For each order >= 0, the real (order) and imaginary (-order)
+    # harmonics only differ by the azimuthal terms cos/sin(order * phi).
+    proj = np.empty((n_in + n_out, len(r_n)))
+    inv_r = 1. / r_n
+    r_nn2 = inv_r * inv_r  # r^-(l+2)
+    r_nn1 = inv_r.copy()  # r^(l-1)
+    for degree in range(1, max_order + 1):
+        r_nn2 *= inv_r
+        r_nn1 *= r_n
+        orders = np.arange(degree + 1)
         # mu_0*sqrt((2l+1)/4pi (l-m)!/(l+m)!)
-        mult = 2e-7 * np.sqrt((2 * degree + 1) * np.pi)
-
-        if degree > 0:
-            idx = _deg_ord_idx(degree, 0)
-            # alpha
-            if degree <= int_order:
-                b_r = mult * (degree + 1) * L[degree][0] / r_nn2
-                b_pol = -mult * L[degree][1] / r_nn2
-                S_in[:, idx] = _integrate_points(
-                    cos_az, sin_az, cos_pol, sin_pol, b_r, 0., b_pol,
-                    cosmags, bins, n_coils)
-            # beta
-            if degree <= ext_order:
-                b_r = -mult * degree * L[degree][0] * r_nn1
-                b_pol = -mult * L[degree][1] * r_nn1
-                S_out[:, idx] = _integrate_points(
-                    cos_az, sin_az, cos_pol, sin_pol, b_r, 0., b_pol,
-                    cosmags, bins, n_coils)
-        for order in range(1, degree + 1):
-            ord_phi = order * phi
-            sin_order = np.sin(ord_phi)
-            cos_order = np.cos(ord_phi)
-            mult /= np.sqrt((degree - order + 1) * (degree + order))
-            factor = mult * np.sqrt(2)  # equivalence fix (Elekta uses 2.)
-
-            # Real
-            idx = _deg_ord_idx(degree, order)
-            r_fact = factor * L[degree][order] * cos_order
-            az_fact = factor * order * sin_order * L[degree][order]
-            pol_fact = -factor * (L[degree][order + 1] -
-                                  (degree + order) * (degree - order + 1) *
-                                  L[degree][order - 1]) * cos_order
-            # alpha
-            if degree <= int_order:
-                b_r = (degree + 1) * r_fact / r_nn2
-                b_az = az_fact / (sin_pol * r_nn2)
-                b_az[z_only] = 0.
-                b_pol = pol_fact / (2 * r_nn2)
-                S_in[:, idx] = _integrate_points(
-                    cos_az, sin_az, cos_pol, sin_pol, b_r, b_az, b_pol,
-                    cosmags, bins, n_coils)
-            # beta
-            if degree <= ext_order:
-                b_r = -degree * r_fact * r_nn1
-                b_az = az_fact * r_nn1 / sin_pol
-                b_az[z_only] = 0.
-                b_pol = pol_fact * r_nn1 / 2.
-                S_out[:, idx] = _integrate_points(
-                    cos_az, sin_az, cos_pol, sin_pol, b_r, b_az, b_pol,
-                    cosmags, bins, n_coils)
-
-            # Imaginary
-            idx = _deg_ord_idx(degree, -order)
-            r_fact = factor * L[degree][order] * sin_order
-            az_fact = factor * order * cos_order * L[degree][order]
-            pol_fact = factor * (L[degree][order + 1] -
-                                 (degree + order) * (degree - order + 1) *
-                                 L[degree][order - 1]) * sin_order
-            # alpha
-            if degree <= int_order:
-                b_r = -(degree + 1) * r_fact / r_nn2
-                b_az = az_fact / (sin_pol * r_nn2)
-                b_az[z_only] = 0.
-                b_pol = pol_fact / (2 * r_nn2)
-                S_in[:, idx] = _integrate_points(
-                    cos_az, sin_az, cos_pol, sin_pol, b_r, b_az, b_pol,
-                    cosmags, bins, n_coils)
-            # beta
-            if degree <= ext_order:
-                b_r = degree * r_fact * r_nn1
-                b_az = az_fact * r_nn1 / sin_pol
-                b_az[z_only] = 0.
-                b_pol = pol_fact * r_nn1 / 2.
-                S_out[:, idx] = _integrate_points(
-                    cos_az, sin_az, cos_pol, sin_pol, b_r, b_az, b_pol,
-                    cosmags, bins, n_coils)
+        mult = 2e-7 * np.sqrt((2 * degree + 1) * np.pi / np.cumprod(
+            np.concatenate([[1], (degree - orders[1:] + 1) *
+                            (degree + orders[1:])])))
+        mult[1:] *= np.sqrt(2)  # equivalence fix (Elekta uses 2.)
+        L_m = L[degree, :degree + 1]
+        L_pol = L[degree, 1:degree + 2].copy()
+        L_pol[0] *= 2
+        L_pol[1:] -= (((degree + orders[1:]) * (degree - orders[1:] + 1))
+                      [:, np.newaxis] * L[degree, :degree])
+        # JNE 2012-02-08: modified alm -> 2*alm, blm -> -2*blm
+        r_fact = mult[:, np.newaxis] * L_m * c_r
+        az_fact = (mult * orders)[:, np.newaxis] * L_m * c_az
+        pol_fact = (mult / 2.)[:, np.newaxis] * L_pol * c_pol
+        cos_m, sin_m = cos_order[:degree + 1], sin_order[:degree + 1]
+        real_idx = _deg_ord_idx(degree, orders)
+        imag_idx = _deg_ord_idx(degree, -orders[1:])
+        for this_order, k_r, r_nn, offset in (
+                (int_order, degree + 1., r_nn2, 0),  # alpha
+                (ext_order, -degree, r_nn1, n_in)):  # beta
+            if degree > this_order:
+                continue
+            rp_fact = k_r * r_fact - pol_fact
+            proj[offset + real_idx] = (cos_m * rp_fact +
+                                       sin_m * az_fact) * r_nn
+            proj[offset + imag_idx] = (cos_m[1:] * az_fact[1:] -
+                                       sin_m[1:] * rp_fact[1:]) * r_nn
+    # Integrate the points of each coil (bins are sorted)
+    starts = np.concatenate([[0], np.flatnonzero(np.diff(bins)) + 1])
+    assert len(starts) == n_coils
+    S_tot = np.ascontiguousarray(np.add.reduceat(proj, starts, axis=1).T)
     return S_tot
 
 
-def _integrate_points(cos_az, sin_az, cos_pol, sin_pol, b_r, b_az, b_pol,
-                      cosmags, bins, n_coils):
-    """Integrate points in spherical coords."""
-    grads = _sp_to_cart(cos_az, sin_az, cos_pol, sin_pol, b_r, b_az, b_pol).T
-    grads = einsum('ij,ij->i', grads, cosmags)
-    return np.bincount(bins, grads, n_coils)
-
-
 def _tabular_legendre(r, nind):
-    """Compute associated Legendre polynomials."""
+    """Compute associated Legendre polynomials.
+
+    Returns an array of shape (nind + 1, nind + 2, len(r)) indexed by degree
+    and order, with zeros for the orders larger than the degree.
+    """
     r_n = np.sqrt(np.sum(r * r, axis=1))
     x = r[:, 2] / r_n  # cos(theta)
-    L = list()
-    for degree in range(nind + 1):
-        L.append(np.zeros((degree + 2, len(r))))
-    L[0][0] = 1.
+    L = np.zeros((nind + 1, nind + 2, len(r)))
+    L[0, 0] = 1.
     pnn = 1.
     fact = 1.
     sx2 = np.sqrt((1. - x) * (1. + x))
     for degree in range(nind + 1):
-        L[degree][degree] = pnn
+        L[degree, degree] = pnn
         pnn *= (-fact * sx2)
         fact += 2.
         if degree < nind:
-            L[degree + 1][degree] = x * (2 * degree + 1) * L[degree][degree]
+            L[degree + 1, degree] = x * (2 * degree + 1) * L[degree, degree]
         if degree >= 2:
-            for order in range(degree - 1):
-                L[degree][order] = (x * (2 * degree - 1) *
-                                    L[degree - 1][order] -
-                                    (degree + order - 1) *
-                                    L[degree - 2][order]) / (degree - order)
+            # all orders at once
+            order = np.arange(degree - 1)[:, np.newaxis]
+            L[degree, :degree - 1] = (x * (2 * degree - 1) *
+                                      L[degree - 1, :degree - 1] -
+                                      (degree + order - 1) *
+                                      L[degree - 2, :degree - 1]) / \
+                (degree - order)
     return L
 
 
-def _sp_to_cart(cos_az, sin_az, cos_pol, sin_pol, b_r, b_az, b_pol):
-    """Convert spherical coords to cartesian."""
-    return np.array([(sin_pol * cos_az * b_r +
-                      cos_pol * cos_az * b_pol - sin_az * b_az),
-                     (sin_pol * sin_az * b_r +
-                      cos_pol * sin_az * b_pol + cos_az * b_az),
-                     cos_pol * b_r - sin_pol * b_pol])
-
-
 def _get_degrees_orders(order):
     """Get the set of degrees used in our basis functions."""
     degrees = np.zeros(_get_n_moments(order), int)
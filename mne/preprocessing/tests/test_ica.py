@@ -145,6 +145,123 @@ def test_ica_simple(method):
     assert amari_distance < 0.1
 
 
+@requires_sklearn
+def test_ica_n_init_n_jobs():
+    """Test ICA multi-start fitting and chunked application."""
+    n_components = 3
+    rng = np.random.RandomState(0)
+    S = rng.laplace(size=(n_components, 30000))
+    A = rng.randn(n_components, n_components)
+    info = create_info(n_components, 1000., 'eeg')
+    raw = RawArray(np.dot(A, S) * 1e-5, info)
+    ica = ICA(n_components=n_components, method='fastica', random_state=0)
+    with pytest.raises(ValueError, match='n_init must be at least 1'):
+        ica.fit(raw, n_init=0)
+    with catch_logging() as log:
+        ica.fit(raw, n_init=3, n_jobs=2, verbose=True)
+    assert 'Running ICA 3 times' in log.getvalue()
+    transform = np.dot(np.dot(ica.unmixing_matrix_, ica.pca_components_), A)
+    amari_distance = np.mean(np.sum(np.abs(transform), axis=1) /
+                             np.max(np.abs(transform), axis=1) - 1.)
+    assert amari_distance < 0.1
+
+    # the sources and cleaned data (processed in chunks) match the
+    # non-chunked computations
+    data = raw.get_data()
+    white = data / ica.pre_whitener_
+    sources = ica.get_sources(raw, start=100, n_jobs=2).get_data()
+    assert_allclose(sources, ica._transform(white[:, 100:].copy()), atol=1e-10)
+    raw_clean = ica.apply(raw.copy(), exclude=[1], stop=25000)
+    assert_allclose(raw_clean.get_data()[:, :25000],
+                    ica._pick_sources(white[:, :25000].copy(), None, [1]),
+                    atol=1e-15)
+    assert_array_equal(raw_clean.get_data()[:, 25000:], data[:, 25000:])
+
+
+@requires_sklearn
+@pytest.mark.parametrize('decim, reject', [(None, None), (3, True)])
+def test_ica_incremental(decim, reject):
+    """Test fitting ICA incrementally over blocks of raw data."""
+    rng = np.random.RandomState(0)
+    S = rng.laplace(size=(6, 30000))
+    A = rng.randn(6, 6)
+    info = create_info(6, 1000., ['eeg'] * 3 + ['mag'] * 3)
+    data = np.dot(A, S) * np.array([1e-5] * 3 + [1e-12] * 3)[:, np.newaxis]
+    data[0, 20000:20100] *= 100
+    raw = RawArray(data, info)
+    raw.set_annotations(Annotations([10.3], [1.1], ['bad']))
+    if reject:
+        reject = dict(eeg=20 * data[:3].std())
+    else:
+        reject = None
+    icas = list()
+    for incremental in (False, True):
+        ica = ICA(n_components=4, method='fastica', random_state=0)
+        ica.fit(raw, decim=decim, reject=reject, tstep=0.5,
+                incremental=incremental)
+        icas.append(ica)
+    assert icas[0].n_samples_ == icas[1].n_samples_
+    if reject is not None:
+        assert len(icas[1].drop_inds_) > 0
+        assert icas[0].drop_inds_ == icas[1].drop_inds_
+    assert_allclose(icas[0].pre_whitener_, icas[1].pre_whitener_)
+    assert_allclose(icas[0].pca_explained_variance_,
+                    icas[1].pca_explained_variance_)
+    # the whitened PCA sources used to fit ICA are the same
+    pca_sources = list()
+    for ica in icas:
+        white = ica._pre_whiten(data.copy(), info, np.arange(6))[0]
+        white -= ica.pca_mean_[:, np.newaxis]
+        pca_sources.append(
+            np.dot(ica.pca_components_[:4], white) /
+            np.sqrt(ica.pca_explained_variance_[:4])[:, np.newaxis])
+    assert_allclose(pca_sources[0], pca_sources[1], rtol=1e-10, atol=1e-10)
+    # and so are the components, up to their order and sign
+    components = [ica.get_components() for ica in icas]
+    corr = np.dot(components[0].T, components[1])
+    corr /= np.outer(np.linalg.norm(components[0], axis=0),
+                     np.linalg.norm(components[1], axis=0))
+    order = np.argmax(np.abs(corr), axis=1)
+    assert_array_equal(np.sort(order), np.arange(4))
+    signs = np.sign(corr[np.arange(4), order])
+    assert_allclose(components[0] * signs, components[1][:, order],
+                    atol=1e-7)
+    epochs = EpochsArray(data[np.newaxis, :, :1000], info)
+    with pytest.raises(ValueError, match='only supported for Raw'):
+        ica.fit(epochs, incremental=True)
+
+
+@requires_sklearn
+def test_corrmap_many_icas():
+    """Test corrmap template matching across many ICA solutions."""
+    rng = np.random.RandomState(0)
+    n_channels = 8
+    info = create_info(n_channels, 100., 'eeg')
+    raw = RawArray(rng.randn(n_channels, 1000), info)
+    ica = ICA(method='fastica', random_state=0, max_iter=10).fit(raw)
+    template = rng.randn(n_channels)
+    icas, want = list(), list()
+    for ii in range(10):
+        this_ica = ica.copy()
+        # components are pca_components_.T mixing_matrix_
+        mixing = rng.randn(n_channels, n_channels)
+        idx = rng.randint(n_channels)
+        mixing[:, idx] = np.dot(this_ica.pca_components_,
+                                (template + 0.1 * rng.randn(n_channels)) *
+                                rng.choice([-1, 1]))
+        this_ica.mixing_matrix_ = mixing
+        icas.append(this_ica)
+        want.append(idx)
+    for n_jobs in (1, 2):
+        corrmap(icas, (0, want[0]), threshold='auto', label='blink',
+                plot=False, n_jobs=n_jobs)
+        assert [this_ica.labels_['blink'] for this_ica in icas] == \
+            [[idx] for idx in want]
+        corrmap(icas, template, threshold=0.9, label='blink2', plot=False)
+        assert [this_ica.labels_['blink2'] for this_ica in icas] == \
+            [[idx] for idx in want]
+
+
 @requires_sklearn
 @pytest.mark.parametrize("method", ["fastica", "picard"])
 def test_ica_rank_reduction(method):
@@ -5,12 +5,13 @@
 # Parts of this code are taken from scikit-learn
 
 import numpy as np
-from numpy.testing import assert_almost_equal
+from numpy.testing import assert_almost_equal, assert_allclose
+import pytest
 
 from scipy import stats
 from scipy import linalg
 
-from mne.preprocessing.infomax_ import infomax
+from mne.preprocessing.infomax_ import infomax, _kurtosis
 from mne.utils import requires_sklearn, run_tests_if_main, check_version
 
 
@@ -117,6 +118,31 @@ def test_infomax_simple():
                 assert_almost_equal(np.dot(s2_, s2) / n_samples, 1, decimal=1)
 
 
+@requires_sklearn
+def test_infomax_dtype_n_blocks():
+    """Test infomax with float32 computations and a minibatch schedule."""
+    rng = np.random.RandomState(0)
+    n_samples = 5000
+    s = np.array([np.sign(np.sin(np.linspace(0, 500, n_samples))),
+                  rng.laplace(size=n_samples)])
+    center_and_norm(s)
+    mixing = np.array([[np.cos(0.6), np.sin(0.6)],
+                       [np.sin(0.6), -np.cos(0.6)]])
+    X = _get_pca(rng).fit_transform(np.dot(mixing, s).T)
+    for kwargs in (dict(), dict(dtype=np.float32), dict(n_blocks=10)):
+        unmixing = infomax(X, random_state=0, **kwargs)
+        assert unmixing.dtype == np.float64
+        s_ = np.dot(unmixing, X.T)
+        center_and_norm(s_)
+        corr = np.abs(np.dot(s_, s.T)) / n_samples
+        assert_allclose(np.sort(corr.max(axis=1)), [1, 1], atol=1e-2)
+    assert_allclose(_kurtosis(X.copy()), stats.kurtosis(X, axis=0))
+    with pytest.raises(ValueError, match='dtype must be'):
+        infomax(X, dtype=np.int64)
+    with pytest.raises(ValueError, match='n_blocks must be'):
+        infomax(X, n_blocks=0)
+
+
 def test_infomax_weights_ini():
     """Test the infomax algorithm w/initial weights matrix."""
     X = np.random.random((3, 100))
@@ -2,6 +2,8 @@
 #
 # License: BSD (3-clause)
 
+from glob import glob
+import os
 import os.path as op
 import numpy as np
 
@@ -21,7 +23,7 @@ from mne.io import read_raw_fif, read_info, read_raw_bti, read_raw_kit, BaseRaw
 from mne.preprocessing.maxwell import (
     maxwell_filter, _get_n_moments, _sss_basis_basic, _sh_complex_to_real,
     _sh_real_to_complex, _sh_negate, _bases_complex_to_real, _trans_sss_basis,
-    _bases_real_to_complex, _prep_mf_coils)
+    _bases_real_to_complex, _prep_mf_coils, _decomp_cache)
 from mne.rank import _get_rank_sss, _compute_rank_int
 from mne.tests.common import assert_meg_snr
 from mne.utils import (_TempDir, run_tests_if_main, catch_logging,
@@ -181,6 +183,15 @@ def test_movement_compensation():
                    0.6, 1.0, chpi_med_tol=None)
     assert_meg_snr(raw_sss_mc, raw_sss_mv, 0.6, 1.4)
 
+    # processing the windows in parallel should not change anything
+    raw_sss_mc = maxwell_filter(raw_nohpi, head_pos=head_pos, st_duration=1.,
+                                origin=mf_head_origin)
+    raw_sss_mc_2 = maxwell_filter(raw_nohpi, head_pos=head_pos,
+                                  st_duration=1., origin=mf_head_origin,
+                                  n_jobs=2)
+    assert_allclose(raw_sss_mc_2[:][0], raw_sss_mc[:][0], rtol=1e-6,
+                    atol=1e-20)
+
     # some degenerate cases
     raw_erm = read_crop(erm_fname)
     pytest.raises(ValueError, maxwell_filter, raw_erm, coord_frame='meg',
@@ -298,6 +309,72 @@ def test_other_systems():
     assert '80/80 in, 12/15 out' in log.getvalue()  # homogeneous fields
 
 
+def test_memmap_output():
+    """Test Maxwell filtering into a memory-mapped file."""
+    tempdir = _TempDir()
+    kit_dir = op.join(io_dir, 'kit', 'tests', 'data')
+    raw_kit = read_raw_kit(op.join(kit_dir, 'test.sqd'))
+    assert not raw_kit.preload
+    kwargs = dict(origin=(0., 0., 0.04), ignore_ref=True, st_duration=0.5)
+    raw_sss = maxwell_filter(raw_kit, **kwargs)
+    for raw in (raw_kit, raw_kit.copy().load_data()):
+        fname = op.join(tempdir, 'sss_%s.dat' % raw.preload)
+        with catch_logging() as log:
+            raw_sss_mm = maxwell_filter(raw, preload=fname, verbose=True,
+                                        **kwargs)
+        assert ('while processing' in log.getvalue()) == (not raw.preload)
+        assert isinstance(raw_sss_mm._data, np.memmap)
+        assert raw_sss_mm._data.filename == op.abspath(fname)
+        assert_allclose(raw_sss_mm._data, raw_sss._data)
+    del raw_sss_mm
+    with pytest.raises(ValueError, match='preload must be True'):
+        maxwell_filter(raw_kit, preload=False, **kwargs)
+
+
+def test_decomp_cache():
+    """Test caching of the SSS decompositions."""
+    tempdir = _TempDir()
+    kit_dir = op.join(io_dir, 'kit', 'tests', 'data')
+    raw_kit = read_raw_kit(op.join(kit_dir, 'test.sqd'))
+    kwargs = dict(origin=(0., 0., 0.04), ignore_ref=True)
+    _decomp_cache.clear()
+    raw_sss = maxwell_filter(raw_kit, **kwargs)
+    assert len(_decomp_cache) == 1
+    with catch_logging() as log:
+        raw_sss_2 = maxwell_filter(raw_kit, verbose='debug', **kwargs)
+    log = log.getvalue()
+    assert 'Using cached decomposition' in log
+    assert '12/15 out' in log  # still reported
+    assert_allclose(raw_sss_2._data, raw_sss._data)
+    # persisting to disk
+    orig_dir = os.getenv('MNE_CACHE_DIR', None)
+    try:
+        os.environ['MNE_CACHE_DIR'] = tempdir
+        _decomp_cache.clear()
+        maxwell_filter(raw_kit, **kwargs)
+        assert len(glob(op.join(tempdir, 'mne_sss_decomp_*.npz'))) == 1
+        _decomp_cache.clear()
+        with catch_logging() as log:
+            raw_sss_2 = maxwell_filter(raw_kit, verbose='debug', **kwargs)
+        assert 'Reading cached' in log.getvalue()
+        assert_allclose(raw_sss_2._data, raw_sss._data)
+        # an unreadable entry is recomputed
+        fname = glob(op.join(tempdir, 'mne_sss_decomp_*.npz'))[0]
+        with open(fname, 'wb') as fid:
+            fid.write(b'foo')
+        _decomp_cache.clear()
+        with catch_logging() as log:
+            raw_sss_2 = maxwell_filter(raw_kit, verbose='debug', **kwargs)
+        assert 'Could not read cached' in log.getvalue()
+        assert_allclose(raw_sss_2._data, raw_sss._data)
+    finally:
+        if orig_dir is not None:
+            os.environ['MNE_CACHE_DIR'] = orig_dir
+        else:
+            del os.environ['MNE_CACHE_DIR']
+    _decomp_cache.clear()
+
+
 def test_spherical_conversions():
     """Test spherical harmonic conversions."""
     # Test our real<->complex conversion functions
@@ -10,5 +10,6 @@
 from .client import RtClient
 from .epochs import RtEpochs
 from .mockclient import MockRtClient
+from .chpi import RtHeadPos
 from .fieldtrip_client import FieldTripClient
 from .stim_server_client import StimServer, StimClient
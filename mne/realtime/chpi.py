@@ -0,0 +1,230 @@
+# Authors: Eric Larson <larson.eric.d@gmail.com>
+#
+# License: BSD (3-clause)
+
+import copy
+
+import numpy as np
+
+from ..chpi import (_get_hpi_initial_fit, _setup_hpi_struct,
+                    _fit_cHPI_amplitudes_windows, _check_chpi_refit,
+                    _fit_chpi_windows, _apply_quat)
+from ..transforms import apply_trans, invert_transform, rot_to_quat
+from ..utils import verbose, fill_doc, use_log_level, _check_option
+
+
+@fill_doc
+class RtHeadPos(object):
+    """Realtime head position estimation using cHPI coils.
+
+    The head position is estimated incrementally from the data buffers
+    received from a realtime client, using the same cHPI model and fitting
+    procedure as for offline head position estimation. A new position is
+    available as soon as the data of its time window (of duration
+    ``t_window``) have been received. For example, to monitor the head
+    position during an acquisition by a running mne_rt_server on
+    'localhost'::
+
+        client = mne.realtime.RtClient('localhost')
+        rt_head_pos = mne.realtime.RtHeadPos(client)
+        rt_head_pos.start()  # start the measurement and receiving buffers
+
+        head_pos = rt_head_pos.head_pos  # positions fit so far
+
+    Parameters
+    ----------
+    client : instance of mne.realtime.RtClient | mne.realtime.MockRtClient
+        The realtime client.
+    t_step_min : float
+        Minimum time step to use. If correlations are sufficiently high,
+        t_step_max will be used.
+    t_step_max : float
+        Maximum time step to use.
+    t_window : float
+        Time window to use to estimate the head positions.
+    dist_limit : float
+        Minimum distance (m) to accept for coil position fitting.
+    gof_limit : float
+        Minimum goodness of fit to accept.
+    use_distances : bool
+        use dist_limit to choose 'good' coils based on pairwise distances.
+    too_close : str
+        How to handle HPI positions too close to the sensors,
+        can be 'raise', 'warning', or 'info'.
+    %(verbose)s Defaults to client.verbose.
+
+    Attributes
+    ----------
+    info : dict
+        Measurement info.
+    head_pos : ndarray, shape (N, 10)
+        The ``[t, q1, q2, q3, x, y, z, gof, err, v]`` for each fit so far,
+        with times relative to the first received buffer.
+
+    Notes
+    -----
+    .. versionadded:: 0.18
+    """
+
+    @verbose
+    def __init__(self, client, t_step_min=0.1, t_step_max=10.,
+                 t_window=0.2, dist_limit=0.005, gof_limit=0.98,
+                 use_distances=True, too_close='raise',
+                 verbose=None):  # noqa: D102
+        from scipy.spatial.distance import cdist
+        _check_option('too_close', too_close, ['raise', 'warning', 'info'])
+        self.info = copy.deepcopy(client.get_measurement_info())
+        self.verbose = client.verbose if verbose is None else verbose
+        self._client = client
+
+        # extract hpi system information
+        self._hpi_dig_head_rrs = _get_hpi_initial_fit(self.info)
+        sfreq = self.info['sfreq']
+        self._hpi = _setup_hpi_struct(self.info, int(round(t_window * sfreq)))
+        self._hpi['n_freqs'] = len(self._hpi['freqs'])
+        self._hpi_coil_dists = cdist(self._hpi_dig_head_rrs,
+                                     self._hpi_dig_head_rrs)
+        self._t_step_min = t_step_min
+        self._t_step_max = t_step_max
+        self._t_window = t_window
+        self._dist_limit = dist_limit
+        self._gof_limit = gof_limit
+        self._use_distances = use_distances
+        self._too_close = too_close
+
+        # calibration factors of the channels we use
+        self._picks = self._hpi['meg_picks']
+        if self._hpi['hpi_pick'] is not None:
+            self._picks = np.concatenate([self._picks,
+                                          [self._hpi['hpi_pick']]])
+        self._cals = np.array([self.info['chs'][k]['range'] *
+                               self.info['chs'][k]['cal']
+                               for k in self._picks])[:, np.newaxis]
+
+        # state kept between buffers
+        dev_head_t = self.info['dev_head_t']['trans']
+        head_dev_t = invert_transform(self.info['dev_head_t'])['trans']
+        self._last = dict(sin_fit=None, fit_time=t_step_min,
+                          coil_dev_rrs=apply_trans(head_dev_t,
+                                                   self._hpi_dig_head_rrs),
+                          quat=np.concatenate([
+                              rot_to_quat(dev_head_t[:3, :3]),
+                              dev_head_t[:3, 3]]))
+        self._data = np.zeros((len(self._picks), 0))
+        self._data_start = 0  # first sample in self._data
+        self._n_fit = 0  # number of windows processed
+        self._quats = list()
+        self._started = False
+
+    @property
+    def head_pos(self):
+        """The head positions fit so far."""
+        return np.array(self._quats, np.float64).reshape(-1, 10)
+
+    def start(self):
+        """Start receiving buffers.
+
+        The measurement will be started if it has not already been started.
+        """
+        if not self._started:
+            self._client.register_receive_callback(self._process_raw_buffer)
+            self._client.start_receive_thread(self.info['nchan'])
+            self._started = True
+
+    def stop(self, stop_receive_thread=True, stop_measurement=False):
+        """Stop receiving buffers.
+
+        Parameters
+        ----------
+        stop_receive_thread : bool
+            Stop the receive thread. Note: Other instances will also
+            stop receiving buffers when the receive thread is stopped. The
+            receive thread will always be stopped if stop_measurement is True.
+        stop_measurement : bool
+            Also stop the measurement. Note: Other clients attached to the
+            server will also stop receiving data.
+        """
+        if self._started:
+            self._client.unregister_receive_callback(self._process_raw_buffer)
+            self._started = False
+
+        if stop_receive_thread or stop_measurement:
+            self._client.stop_receive_thread(stop_measurement=stop_measurement)
+
+    def _process_raw_buffer(self, raw_buffer):
+        """Process raw buffer (callback from RtClient).
+
+        Note: Do not print log messages during regular use. It will be printed
+        asynchronously which is annoying when working in an interactive shell.
+
+        Parameters
+        ----------
+        raw_buffer : array of float, shape=(nchan, n_times)
+            The raw buffer.
+        """
+        hpi = self._hpi
+        sfreq = self.info['sfreq']
+        n_window = hpi['n_window']
+        # apply calibration without inplace modification
+        self._data = np.concatenate(
+            [self._data, self._cals * raw_buffer[self._picks]], axis=1)
+        n_times = self._data_start + self._data.shape[1]
+
+        # windows that have been fully received
+        midpts = list()
+        while True:
+            midpt = self._get_midpt(self._n_fit + len(midpts))
+            if midpt - n_window // 2 + n_window > n_times:
+                break
+            midpts.append(midpt)
+        if len(midpts) == 0:
+            return
+        self._n_fit += len(midpts)
+        starts = np.array(midpts) - n_window // 2
+        fit_times = (np.array(midpts) - n_window / 2.) / sfreq
+        n_meg = len(hpi['meg_picks'])
+        with use_log_level(False):
+            sin_fits = _fit_cHPI_amplitudes_windows(
+                self._data[:n_meg],
+                self._data[n_meg:] if len(self._picks) > n_meg else None,
+                starts - self._data_start, hpi, fit_times)
+            for fit_time, sin_fit in zip(fit_times, sin_fits):
+                if sin_fit is not None and _check_chpi_refit(
+                        sin_fit, fit_time, self._last, self._t_step_max):
+                    self._fit_head_pos(fit_time, sin_fit)
+
+        # only keep the data needed for the next window
+        n_drop = self._get_midpt(self._n_fit) - n_window // 2
+        n_drop = min(max(n_drop - self._data_start, 0), self._data.shape[1])
+        self._data = self._data[:, n_drop:]
+        self._data_start += n_drop
+
+    def _get_midpt(self, idx):
+        """Get the center sample of a time window."""
+        return int(round((self._t_window / 2. + self._t_step_min * idx) *
+                         self.info['sfreq']))
+
+    def _fit_head_pos(self, fit_time, sin_fit):
+        """Fit the head position in one time window."""
+        last = self._last
+        this_coil_dev_rrs, g_coils, use_mask, this_quat, g = \
+            _fit_chpi_windows(
+                [sin_fit], last['coil_dev_rrs'], last['quat'], self._hpi,
+                self._hpi_dig_head_rrs, self._hpi_coil_dists,
+                self._dist_limit, self._gof_limit, self._use_distances,
+                self._too_close)[0]
+        if this_quat is None or g < self._gof_limit:
+            return
+        # resulting errors in head coil positions
+        est_coil_head_rrs = _apply_quat(this_quat, this_coil_dev_rrs)
+        errs = np.sqrt(((self._hpi_dig_head_rrs -
+                         est_coil_head_rrs) ** 2).sum(axis=-1))
+        e = errs[use_mask].mean()  # m
+        dt = self._t_window
+        d = 100 * np.sqrt(np.sum(last['quat'][3:] - this_quat[3:]) ** 2)  # cm
+        v = d / dt  # cm/sec
+        self._quats.append(np.concatenate(([fit_time], this_quat, [g],
+                                           [e * 100], [v])))
+        last['fit_time'] = fit_time
+        last['quat'] = this_quat
+        last['coil_dev_rrs'] = this_coil_dev_rrs
@@ -0,0 +1,48 @@
+# Authors: Eric Larson <larson.eric.d@gmail.com>
+#
+# License: BSD (3-clause)
+
+import os.path as op
+
+from numpy.testing import assert_allclose
+import pytest
+
+from mne.chpi import _calculate_chpi_positions
+from mne.datasets import testing
+from mne.io import read_raw_fif
+from mne.realtime import MockRtClient, RtHeadPos
+from mne.utils import run_tests_if_main
+
+data_path = testing.data_path(download=False)
+chpi_fif_fname = op.join(data_path, 'SSS', 'test_move_anon_raw.fif')
+
+
+@testing.requires_testing_data
+@pytest.mark.parametrize('buffer_size', [300, 1000])
+def test_rt_head_pos(buffer_size):
+    """Test realtime head position estimation."""
+    raw = read_raw_fif(chpi_fif_fname, allow_maxshield='yes')
+    raw.crop(0, 3).load_data()
+    kwargs = dict(t_step_min=0.5, t_step_max=0.5)
+    quats = _calculate_chpi_positions(raw, **kwargs)
+    client = MockRtClient(raw)
+    rt_head_pos = RtHeadPos(client, **kwargs)
+    assert rt_head_pos.head_pos.shape == (0, 10)
+    rt_head_pos.start()
+    client.send_data(rt_head_pos, picks=None, tmin=0, tmax=raw.times[-1],
+                     buffer_size=buffer_size)
+    rt_head_pos.stop(stop_receive_thread=False)
+    rt_quats = rt_head_pos.head_pos
+    # the last window is only fit offline (as a truncated window)
+    assert len(quats) - 1 <= len(rt_quats) <= len(quats)
+    quats = quats[:len(rt_quats)]
+    assert_allclose(rt_quats[:, 0], quats[:, 0])
+    assert_allclose(rt_quats[:, 1:4], quats[:, 1:4], atol=1e-3)  # rotation
+    assert_allclose(rt_quats[:, 4:7], quats[:, 4:7], atol=1e-4)  # 0.1 mm
+    # only the data needed for the next window is kept
+    assert rt_head_pos._data.shape[1] < rt_head_pos._hpi['n_window']
+    with pytest.raises(ValueError, match='too_close'):
+        RtHeadPos(client, too_close='foo')
+
+
+run_tests_if_main()
@@ -26,13 +26,18 @@ from ..forward import (_magnetic_dipole_field_vec, _merge_meg_eeg_fwds,
                        _prepare_for_forward, _transform_orig_meg_coils,
                        _compute_forwards, _to_forward_dict,
                        restrict_forward_to_stc)
-from ..transforms import _get_trans, transform_surface_to
+from ..transforms import (_get_trans, transform_surface_to, rot_to_quat,
+                          _angle_between_quats)
 from ..source_space import (_ensure_src, _points_outside_surface,
                             _adjust_patch_info)
 from ..source_estimate import _BaseSourceEstimate
 from ..utils import (logger, verbose, check_random_state, warn, _pl,
-                     _validate_type)
-from ..parallel import check_n_jobs
+                     _validate_type, _LRUCache, object_size)
+from ..parallel import check_n_jobs, parallel_func
+
+# Size of the forward solutions that are kept around in memory to be reused
+# for the head positions they correspond to (see _iter_forward_solutions)
+_fwd_cache_bytes = 256e6
 
 
 def _check_cov(info, cov):
@@ -67,7 +72,7 @@ def simulate_raw(raw, stc, trans, src, bem, cov='simple',
                  blink=False, ecg=False, chpi=False, head_pos=None,
                  mindist=1.0, interp='cos2', iir_filter=None, n_jobs=1,
                  random_state=None, use_cps=True, forward=None,
-                 duration=None, verbose=None):
+                 duration=None, head_pos_tol=None, verbose=None):
     u"""Simulate raw data.
 
     Head movements can optionally be simulated using the ``head_pos``
@@ -130,7 +135,8 @@ def simulate_raw(raw, stc, trans, src, bem, cov='simple',
     iir_filter : None | array
         IIR filter coefficients (denominator) e.g. [1, -1, 0.2].
     n_jobs : int
-        Number of jobs to use.
+        Number of jobs to use. The forward solutions of the different
+        head positions are computed in parallel.
     random_state : None | int | ~numpy.random.RandomState
         The random generator state used for blink, ECG, and sensor
         noise randomization.
@@ -146,6 +152,15 @@ def simulate_raw(raw, stc, trans, src, bem, cov='simple',
         The duration to simulate. Can be None to use the duration of ``raw``.
         Must be supplied if ``raw`` is an instance of :class:`mne.Info`.
 
+        .. versionadded:: 0.18
+    head_pos_tol : tuple of float | None
+        The translation (in m) and rotation (in degrees) tolerances used
+        to group the head positions. A forward solution is only computed
+        for the first position of each group, and reused for the other
+        positions of the group, which can greatly speed up simulations
+        with many positions. None (default) only reuses the forward
+        solutions of identical head positions.
+
         .. versionadded:: 0.18
     %(verbose)s
 
@@ -239,6 +254,11 @@ def simulate_raw(raw, stc, trans, src, bem, cov='simple',
 
     stim = False if len(pick_types(info, meg=False, stim=True)) == 0 else True
     n_jobs = check_n_jobs(n_jobs)
+    if head_pos_tol is not None:
+        head_pos_tol = np.array(head_pos_tol, float)
+        if head_pos_tol.shape != (2,) or (head_pos_tol < 0).any():
+            raise ValueError('head_pos_tol must be None or a tuple of two '
+                             'non-negative floats, got %s' % (head_pos_tol,))
 
     rng = check_random_state(random_state)
     interper = _Interp2(interp)
@@ -419,29 +439,28 @@ def simulate_raw(raw, stc, trans, src, bem, cov='simple',
     for fi, (fwd, fwd_blink, fwd_ecg, fwd_chpi) in \
         enumerate(_iter_forward_solutions(
             fwd_info, trans, src, bem, exg_bem, dev_head_ts, mindist,
-            hpi_rrs, blink_rrs, ecg_rr, n_jobs, forward)):
+            hpi_rrs, blink_rrs, ecg_rr, n_jobs, forward, head_pos_tol)):
         # must be fixed orientation
         # XXX eventually we could speed this up by allowing the forward
         # solution code to only compute the normal direction
         fwd = convert_forward_solution(fwd, surf_ori=True, force_fixed=True,
                                        use_cps=use_cps, verbose=False)
         if blink:
+            # the forwards can be reused across positions, so don't modify
+            # them in place
             fwd_blink = fwd_blink['sol']['data']
-            for ii in range(len(blink_rrs)):
-                fwd_blink[:, ii] = np.dot(fwd_blink[:, 3 * ii:3 * (ii + 1)],
-                                          blink_nns[ii])
-            fwd_blink = fwd_blink[:, :len(blink_rrs)]
-            fwd_blink = fwd_blink.sum(axis=1)[:, np.newaxis]
+            fwd_blink = sum(np.dot(fwd_blink[:, 3 * ii:3 * (ii + 1)],
+                                   blink_nns[ii])
+                            for ii in range(len(blink_rrs)))[:, np.newaxis]
         # just use one arbitrary direction
         if ecg:
             fwd_ecg = fwd_ecg['sol']['data'][:, [0]]
 
         # align cHPI magnetic dipoles in approx. radial direction
         if chpi:
-            for ii in range(len(hpi_rrs)):
-                fwd_chpi[:, ii] = np.dot(fwd_chpi[:, 3 * ii:3 * (ii + 1)],
-                                         hpi_nns[ii])
-            fwd_chpi = fwd_chpi[:, :len(hpi_rrs)].copy()
+            fwd_chpi = np.array([np.dot(fwd_chpi[:, 3 * ii:3 * (ii + 1)],
+                                        hpi_nns[ii])
+                                 for ii in range(len(hpi_rrs))]).T
 
         assert fwd['sol']['data'].shape[0] == len(meeg_picks)
         interper['fwd'] = fwd['sol']['data']
@@ -506,7 +525,7 @@ def simulate_raw(raw, stc, trans, src, bem, cov='simple',
 
 def _iter_forward_solutions(info, trans, src, bem, exg_bem, dev_head_ts,
                             mindist, hpi_rrs, blink_rrs, ecg_rrs, n_jobs,
-                            forward):
+                            forward, head_pos_tol=None):
     """Calculate a forward solution for a subject."""
     logger.info('Setting up forward solutions')
     mri_head_t, trans = _get_trans(trans)
@@ -544,6 +563,7 @@ def _iter_forward_solutions(info, trans, src, bem, exg_bem, dev_head_ts,
         return
 
     coord_frame = FIFF.FIFFV_COORD_HEAD
+    bem_surf = None
     if bem is not None and not bem['is_sphere']:
         idx = np.where(np.array([s['id'] for s in bem['surfs']]) ==
                        FIFF.FIFFV_BEM_SURF_ID_BRAIN)[0]
@@ -551,59 +571,127 @@ def _iter_forward_solutions(info, trans, src, bem, exg_bem, dev_head_ts,
         # make a copy so it isn't mangled in use
         bem_surf = transform_surface_to(bem['surfs'][idx[0]], coord_frame,
                                         mri_head_t, copy=True)
-    for ti, dev_head_t in enumerate(dev_head_ts):
-        # Could be *slightly* more efficient not to do this N times,
-        # but the cost here is tiny compared to actual fwd calculation
-        logger.info('Computing gain matrix for transform #%s/%s'
-                    % (ti + 1, len(dev_head_ts)))
-        _transform_orig_meg_coils(megcoils, dev_head_t)
-        _transform_orig_meg_coils(compcoils, dev_head_t)
-
-        # Make sure our sensors are all outside our BEM
-        coil_rr = [coil['r0'] for coil in megcoils]
-
-        # Compute forward
-        if forward is None:
-            if not bem['is_sphere']:
-                outside = _points_outside_surface(coil_rr, bem_surf, n_jobs,
-                                                  verbose=False)
-            elif bem.radius is not None:
-                d = coil_rr - bem['r0']
-                outside = np.sqrt(np.sum(d * d, axis=1)) > bem.radius
-            else:  # only r0 provided
-                outside = np.ones(len(coil_rr), bool)
-            if not outside.all():
-                raise RuntimeError('%s MEG sensors collided with inner skull '
-                                   'surface for transform %s'
-                                   % (np.sum(~outside), ti))
-            megfwd = _compute_forwards(rr, bem, [megcoils], [compcoils],
-                                       [meg_info], ['meg'], n_jobs,
-                                       verbose=False)[0]
-            megfwd = _to_forward_dict(megfwd, megnames)
-        else:
-            megfwd = pick_channels_forward(forward, megnames, verbose=False)
-        fwd = _merge_meg_eeg_fwds(megfwd, eegfwd, verbose=False)
-        fwd.update(**update_kwargs)
-
-        fwd_blink = fwd_ecg = fwd_chpi = None
-        if blink_rrs is not None:
-            megblink = _compute_forwards(blink_rrs, exg_bem, [megcoils],
-                                         [compcoils], [meg_info], ['meg'],
-                                         n_jobs, verbose=False)[0]
-            megblink = _to_forward_dict(megblink, megnames)
-            fwd_blink = _merge_meg_eeg_fwds(megblink, eegblink, verbose=False)
-        if ecg_rrs is not None:
-            megecg = _compute_forwards(ecg_rrs, exg_bem, [megcoils],
-                                       [compcoils], [meg_info], ['meg'],
-                                       n_jobs, verbose=False)[0]
-            fwd_ecg = _to_forward_dict(megecg, megnames)
-        if hpi_rrs is not None:
-            fwd_chpi = _magnetic_dipole_field_vec(hpi_rrs, megcoils).T
+    clusters = _cluster_dev_head_ts(dev_head_ts, head_pos_tol)
+    n_unique = clusters.max() + 1
+    logger.info('Computing gain matrices for %s unique transform%s'
+                % (n_unique, _pl(n_unique)))
+    # Forwards are computed in parallel across the unique transforms when
+    # there are several to do, otherwise the jobs go to each computation
+    inner_n_jobs = n_jobs if n_unique == 1 else 1
+    parallel, p_fun, _ = parallel_func(_meg_fwds_at, min(n_jobs, n_unique))
+    cache = _LRUCache(_fwd_cache_bytes)
+    for ti, ci in enumerate(clusters):
+        if ci not in cache:
+            # compute this one and the next ones we will need
+            batch = list()
+            for cj in clusters[ti:]:
+                if cj not in cache and cj not in batch:
+                    batch.append(cj)
+                    if len(batch) == n_jobs:
+                        break
+            reps = [np.where(clusters == cj)[0][0] for cj in batch]
+            for ri in reps:
+                logger.info('Computing gain matrix for transform #%s/%s'
+                            % (ri + 1, len(dev_head_ts)))
+            out = parallel(p_fun(
+                dev_head_ts[ri], ri, megcoils, compcoils, meg_info, megnames,
+                rr, bem, bem_surf, exg_bem, hpi_rrs, blink_rrs, ecg_rrs,
+                forward, inner_n_jobs) for ri in reps)
+            fwds = list()
+            for megfwd, megblink, fwd_ecg, fwd_chpi in out:
+                fwd = _merge_meg_eeg_fwds(megfwd, eegfwd, verbose=False)
+                fwd_blink = None
+                if megblink is not None:
+                    fwd_blink = _merge_meg_eeg_fwds(megblink, eegblink,
+                                                    verbose=False)
+                fwds.append((fwd, fwd_blink, fwd_ecg, fwd_chpi))
+            # make sure that the whole batch fits in the cache
+            cache.resize(max(cache.max_bytes, object_size(fwds)))
+            for cj, this_fwds in zip(batch, fwds):
+                cache[cj] = this_fwds
+                this_fwds[0].update(**update_kwargs)
+            del out, fwds
+        fwd, fwd_blink, fwd_ecg, fwd_chpi = cache[ci]
         yield fwd, fwd_blink, fwd_ecg, fwd_chpi
     # need an extra one to fill last buffer
     yield fwd, fwd_blink, fwd_ecg, fwd_chpi
 
 
+def _cluster_dev_head_ts(dev_head_ts, head_pos_tol):
+    """Assign each head position to a group of (nearly) identical ones."""
+    clusters = np.empty(len(dev_head_ts), int)
+    if head_pos_tol is None:
+        keys = dict()
+        for ti, dev_head_t in enumerate(dev_head_ts):
+            key = np.asarray(dev_head_t['trans'], float).tobytes()
+            clusters[ti] = keys.setdefault(key, len(keys))
+        return clusters
+    # compare each position to the first position of each existing group
+    trans = np.array([dev_head_t['trans'] for dev_head_t in dev_head_ts])
+    quats = rot_to_quat(trans[:, :3, :3])
+    trans = trans[:, :3, 3]
+    reps = list()
+    for ti in range(len(dev_head_ts)):
+        if len(reps) > 0:
+            dist = np.linalg.norm(trans[reps] - trans[ti], axis=1)
+            angle = np.rad2deg(_angle_between_quats(quats[reps], quats[ti]))
+            match = np.where((dist <= head_pos_tol[0]) &
+                             (angle <= head_pos_tol[1]))[0]
+            if len(match) > 0:
+                clusters[ti] = match[0]
+                continue
+        clusters[ti] = len(reps)
+        reps.append(ti)
+    return clusters
+
+
+def _meg_fwds_at(dev_head_t, ti, megcoils, compcoils, meg_info, megnames, rr,
+                 bem, bem_surf, exg_bem, hpi_rrs, blink_rrs, ecg_rrs,
+                 forward, n_jobs):
+    """Compute the MEG forward solutions for one head position."""
+    _transform_orig_meg_coils(megcoils, dev_head_t)
+    _transform_orig_meg_coils(compcoils, dev_head_t)
+
+    # Make sure our sensors are all outside our BEM
+    coil_rr = [coil['r0'] for coil in megcoils]
+
+    # Compute forward
+    if forward is None:
+        if not bem['is_sphere']:
+            outside = _points_outside_surface(coil_rr, bem_surf, n_jobs,
+                                              verbose=False)
+        elif bem.radius is not None:
+            d = coil_rr - bem['r0']
+            outside = np.sqrt(np.sum(d * d, axis=1)) > bem.radius
+        else:  # only r0 provided
+            outside = np.ones(len(coil_rr), bool)
+        if not outside.all():
+            raise RuntimeError('%s MEG sensors collided with inner skull '
+                               'surface for transform %s'
+                               % (np.sum(~outside), ti))
+        megfwd = _compute_forwards(rr, bem, [megcoils], [compcoils],
+                                   [meg_info], ['meg'], n_jobs,
+                                   verbose=False)[0]
+        megfwd = _to_forward_dict(megfwd, megnames)
+    else:
+        megfwd = pick_channels_forward(forward, megnames, verbose=False)
+
+    megblink = fwd_ecg = fwd_chpi = None
+    if blink_rrs is not None:
+        megblink = _compute_forwards(blink_rrs, exg_bem, [megcoils],
+                                     [compcoils], [meg_info], ['meg'],
+                                     n_jobs, verbose=False)[0]
+        megblink = _to_forward_dict(megblink, megnames)
+    if ecg_rrs is not None:
+        megecg = _compute_forwards(ecg_rrs, exg_bem, [megcoils],
+                                   [compcoils], [meg_info], ['meg'],
+                                   n_jobs, verbose=False)[0]
+        fwd_ecg = _to_forward_dict(megecg, megnames)
+    if hpi_rrs is not None:
+        fwd_chpi = _magnetic_dipole_field_vec(hpi_rrs, megcoils).T
+    return megfwd, megblink, fwd_ecg, fwd_chpi
+
+
 def _restrict_source_space_to(src, vertices):
     """Trim down a source space."""
     assert len(src) == len(vertices)
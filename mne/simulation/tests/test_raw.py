@@ -190,6 +190,23 @@ def test_simulate_raw_sphere():
     assert_allclose(raw_sim[:][0], raw_sim_hann[:][0], rtol=1e-1, atol=1e-14)
     del raw_sim, raw_sim_hann
 
+    # check that positions can be computed in parallel, and that positions
+    # within tolerance reuse the same forward
+    raw_sim = simulate_raw(raw, stc, trans, src, sphere, cov=None,
+                           head_pos=head_pos_sim)
+    raw_sim_2 = simulate_raw(raw, stc, trans, src, sphere, cov=None,
+                             head_pos=head_pos_sim, n_jobs=2)
+    assert_allclose(raw_sim[:][0], raw_sim_2[:][0], rtol=1e-7, atol=1e-30)
+    raw_sim = simulate_raw(raw, stc, trans, src, sphere, cov=None)
+    raw_sim_2 = simulate_raw(raw, stc, trans, src, sphere, cov=None,
+                             head_pos=head_pos_sim, head_pos_tol=(0.002, 1.))
+    picks = pick_types(raw.info, meg=True, eeg=True)
+    assert_allclose(raw_sim[picks][0], raw_sim_2[picks][0],
+                    rtol=1e-7, atol=1e-30)
+    del raw_sim, raw_sim_2
+    with pytest.raises(ValueError, match='head_pos_tol must be'):
+        simulate_raw(raw, stc, trans, src, sphere, head_pos_tol=0.001)
+
     # Make impossible transform (translate up into helmet) and ensure failure
     head_pos_sim_err = deepcopy(head_pos_sim)
     head_pos_sim_err[1.][2, 3] -= 0.1  # z trans upward 10cm
@@ -2504,6 +2504,32 @@ def _get_label_flip(labels, label_vertidx, src):
     return label_flip
 
 
+def _get_label_operator(label_vertidx, label_flip, nvert_vol, n_vertices):
+    """Get the sparse matrix averaging the time courses of the labels.
+
+    The last rows average the time courses of the volume source spaces.
+    """
+    rows, cols, weights = [np.zeros(0, int)], [np.zeros(0, int)], [np.zeros(0)]
+    for li, (vertidx, flip) in enumerate(zip(label_vertidx, label_flip)):
+        if vertidx is not None:
+            rows.append(np.full(len(vertidx), li))
+            cols.append(vertidx)
+            weight = np.full(len(vertidx), 1. / len(vertidx))
+            if flip is not None:
+                weight *= flip[:, 0]
+            weights.append(weight)
+    v1 = n_vertices - sum(nvert_vol)
+    for vi, nv in enumerate(nvert_vol):
+        rows.append(np.full(nv, len(label_vertidx) + vi))
+        cols.append(np.arange(v1, v1 + nv))
+        weights.append(np.full(nv, 1. / max(nv, 1)))
+        v1 += nv
+    rows, cols = np.concatenate(rows), np.concatenate(cols)
+    return sparse.csr_matrix(
+        (np.concatenate(weights), (rows, cols)),
+        shape=(len(label_vertidx) + len(nvert_vol), n_vertices))
+
+
 def _pca_flip(flip, data):
     U, s, V = linalg.svd(data, full_matrices=False)
     # determine sign-flip
@@ -2590,6 +2616,12 @@ def _gen_extract_label_time_course(stcs, labels, src, mode='mean',
     else:
         src_flip = [None] * len(labels)
 
+    # sparse operator averaging the (sign-flipped) time courses of each label
+    # and of each volume source space, computed once for all stcs
+    label_op = _get_label_operator(label_vertidx, src_flip, nvert[2:],
+                                   sum(nvert))
+    vol_op = label_op[len(labels):]
+
     # loop through source estimates and extract time series
     for stc in stcs:
         # make sure the stc is compatible with the source space
@@ -2614,21 +2646,15 @@ def _gen_extract_label_time_course(stcs, labels, src, mode='mean',
         # do the extraction
         label_tc = np.zeros((n_labels, stc.data.shape[1]),
                             dtype=stc.data.dtype)
-        for i, (vertidx, flip) in enumerate(zip(label_vertidx, src_flip)):
-            if vertidx is not None:
-                label_tc[i] = func(flip, stc.data[vertidx, :])
-
-        # extract label time series for the vol src space
-        if len(src) > 2:
-            v1 = nvert[0] + nvert[1]
-            for i, nv in enumerate(nvert[2:]):
-
-                v2 = v1 + nv
-                v = range(v1, v2)
-                if nv != 0:
-                    label_tc[n_aparc + i] = np.mean(stc.data[v, :], axis=0)
+        if mode in ('mean', 'mean_flip'):
+            label_tc[:] = label_op * stc.data
+        else:
+            for i, (vertidx, flip) in enumerate(zip(label_vertidx, src_flip)):
+                if vertidx is not None:
+                    label_tc[i] = func(flip, stc.data[vertidx, :])
 
-                v1 = v2
+            # extract label time series for the vol src space
+            label_tc[len(labels):] = vol_op * stc.data
 
         # this is a generator!
         yield label_tc
@@ -2290,12 +2290,86 @@ def _points_outside_surface(rr, surf, n_jobs=1, verbose=None):
     rr = np.atleast_2d(rr)
     assert rr.shape[1] == 3
     assert n_jobs > 0
+    # Only the points close to the surface need the (slow) sum of the solid
+    # angles over all triangles, the others are classified in groups
+    if len(rr) >= 1000 and _surface_is_closed(surf['tris']):
+        outside, check = _points_outside_surface_grid(rr, surf)
+    else:
+        outside, check = np.zeros(len(rr), bool), np.ones(len(rr), bool)
+    outside[check] = _points_outside_surface_solids(rr[check], surf, n_jobs)
+    return outside
+
+
+def _points_outside_surface_solids(rr, surf, n_jobs=1):
+    """Check whether points are outside a surface using solid angles."""
+    if len(rr) == 0:
+        return np.zeros(0, bool)
     parallel, p_fun, _ = parallel_func(_get_solids, n_jobs)
     tot_angles = parallel(p_fun(surf['rr'][tris], rr)
                           for tris in np.array_split(surf['tris'], n_jobs))
     return np.abs(np.sum(tot_angles, axis=0) / (2 * np.pi) - 1.0) > 1e-5
 
 
+def _surface_is_closed(tris):
+    """Check that each edge of a surface is shared by two triangles."""
+    edges = np.sort(np.concatenate([tris[:, [0, 1]], tris[:, [1, 2]],
+                                    tris[:, [2, 0]]]), axis=1).astype(np.int64)
+    n_vertices = edges.max() + 1
+    counts = np.unique(edges[:, 0] * n_vertices + edges[:, 1],
+                       return_counts=True)[1]
+    return bool(np.all(counts == 2))
+
+
+def _points_outside_surface_grid(rr, surf, n_voxels=256):
+    """Classify the points that are not close to a closed surface.
+
+    The space is divided in voxels, and the voxels within one voxel of the
+    surface are marked. The other voxels form connected regions that do not
+    cross the surface, whose points are all inside or all outside of it, so
+    that it is enough to check one point per region. The points in the
+    marked voxels (i.e., close to the surface) are left to be checked.
+    """
+    from scipy import ndimage
+    tri_rrs = surf['rr'][surf['tris']]
+    lims = np.array([np.minimum(rr.min(axis=0), surf['rr'].min(axis=0)),
+                     np.maximum(rr.max(axis=0), surf['rr'].max(axis=0))])
+    size = (lims[1] - lims[0]).max() / n_voxels
+    origin = lims[0] - 2 * size
+    shape = np.floor((lims[1] - origin) / size).astype(int) + 3
+
+    # sample each triangle such that all its points are less than half a
+    # voxel away from a sample (the sub-triangles have edges < size / 2)
+    n_steps = np.ceil(np.linalg.norm(tri_rrs - np.roll(tri_rrs, 1, axis=1),
+                                     axis=2).max(axis=1) / (size / 2.))
+    n_steps = np.maximum(n_steps, 1).astype(int)
+    marked = np.zeros(shape, bool)
+    for n_step in np.unique(n_steps):
+        ii, jj = np.meshgrid(np.arange(n_step + 1), np.arange(n_step + 1))
+        weights = np.array([ii.ravel(), jj.ravel()]).T
+        weights = weights[weights.sum(axis=1) <= n_step] / float(n_step)
+        these_rrs = tri_rrs[n_steps == n_step]
+        samples = these_rrs[:, np.newaxis, 0] + np.einsum(
+            'sw,twk->tsk', weights, these_rrs[:, 1:] - these_rrs[:, :1])
+        idx = np.floor((samples.reshape(-1, 3) - origin) / size).astype(int)
+        marked[tuple(idx.T)] = True
+    # any point less than half a voxel away from the surface is now less than
+    # one voxel away from a sample, i.e., in a neighbor of a marked voxel
+    marked = ndimage.binary_dilation(marked, np.ones((3, 3, 3), bool))
+
+    # classify the regions of the remaining voxels using their first voxel
+    labels, n_labels = ndimage.label(~marked)
+    first = np.unique(labels.ravel(), return_index=True)[1][1:]
+    centers = (np.array(np.unravel_index(first, shape)).T + 0.5) * size
+    centers += origin
+    tot_angle = _get_solids(tri_rrs, centers) / (2 * np.pi)
+    region_outside = np.concatenate([[False], np.abs(tot_angle - 1.) > 1e-5])
+    # only trust the regions that are clearly inside or outside
+    region_ok = np.concatenate([[False], (np.abs(tot_angle) < 1e-5) |
+                                (np.abs(tot_angle - 1.) < 1e-5)])
+    rr_labels = labels[tuple(np.floor((rr - origin) / size).astype(int).T)]
+    return region_outside[rr_labels], ~region_ok[rr_labels]
+
+
 @verbose
 def _ensure_src(src, kind=None, verbose=None):
     """Ensure we have a source space."""
@@ -2366,7 +2440,11 @@ def add_source_space_distances(src, dist_limit=np.inf, n_jobs=1, verbose=None):
     This function can be memory- and CPU-intensive. On a high-end machine
     (2012) running 6 jobs in parallel, an ico-5 (10242 per hemi) source space
     takes about 10 minutes to compute all distances (`dist_limit = np.inf`).
-    With `dist_limit = 0.007`, computing distances takes about 1 minute.
+    With a finite ``dist_limit``, the search for the distances from each
+    source only visits the surface vertices around it, which is much faster
+    (e.g., a few seconds for an oct-6 source space with
+    `dist_limit = 0.007`). The distances are stored as a sparse matrix of
+    single precision values.
 
     We recommend computing distances once per source space and then saving
     the source space to disk, as the computed distances will automatically be
@@ -2401,25 +2479,18 @@ def add_source_space_distances(src, dist_limit=np.inf, n_jobs=1, verbose=None):
                 % (1000 * dist_limit))
     for s in src:
         connectivity = mesh_dist(s['tris'], s['rr'])
-        d = parallel(p_fun(connectivity, s['vertno'], r, dist_limit)
-                     for r in np.array_split(np.arange(len(s['vertno'])),
-                                             n_jobs))
+        runs = _get_src_distance_runs(s['rr'], s['vertno'], dist_limit)
+        d = parallel(p_fun(connectivity, s['vertno'], runs[ji::n_jobs],
+                           dist_limit) for ji in range(min(n_jobs, len(runs))))
         # deal with indexing so we can add patch info
-        min_idx = np.array([dd[1] for dd in d])
-        min_dist = np.array([dd[2] for dd in d])
-        midx = np.argmin(min_dist, axis=0)
-        range_idx = np.arange(len(s['rr']))
-        min_dist = min_dist[midx, range_idx]
-        min_idx = min_idx[midx, range_idx]
+        min_dist, min_idx = d[0][3], d[0][4]
+        for dd in d[1:]:
+            _update_nearest_src(min_dist, min_idx, np.arange(len(min_dist)),
+                                dd[3], dd[4])
         min_dists.append(min_dist)
         min_idxs.append(min_idx)
         # now actually deal with distances, convert to sparse representation
-        d = np.concatenate([dd[0] for dd in d]).ravel()  # already float32
-        idx = d > 0
-        d = d[idx]
-        i, j = np.meshgrid(s['vertno'], s['vertno'])
-        i = i.ravel()[idx]
-        j = j.ravel()[idx]
+        i, j, d = [np.concatenate([dd[k] for dd in d]) for k in range(3)]
         d = sparse.csr_matrix((d, (i, j)),
                               shape=(s['np'], s['np']), dtype=np.float32)
         s['dist'] = d
@@ -2437,33 +2508,86 @@ def add_source_space_distances(src, dist_limit=np.inf, n_jobs=1, verbose=None):
     return src
 
 
-def _do_src_distances(con, vertno, run_inds, limit):
+def _get_src_distance_runs(rr, vertno, limit):
+    """Split the source vertices into runs of the geodesic distance search.
+
+    With a finite limit, the sources are grouped in cubic cells. The
+    shortest paths of length up to ``limit`` starting from the sources of a
+    cell only visit vertices less than ``limit`` away (in Euclidean distance)
+    from the source, so the search can be restricted to the vertices around
+    the cell.
+    """
+    chunk_size = 20  # save memory by chunking (only a little slower)
+    if not np.isfinite(limit):
+        return [(run_inds, None) for run_inds in np.array_split(
+            np.arange(len(vertno)), max(len(vertno) // chunk_size, 1))]
+    from scipy.spatial import cKDTree
+    tree = cKDTree(rr)
+    # larger cells mean fewer (but larger) searches
+    cell_size = 3 * limit
+    cells = np.floor(rr[vertno] / cell_size).astype(int)
+    # encode the cells as single integers (np.unique(..., axis=0) needs
+    # numpy >= 1.13)
+    offset = cells.min(axis=0)
+    shape = cells.max(axis=0) - offset + 1
+    cells, cell_inds = np.unique(np.ravel_multi_index((cells - offset).T,
+                                                      shape),
+                                 return_inverse=True)
+    cells = np.array(np.unravel_index(cells, shape)).T + offset
+    order = np.argsort(cell_inds, kind='mergesort')
+    splits = np.cumsum(np.bincount(cell_inds, minlength=len(cells)))[:-1]
+    runs = list()
+    for cell, run_inds in zip(cells, np.split(order, splits)):
+        use = np.sort(tree.query_ball_point(
+            (cell + 0.5) * cell_size, limit + cell_size * np.sqrt(3) / 2.))
+        # keep the memory used by each search similar to the unlimited case
+        n_chunks = -(-len(run_inds) * len(use) // (chunk_size * len(rr)))
+        runs.extend((these_inds, use) for these_inds in
+                    np.array_split(run_inds, n_chunks))
+    return runs
+
+
+def _update_nearest_src(min_dist, min_idx, use, dist, idx):
+    """Update the nearest sources (on ties, the first source is kept)."""
+    this_dist, this_idx = min_dist[use], min_idx[use]
+    mask = (dist < this_dist) | ((dist == this_dist) & (idx < this_idx))
+    min_dist[use[mask]] = dist[mask]
+    min_idx[use[mask]] = idx[mask]
+
+
+def _do_src_distances(con, vertno, runs, limit):
     """Compute source space distances in chunks."""
     from scipy.sparse.csgraph import dijkstra
     if limit < np.inf:
         func = partial(dijkstra, limit=limit)
     else:
         func = dijkstra
-    chunk_size = 20  # save memory by chunking (only a little slower)
-    lims = np.r_[np.arange(0, len(run_inds), chunk_size), len(run_inds)]
-    n_chunks = len(lims) - 1
-    # eventually we want this in float32, so save memory by only storing 32-bit
-    d = np.empty((len(run_inds), len(vertno)), np.float32)
-    min_dist = np.empty((n_chunks, con.shape[0]))
-    min_idx = np.empty((n_chunks, con.shape[0]), np.int32)
-    range_idx = np.arange(con.shape[0])
-    for li, (l1, l2) in enumerate(zip(lims[:-1], lims[1:])):
-        idx = vertno[run_inds[l1:l2]]
-        out = func(con, indices=idx)
+    n_vertices = con.shape[0]
+    is_src = np.zeros(n_vertices, bool)
+    is_src[vertno] = True
+    min_dist = np.full(n_vertices, np.inf)
+    min_idx = np.full(n_vertices, vertno[0], np.int32)
+    rows, cols, dists = list(), list(), list()
+    for run_inds, use in runs:
+        idx = vertno[run_inds]
+        if use is None:
+            use = np.arange(n_vertices)
+            out = func(con, indices=idx)
+        else:  # restricted to the vertices around the sources
+            out = func(con[use][:, use], indices=np.searchsorted(use, idx))
         midx = np.argmin(out, axis=0)
-        min_idx[li] = idx[midx]
-        min_dist[li] = out[midx, range_idx]
-        d[l1:l2] = out[:, vertno]
-    midx = np.argmin(min_dist, axis=0)
-    min_dist = min_dist[midx, range_idx]
-    min_idx = min_idx[midx, range_idx]
-    d[d == np.inf] = 0  # scipy will give us np.inf for uncalc. distances
-    return d, min_idx, min_dist
+        _update_nearest_src(min_dist, min_idx, use,
+                            out[midx, np.arange(len(use))], idx[midx])
+        # only keep the distances between sources (scipy will give us np.inf
+        # for uncalc. distances), eventually we want them in float32
+        src_use = use[is_src[use]]
+        out = out[:, is_src[use]]
+        row, col = np.nonzero((out > 0) & (out < np.inf))
+        rows.append(idx[row].astype(np.int32))
+        cols.append(src_use[col].astype(np.int32))
+        dists.append(out[row, col].astype(np.float32))
+    return (np.concatenate(rows), np.concatenate(cols),
+            np.concatenate(dists), min_dist, min_idx)
 
 
 def get_volume_labels_from_aseg(mgz_fname, return_colors=False):
@@ -25,9 +25,27 @@ from .io.write import (write_int, start_file, end_block, start_block, end_file,
                        write_string, write_float_sparse_rcs)
 from .channels.channels import _get_meg_system
 from .transforms import transform_surface_to, _pol_to_cart, _cart_to_sph
-from .utils import logger, verbose, get_subjects_dir, warn
+from .utils import logger, verbose, get_subjects_dir, warn, _LRUCache
 from .fixes import _serialize_volume_info, _get_read_geometry, einsum
 
+# Cache of the files read from the subjects directory (surfaces, annotations
+# and morph maps), which are often read many times for the same subjects
+# (e.g., fsaverage). Entries are only used if the file was not modified.
+_file_cache = _LRUCache()
+
+
+def _read_cached(fname, reader, *args):
+    """Read a file with reader(fname, *args), reusing previous reads."""
+    stat = os.stat(fname)
+    key = (op.realpath(fname), stat.st_mtime, stat.st_size, reader, args)
+    out = _file_cache.get(key)
+    if out is None:
+        out = reader(fname, *args)
+        _file_cache[key] = out
+    else:
+        logger.debug('Using cached %s' % (fname,))
+    return deepcopy(out)  # the cached values must not be modified
+
 
 ###############################################################################
 # AUTOMATED SURFACE FINDING
@@ -569,7 +587,7 @@ def read_surface(fname, read_metadata=False, return_dict=False, verbose=None):
     write_surface
     read_tri
     """
-    ret = _get_read_geometry()(fname, read_metadata=read_metadata)
+    ret = _read_cached(fname, _get_read_geometry(), read_metadata)
     if return_dict:
         ret += (dict(rr=ret[0], tris=ret[1], ntri=len(ret[1]), use_tris=ret[1],
                      np=len(ret[0])),)
@@ -936,7 +954,8 @@ def read_morph_map(subject_from, subject_to, subjects_dir=None, xhemi=False,
     for map_name in map_names:
         fname = op.join(mmap_dir, '%s-morph.fif' % map_name)
         if op.exists(fname):
-            return _read_morph_map(fname, subject_from, subject_to)
+            return _read_cached(fname, _read_morph_map, subject_from,
+                                subject_to)
     # if file does not exist, make it
     warn('Morph map "%s" does not exist, creating it and saving it to '
          'disk (this may take a few minutes)' % fname)
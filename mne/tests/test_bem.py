@@ -23,8 +23,9 @@ from mne.utils import (run_tests_if_main, _TempDir, catch_logging,
                        requires_freesurfer, requires_nibabel)
 from mne.bem import (_ico_downsample, _get_ico_map, _order_surfaces,
                      _assert_complete_surface, _assert_inside,
-                     _check_surface_size, _bem_find_surface, make_flash_bem)
-from mne.surface import read_surface
+                     _check_surface_size, _bem_find_surface, make_flash_bem,
+                     _do_lin_pot_coeff, _lin_pot_coeff)
+from mne.surface import read_surface, _get_ico_surface, complete_surface_info
 from mne.io import read_info
 
 fname_raw = op.join(op.dirname(__file__), '..', 'io', 'tests', 'data',
@@ -181,12 +182,40 @@ def test_bem_solution():
         solution = make_bem_solution(model)
         solution_c = read_bem_solution(fname)
         _compare_bem_solutions(solution, solution_c)
+        solution_par = make_bem_solution(model, n_jobs=2)
+        assert_allclose(solution_par['solution'], solution['solution'],
+                        rtol=1e-10)
         write_bem_solution(fname_temp, solution)
         solution_read = read_bem_solution(fname_temp)
         _compare_bem_solutions(solution, solution_c)
         _compare_bem_solutions(solution_read, solution_c)
 
 
+def test_lin_pot_coeff():
+    """Test blocked computation of the linear potential coefficients."""
+    surf = _get_ico_surface(2)
+    surf = complete_surface_info(dict(rr=surf['rr'] * 0.08 + [0., 0., 0.04],
+                                      tris=surf['tris']))
+    fro_idx = np.arange(0, surf['np'], 3)
+    fros = surf['rr'][fro_idx]
+    # the one-triangle-at-a-time version
+    want = np.zeros((len(fros), surf['np']))
+    tri_rr = surf['rr'][surf['tris']]
+    for ti, tri in enumerate(surf['tris']):
+        coeffs = _lin_pot_coeff(fros, tri_rr[[ti]], surf['tri_nn'][[ti]],
+                                surf['tri_area'][[ti]])[:, 0].T
+        coeffs[(fro_idx[:, np.newaxis] == tri).any(-1)] = 0.
+        want[:, tri] -= coeffs
+    assert_equal(want[np.arange(len(fro_idx)), fro_idx], 0.)
+    for max_bytes in (1, 1e5, 16e6):
+        got = _do_lin_pot_coeff(fros, fro_idx, surf, max_bytes)
+        assert_allclose(got, want, rtol=1e-10, atol=1e-12)
+    # other surface
+    got = _do_lin_pot_coeff(fros * 1.1, None, surf, 1e5)
+    assert np.isfinite(got).all()
+    assert (got != 0).all()
+
+
 def test_fit_sphere_to_headshape():
     """Test fitting a sphere to digitization points."""
     # Create points of various kinds
@@ -17,8 +17,11 @@ from mne.io.constants import FIFF
 from mne.chpi import (_calculate_chpi_positions, _calculate_chpi_coil_locs,
                       _calculate_head_pos_ctf, head_pos_to_trans_rot_t,
                       read_head_pos, write_head_pos, filter_chpi,
-                      _get_hpi_info, _get_hpi_initial_fit)
-from mne.transforms import rot_to_quat, _angle_between_quats
+                      _get_hpi_info, _get_hpi_initial_fit, _setup_hpi_struct,
+                      _fit_all_cHPI_amplitudes, _fit_chpi_windows,
+                      _check_chpi_refit)
+from mne.transforms import (rot_to_quat, _angle_between_quats, apply_trans,
+                            invert_transform)
 from mne.simulation import simulate_raw
 from mne.utils import run_tests_if_main, _TempDir, catch_logging
 from mne.datasets import testing
@@ -244,6 +247,68 @@ def test_calculate_chpi_positions_on_chpi5_in_one_second_steps():
     py_quats = _calculate_chpi_positions(raw, t_step_min=1.0, t_step_max=1.0,
                                          t_window=1.0, verbose='debug')
     _assert_quats(py_quats, mf_quats, dist_tol=0.0008, angle_tol=.5)
+    # fitting in chunks
+    py_quats = _calculate_chpi_positions(raw, t_step_min=1.0, t_step_max=1.0,
+                                         t_window=1.0, n_jobs=2)
+    _assert_quats(py_quats, mf_quats, dist_tol=0.0008, angle_tol=.5)
+
+
+def test_check_chpi_refit():
+    """Test that only accepted fits count toward t_step_max."""
+    rng = np.random.RandomState(0)
+    sin_fit = rng.randn(3, 10)
+    last = dict(sin_fit=None, fit_time=0.)
+    assert _check_chpi_refit(sin_fit.copy(), 0., last, 1.)
+    # same amplitudes shortly after the last accepted fit
+    assert not _check_chpi_refit(sin_fit.copy(), 0.5, last, 1.)
+    # the amplitudes changed, but assume that the refit is rejected
+    assert _check_chpi_refit(rng.randn(3, 10), 0.6, last, 1.)
+    assert last['fit_time'] == 0.
+    assert not _check_chpi_refit(last['sin_fit'].copy(), 0.9, last, 1.)
+    assert _check_chpi_refit(last['sin_fit'].copy(), 1.2, last, 1.)
+
+
+@testing.requires_testing_data
+def test_calculate_chpi_positions_serial():
+    """Test that serial cHPI fitting matches fitting one window at a time."""
+    from scipy.spatial.distance import cdist
+    raw = read_raw_fif(chpi_fif_fname, allow_maxshield='yes', preload=True)
+    raw = _decimate_chpi(raw.crop(0., 10.), 15)
+    t_step_min, t_step_max, t_window, gof_limit = 0.1, 1., 0.2, 0.995
+    py_quats = _calculate_chpi_positions(
+        raw, t_step_min=t_step_min, t_step_max=t_step_max, t_window=t_window,
+        gof_limit=gof_limit, too_close='warning')
+    assert len(py_quats) > 0
+    # refit when the amplitudes changed or t_step_max after the last
+    # *accepted* fit, each fit being warm-started from the last accepted one
+    hpi_dig_head_rrs = _get_hpi_initial_fit(raw.info)
+    hpi = _setup_hpi_struct(raw.info, int(round(t_window * raw.info['sfreq'])))
+    hpi['n_freqs'] = len(hpi['freqs'])
+    dev_head_t = raw.info['dev_head_t']['trans']
+    last = dict(sin_fit=None, fit_time=t_step_min,
+                coil_dev_rrs=apply_trans(
+                    invert_transform(raw.info['dev_head_t'])['trans'],
+                    hpi_dig_head_rrs),
+                quat=np.concatenate([rot_to_quat(dev_head_t[:3, :3]),
+                                     dev_head_t[:3, 3]]))
+    fit_idxs = raw.time_as_index(np.arange(raw.times[0] + t_window / 2.,
+                                           raw.times[-1], t_step_min),
+                                 use_rounding=True)
+    quats = list()
+    for fit_time, sin_fit in zip(*_fit_all_cHPI_amplitudes(raw, fit_idxs,
+                                                           hpi)):
+        if sin_fit is None or not _check_chpi_refit(sin_fit, fit_time, last,
+                                                    t_step_max):
+            continue
+        coil_dev_rrs, _, _, quat, g = _fit_chpi_windows(
+            [sin_fit], last['coil_dev_rrs'], last['quat'], hpi,
+            hpi_dig_head_rrs, cdist(hpi_dig_head_rrs, hpi_dig_head_rrs),
+            0.005, gof_limit, True, 'warning')[0]
+        if quat is not None and g >= gof_limit:
+            quats.append(np.concatenate([[fit_time], quat, [g]]))
+            last.update(fit_time=fit_time, quat=quat,
+                        coil_dev_rrs=coil_dev_rrs)
+    assert_allclose(py_quats[:, :8], quats)
 
 
 @pytest.mark.slowtest
@@ -15,7 +15,8 @@ from scipy import linalg
 from mne.cov import (regularize, whiten_evoked,
                      _auto_low_rank_model,
                      prepare_noise_cov, compute_whitener,
-                     _regularized_covariance)
+                     _regularized_covariance, _CovAccumulator, _cv_folds,
+                     _cross_val, _shrunk_cv, _fit_factor_analysis)
 
 from mne import (read_cov, write_cov, Epochs, merge_events,
                  find_events, compute_raw_covariance,
@@ -25,6 +26,7 @@ from mne import (read_cov, write_cov, Epochs, merge_events,
 from mne.datasets import testing
 from mne.fixes import _get_args
 from mne.io import read_raw_fif, RawArray, read_raw_ctf
+from mne.io.meas_info import create_info
 from mne.io.pick import _DATA_CH_TYPES_SPLIT
 from mne.preprocessing import maxwell_filter
 from mne.rank import _compute_rank_int
@@ -486,6 +488,49 @@ def test_auto_low_rank():
                              method_params=method_params, cv=cv)
 
 
+@requires_version('sklearn', '0.18')
+def test_cross_val_fold_stats():
+    """Test cross-validation from the fold sufficient statistics."""
+    from sklearn.covariance import ShrunkCovariance
+    from sklearn.decomposition import FactorAnalysis, PCA
+    from sklearn.model_selection import KFold
+    rng = np.random.RandomState(0)
+    X = np.dot(rng.randn(300, 8), rng.randn(8, 8)) + 2.
+    folds = _cv_folds(X, 3)
+    splits = list(KFold(3).split(X))
+    for (train, train_acc, test_acc), (train_, test) in zip(folds, splits):
+        assert_array_equal(train, train_)
+        assert_allclose(train_acc.get_scatter(), np.cov(X[train].T) *
+                        (len(train) - 1))
+        assert_allclose(test_acc.mean, X[test].mean(axis=0))
+
+    # log likelihoods match fitting the estimators on the data
+    def loglik(est, X_test):
+        precision = est.get_precision()
+        return (-.5 * (X_test * np.dot(X_test, precision)).sum(axis=1) -
+                .5 * (8 * np.log(2 * np.pi) -
+                      np.linalg.slogdet(precision)[1])).mean()
+
+    ests = [PCA(4), FactorAnalysis(3, svd_method='lapack')]
+    want = [np.mean([loglik(est.fit(X[train]), X[test])
+                     for train, test in splits]) for est in ests]
+    for n_jobs in (1, 2):
+        assert_allclose(_cross_val(X, ests, folds, n_jobs), want)
+    assert_allclose(_fit_factor_analysis(
+        FactorAnalysis(3), folds[0][1]).get_covariance(),
+        ests[1].fit(X[splits[0][0]]).get_covariance())
+
+    # shrinkage grid search
+    shrinkages = np.logspace(-4, 0, 10)
+    for assume_centered in (True, False):
+        scores = [np.sum([len(test) * ShrunkCovariance(
+            shrinkage=shrinkage, assume_centered=assume_centered).fit(
+            X[train][:, :5]).score(X[test][:, :5]) for train, test in splits])
+            for shrinkage in shrinkages]
+        assert (_shrunk_cv(shrinkages, folds, np.arange(5), assume_centered) ==
+                shrinkages[np.argmax(scores)])
+
+
 @pytest.mark.slowtest
 @pytest.mark.parametrize('rank', ('full', None, 'info'))
 @requires_version('sklearn', '0.15')
@@ -740,4 +785,40 @@ def test_cov_ctf():
     assert raw.info['comps'], 'Comps matrices removed'
 
 
+def test_cov_accumulator():
+    """Test single-pass covariance accumulation."""
+    rng = np.random.RandomState(0)
+    data = rng.randn(5, 1000)
+    data[:3] = 1e-6 * data[:3] + 1e-3  # small signals with a large offset
+    data_c = data - data.mean(axis=1, keepdims=True)
+    want = np.dot(data_c, data_c.T)
+    accs = [_CovAccumulator(5) for _ in range(3)]
+    for acc, block in zip(accs, np.array_split(data, 3, axis=1)):
+        for sub_block in np.array_split(block, 7, axis=1):
+            acc.update(sub_block)
+    acc = accs[0].merge(accs[1]).merge(accs[2]).merge(_CovAccumulator(5))
+    assert acc.n_samples == 1000
+    assert_allclose(acc.mean, data.mean(axis=1))
+    assert_allclose(acc.get_scatter(), want, rtol=1e-10, atol=1e-24)
+    assert_allclose(acc.get_scatter(center=False), np.dot(data, data.T))
+
+    # compute_raw_covariance and compute_covariance (with n_jobs)
+    info = create_info(5, 1000., 'eeg')
+    raw = RawArray(data, info)
+    data_c = data[:, :900] - data[:, :900].mean(axis=1, keepdims=True)
+    epochs = Epochs(raw, make_fixed_length_events(raw, 1, duration=0.1),
+                    tmin=0, tmax=0.099, baseline=None)
+    data_e = np.hstack(epochs.get_data())
+    for n_jobs in (1, 2):
+        cov = compute_raw_covariance(raw, tstep=0.1, n_jobs=n_jobs)
+        assert cov['nfree'] == 900
+        assert_allclose(cov['data'], np.dot(data_c, data_c.T) / 899.,
+                        rtol=1e-10, atol=1e-24)
+        cov = compute_covariance(epochs, method='empirical', n_jobs=n_jobs,
+                                 rank='full')
+        assert cov['nfree'] == data_e.shape[1]
+        assert_allclose(cov['data'], np.dot(data_e, data_e.T) /
+                        data_e.shape[1])
+
+
 run_tests_if_main()
@@ -8,7 +8,7 @@ import numpy as np
 from scipy import sparse
 
 from numpy.testing import (assert_array_equal, assert_array_almost_equal,
-                           assert_equal)
+                           assert_equal, assert_allclose)
 import pytest
 
 from mne.datasets import testing
@@ -17,12 +17,14 @@ from mne import (read_label, stc_to_label, read_source_estimate,
                  write_labels_to_annot, split_label, spatial_tris_connectivity,
                  read_surface, random_parcellation, morph_labels,
                  labels_to_stc)
-from mne.label import Label, _blend_colors, label_sign_flip, _load_vert_pos
+from mne.label import (Label, _blend_colors, label_sign_flip, _load_vert_pos,
+                       _grow_regions, _cortex_parcellation)
 from mne.utils import (_TempDir, requires_sklearn, get_subjects_dir,
                        run_tests_if_main)
 from mne.label import _n_colors
 from mne.source_space import SourceSpaces
 from mne.source_estimate import mesh_edges
+from mne.surface import _get_ico_surface, mesh_dist
 
 
 data_path = testing.data_path(download=False)
@@ -804,6 +806,38 @@ def test_grow_labels():
     assert_array_equal(l1.vertices, l0.vertices)
 
 
+def test_grow_regions():
+    """Test growing regions and random parcellation on a sphere."""
+    from scipy.sparse.csgraph import dijkstra
+    surf = _get_ico_surface(4)
+    rr = surf['rr'] * 80.
+    graph = mesh_dist(surf['tris'], rr)
+    seeds = [[0], [100, 200], [1500]]
+    seed_dist = np.array([dijkstra(graph, indices=seed).min(axis=0)
+                          for seed in seeds])
+    parc, dist = _grow_regions(graph, seeds, np.array([30.] * 3))
+    want = np.where(seed_dist.min(axis=0) <= 30., seed_dist.argmin(axis=0), -1)
+    assert_array_equal(parc, want)
+    assert_allclose(dist[parc >= 0], seed_dist.min(axis=0)[parc >= 0])
+    parc, dist = _grow_regions(graph, seeds)
+    assert_array_equal(parc, seed_dist.argmin(axis=0))
+    # regions with different extents
+    extents = np.array([30., 10., 50.])
+    parc, dist = _grow_regions(graph, seeds, extents)
+    assert_array_equal(np.unique(parc), [-1, 0, 1, 2])
+    assert_array_equal(parc[np.concatenate(seeds)], [0, 1, 1, 2])
+    use = parc >= 0
+    assert np.all(dist[use] <= extents[parc[use]])
+    assert np.all(dist[use] >= seed_dist[parc[use], use] - 1e-10)
+    assert np.all(seed_dist[:, ~use] > 10.)
+
+    labels = _cortex_parcellation('sphere', 20, ['lh'], dict(lh=rr),
+                                  dict(lh=graph), random_state=0)
+    assert len(labels) == 20
+    vertices = np.concatenate([label.vertices for label in labels])
+    assert_array_equal(np.sort(vertices), np.arange(len(rr)))
+
+
 @testing.requires_testing_data
 def test_random_parcellation():
     """Test generation of random cortical parcellation."""
@@ -842,6 +876,9 @@ def test_random_parcellation():
         # Test that labels cover whole surface
         assert_array_equal(np.sort(vertices_total), np.arange(len(vert)))
 
+    with pytest.raises(ValueError, match='at least the number of hemis'):
+        random_parcellation(subject, 1, 'both', subjects_dir)
+
 
 @testing.requires_testing_data
 def test_label_sign_flip():
@@ -2,12 +2,16 @@
 # Author: Tommy Clausner <Tommy.Clausner@gmail.com>
 #
 # License: BSD (3-clause)
+from glob import glob
+import os
 import os.path as op
+from types import GeneratorType
 
 import pytest
 import numpy as np
 from numpy.testing import (assert_array_less, assert_allclose,
                            assert_array_equal)
+from scipy import sparse
 from scipy.spatial.distance import cdist
 
 import mne
@@ -20,9 +24,13 @@ from mne import (SourceEstimate, VolSourceEstimate, VectorSourceEstimate,
 from mne.datasets import testing
 from mne.minimum_norm import (apply_inverse, read_inverse_operator,
                               make_inverse_operator)
+from mne.morph import _morph_buffer
+from mne.source_estimate import _get_ico_tris
+from mne.surface import mesh_edges
 from mne.source_space import get_volume_labels_from_aseg
 from mne.utils import (run_tests_if_main, requires_nibabel, _TempDir,
-                       requires_dipy, requires_h5py, requires_version)
+                       requires_dipy, requires_h5py, requires_version,
+                       catch_logging)
 from mne.fixes import _get_args
 
 # Setup paths
@@ -60,6 +68,86 @@ def test_sourcemorph_consistency():
         mne.morph._SOURCE_MORPH_ATTRIBUTES
 
 
+def test_morph_buffer():
+    """Test smoothing and morphing of sparse, dense and vector data."""
+    rng = np.random.RandomState(0)
+    e = mesh_edges(_get_ico_tris(3))
+    n_vertices = e.shape[0]
+    e = e + sparse.eye(n_vertices, n_vertices)
+    idx_use = np.sort(rng.choice(n_vertices, 40, replace=False))
+    nearest = np.arange(0, n_vertices, 2)
+    maps = sparse.eye(n_vertices, format='csr')
+    for smooth in (None, 1, 3):
+        morph_mat = _morph_buffer(
+            sparse.eye(len(idx_use), format='csr'), idx_use, e, smooth,
+            n_vertices, nearest, maps, warn=False)
+        assert morph_mat.shape == (len(nearest), len(idx_use))
+        # smoothing preserves constant data
+        if smooth is None:
+            assert_allclose(morph_mat.sum(axis=1), 1.)
+        data = rng.randn(len(idx_use), 3, 4)
+        data_morphed = _morph_buffer(data, idx_use, e, smooth, n_vertices,
+                                     nearest, maps, warn=False)
+        assert data_morphed.shape == (len(nearest), 3, 4)
+        for dim in range(3):
+            assert_allclose(data_morphed[:, dim], morph_mat * data[:, dim],
+                            atol=1e-12)
+    with pytest.warns(RuntimeWarning, match='consider increasing'):
+        _morph_buffer(data, idx_use, e, 1, n_vertices, nearest, maps)
+
+
+def test_surface_morph_apply():
+    """Test applying a surface morph without copying the data."""
+    rng = np.random.RandomState(0)
+    vertices_from = [np.arange(10), np.arange(5)]
+    vertices_to = [np.arange(8), np.arange(4)]
+    morph_mat = sparse.random(12, 15, density=0.3, format='csr',
+                              random_state=rng)
+    morph = SourceMorph('sample', 'fsaverage', 'surface', None, None, None,
+                        5, None, False, morph_mat, vertices_to, None, None,
+                        None, None, dict(vertices_from=vertices_from))
+    for dtype in (np.float64, np.float32):
+        stc = SourceEstimate(rng.randn(15, 3).astype(dtype), vertices_from,
+                             0, 1)
+        data = stc.data.copy()
+        stc_to = morph.apply(stc)
+        assert stc_to.data.dtype == dtype
+        assert stc_to.subject == 'fsaverage'
+        assert_allclose(stc_to.data, morph_mat * data, rtol=1e-5)
+        assert stc.subject is None
+        assert_array_equal(stc.data, data)
+    stc.subject = 'foo'
+    with pytest.raises(ValueError, match='subject_from must match'):
+        morph.apply(stc)
+    for bad in (stc.data, 'foo'):
+        with pytest.raises(TypeError, match='stc_from must be an instance'):
+            morph.apply(bad)
+
+    # lists and generators of source estimates
+    stcs = [SourceEstimate(rng.randn(15, n_times), vertices_from, 0, 1)
+            for n_times in (1, 3, 2)]
+    stcs.append(VectorSourceEstimate(rng.randn(15, 3, 4), vertices_from,
+                                     0, 1))
+    stcs_to = [morph.apply(stc) for stc in stcs]
+    for n_jobs in (1, 2):
+        for stcs_morph in (morph.apply(stcs, n_jobs=n_jobs),
+                           morph.apply((stc for stc in stcs), n_jobs=n_jobs)):
+            if isinstance(stcs_morph, list):
+                assert len(stcs_morph) == len(stcs)
+            else:
+                assert isinstance(stcs_morph, GeneratorType)
+                stcs_morph = list(stcs_morph)
+            for stc_to, stc_morph in zip(stcs_to, stcs_morph):
+                assert type(stc_morph) is type(stc_to)
+                assert_allclose(stc_morph.data, stc_to.data)
+                assert_array_equal(stc_morph.vertices[0], vertices_to[0])
+    assert morph.apply([]) == []
+    stcs[1] = SourceEstimate(rng.randn(14, 1), [np.arange(9), np.arange(5)],
+                             0, 1)
+    with pytest.raises(ValueError, match='vertices do not match'):
+        morph.apply(stcs)
+
+
 @requires_version('scipy', '0.13')  # SciPy 0.13 reduction bug
 @testing.requires_testing_data
 def test_sparse_morph():
@@ -281,6 +369,28 @@ def test_volume_source_morph():
         fwd['src'], 'sample', 'sample', subjects_dir=subjects_dir,
         **kwargs)
 
+    # cached registration and repeated applies
+    stc_vol_to = source_morph_vol.apply(stc_vol)
+    assert source_morph_vol._vol_vertices_to is not None
+    assert_allclose(source_morph_vol.apply(stc_vol).data, stc_vol_to.data)
+    orig_dir = os.getenv('MNE_CACHE_DIR', None)
+    try:
+        os.environ['MNE_CACHE_DIR'] = tempdir
+        compute_source_morph(fwd['src'], 'sample', 'sample',
+                             subjects_dir=subjects_dir, **kwargs)
+        assert len(glob(op.join(tempdir, 'mne_sdr_morph_*.h5'))) == 1
+        with catch_logging() as log:
+            source_morph_cached = compute_source_morph(
+                fwd['src'], 'sample', 'sample', subjects_dir=subjects_dir,
+                verbose=True, **kwargs)
+        assert 'Using cached registration' in log.getvalue()
+    finally:
+        if orig_dir is not None:
+            os.environ['MNE_CACHE_DIR'] = orig_dir
+        else:
+            del os.environ['MNE_CACHE_DIR']
+    assert_allclose(source_morph_cached.apply(stc_vol).data, stc_vol_to.data)
+
     # check wrong subject_to
     with pytest.raises(IOError, match='cannot read file'):
         compute_source_morph(fwd['src'], 'sample', '42',
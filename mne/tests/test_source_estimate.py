@@ -18,7 +18,8 @@ from mne import (stats, SourceEstimate, VectorSourceEstimate,
                  spatial_inter_hemi_connectivity,
                  spatial_src_connectivity, spatial_tris_connectivity,
                  SourceSpaces, VolVectorSourceEstimate)
-from mne.source_estimate import grade_to_tris, _get_vol_mask
+from mne.source_estimate import (grade_to_tris, _get_vol_mask,
+                                 _label_funcs)
 
 from mne.minimum_norm import (read_inverse_operator, apply_inverse,
                               apply_inverse_epochs)
@@ -570,6 +571,45 @@ def test_extract_label_time_course():
     assert (x.size == 0)
 
 
+@pytest.mark.parametrize('mode', ['mean', 'mean_flip', 'pca_flip', 'max'])
+def test_extract_label_time_course_mixed(mode):
+    """Test extraction of label time courses with a synthetic mixed src."""
+    n_verts, n_vol, n_times = 50, 7, 4
+    src = SourceSpaces([
+        dict(type='surf', vertno=np.arange(0, 2 * n_verts, 2),
+             nn=rng.randn(2 * n_verts, 3)) for _ in range(2)] +
+        [dict(type='vol', vertno=np.arange(n_vol))])
+    vertices = [s['vertno'] for s in src]
+    labels = [Label(vertices=np.arange(10), hemi='lh'),
+              Label(vertices=np.arange(5, 40), hemi='rh'),
+              Label(vertices=[1, 3], hemi='lh'),  # empty
+              Label(vertices=np.arange(20), hemi='lh') +
+              Label(vertices=np.arange(30, 90), hemi='rh')]
+    stcs = [MixedSourceEstimate(rng.randn(2 * n_verts + n_vol, n_times),
+                                vertices, 0, 1) for _ in range(3)]
+    with pytest.warns(RuntimeWarning, match='does not contain any vertices'):
+        label_tcs = extract_label_time_course(stcs, labels, src, mode=mode,
+                                              allow_empty=True)
+    # compare to the time courses of the labels computed one at a time
+    for stc, label_tc in zip(stcs, label_tcs):
+        assert label_tc.shape == (len(labels) + 1, n_times)
+        for li, label in enumerate(labels):
+            if li == 2:
+                assert_array_equal(label_tc[li], 0.)
+                continue
+            idx = list()
+            for this_label in getattr(label, 'lh', label), \
+                    getattr(label, 'rh', label):
+                hi = int(this_label.hemi == 'rh')
+                idx.append(np.searchsorted(vertices[hi], np.intersect1d(
+                    vertices[hi], this_label.vertices)) + hi * n_verts)
+            idx = np.unique(np.concatenate(idx))
+            flip = label_sign_flip(label, src[:2])[:, np.newaxis]
+            assert_allclose(label_tc[li],
+                            _label_funcs[mode](flip, stc.data[idx]))
+        assert_allclose(label_tc[-1], stc.data[-n_vol:].mean(axis=0))
+
+
 def _my_trans(data):
     """FFT that adds an additional dimension by repeating result."""
     data_t = fft(data)
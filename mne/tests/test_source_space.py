@@ -14,8 +14,11 @@ from mne import (read_source_spaces, vertex_to_mni, write_source_spaces,
 from mne.utils import (_TempDir, requires_fs_or_nibabel, requires_nibabel,
                        requires_freesurfer, run_subprocess,
                        requires_mne, requires_version, run_tests_if_main)
-from mne.surface import _accumulate_normals, _triangle_neighbors
-from mne.source_space import _get_mri_header, _get_mgz_header, _read_talxfm
+from mne.surface import (_accumulate_normals, _triangle_neighbors,
+                         _get_ico_surface)
+from mne.source_space import (_get_mri_header, _get_mgz_header, _read_talxfm,
+                              _points_outside_surface,
+                              _points_outside_surface_solids)
 from mne.source_estimate import _get_src_type
 from mne.transforms import apply_trans, invert_transform
 from mne.source_space import (get_volume_labels_from_aseg, SourceSpaces,
@@ -124,6 +127,62 @@ def test_add_source_space_distances_limited():
         assert_allclose(np.zeros_like(d.data), d.data, rtol=0, atol=1e-6)
 
 
+def test_points_outside_surface():
+    """Test checking whether points are outside a surface."""
+    ico = _get_ico_surface(3)
+    rr = ico['rr'].copy()
+    # make it non-convex
+    rr *= (0.07 * (1 + 0.2 * np.sin(3 * np.arctan2(rr[:, 1], rr[:, 0])) *
+                   rr[:, 2] ** 2))[:, np.newaxis]
+    surf = dict(rr=rr, tris=ico['tris'])
+    grid = np.linspace(-0.08, 0.08, 17)
+    points = np.array(np.meshgrid(grid, grid, grid)).reshape(3, -1).T
+    points = np.concatenate([points, rr * (1 + 1e-7), rr * (1 - 1e-7)])
+    assert len(points) > 1000  # so that the grid is used
+    outside = _points_outside_surface(points, surf)
+    outside_solids = _points_outside_surface_solids(points, surf)
+    assert_array_equal(outside, outside_solids)
+    assert 0 < outside.sum() < len(points)
+    assert_array_equal(outside[-2 * len(rr):], np.repeat([True, False],
+                                                         len(rr)))
+    # an open surface is only checked with the solid angles
+    surf['tris'] = surf['tris'][1:]
+    assert_array_equal(_points_outside_surface(points, surf),
+                       _points_outside_surface_solids(points, surf))
+
+
+@requires_version('scipy', '0.13')
+def test_add_source_space_distances_sphere():
+    """Test limited source space distances on an icosahedral surface."""
+    rng = np.random.RandomState(0)
+    ico = _get_ico_surface(4)
+    rr = ico['rr'] * 0.07  # approximate the size of a hemisphere (in m)
+    vertno = np.sort(rng.choice(len(rr), 300, replace=False))
+    inuse = np.zeros(len(rr), int)
+    inuse[vertno] = 1
+    src = SourceSpaces([dict(
+        type='surf', id=FIFF.FIFFV_MNE_SURF_LEFT_HEMI, rr=rr, nn=ico['nn'],
+        tris=ico['tris'], np=len(rr), vertno=vertno, nuse=len(vertno),
+        inuse=inuse, coord_frame=FIFF.FIFFV_COORD_MRI)])
+    src_inf = add_source_space_distances(src.copy())
+    assert src_inf[0]['dist'].dtype == np.float32
+    for dist_limit, n_jobs in ((0.01, 1), (0.03, 2)):
+        src_lim = add_source_space_distances(src.copy(), dist_limit, n_jobs)
+        assert_array_equal(src_lim[0]['dist_limit'],
+                           np.array([dist_limit], np.float32))
+        dist = src_inf[0]['dist'].copy()
+        dist.data[dist.data > dist_limit] = 0
+        dist.eliminate_zeros()
+        assert dist.nnz > 0
+        assert_allclose((src_lim[0]['dist'] - dist).data, 0, atol=1e-7)
+        assert_array_equal(src_lim[0]['dist'].indices, dist.indices)
+    # all vertices are closer than 3 cm to a source: patch info can be added
+    assert src_lim[0]['nearest'] is not None
+    assert_array_equal(src_lim[0]['nearest'], src_inf[0]['nearest'])
+    assert_allclose(src_lim[0]['nearest_dist'], src_inf[0]['nearest_dist'])
+    assert len(src_lim[0]['pinfo']) == len(vertno)
+
+
 @pytest.mark.slowtest
 @testing.requires_testing_data
 @requires_version('scipy', '0.11')
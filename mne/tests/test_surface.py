@@ -12,7 +12,7 @@ from mne.datasets import testing
 from mne import read_surface, write_surface, decimate_surface, pick_types
 from mne.surface import (read_morph_map, _compute_nearest,
                          fast_cross_3d, get_head_surf, read_curvature,
-                         get_meg_helmet_surf)
+                         get_meg_helmet_surf, _get_ico_surface, _file_cache)
 from mne.utils import (_TempDir, requires_mayavi, requires_tvtk, catch_logging,
                        run_tests_if_main, object_diff, traits_test)
 from mne.io import read_info
@@ -146,6 +146,31 @@ def test_make_morph_maps():
         assert (mm - sparse.eye(mm.shape[0], mm.shape[0])).sum() == 0
 
 
+def test_read_surface_cached():
+    """Test that surfaces are only read again if they changed."""
+    tempdir = _TempDir()
+    fname = op.join(tempdir, 'lh.test')
+    ico = _get_ico_surface(2)
+    write_surface(fname, ico['rr'], ico['tris'])
+    rr, tris = read_surface(fname)
+    assert_allclose(rr, ico['rr'], atol=1e-6)
+    rr *= 2  # does not modify the cached surface
+    with catch_logging() as log:
+        rr, tris = read_surface(fname, verbose='debug')
+    assert 'Using cached' in log.getvalue()
+    assert_allclose(rr, ico['rr'], atol=1e-6)
+    assert_array_equal(tris, ico['tris'])
+    # modified file
+    write_surface(fname, 2 * ico['rr'], ico['tris'])
+    mtime = os.stat(fname).st_mtime + 10
+    os.utime(fname, (mtime, mtime))
+    with catch_logging() as log:
+        rr, tris = read_surface(fname, verbose='debug')
+    assert 'Using cached' not in log.getvalue()
+    assert_allclose(rr, 2 * ico['rr'], atol=1e-6)
+    _file_cache.clear()
+
+
 @testing.requires_testing_data
 def test_io_surface():
     """Test reading and writing of Freesurfer surface mesh files."""
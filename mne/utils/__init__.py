@@ -16,7 +16,7 @@ from .check import (check_fname, check_version, check_random_state,
 from .config import (set_config, get_config, get_config_path, set_cache_dir,
                      set_memmap_min_size, get_subjects_dir, _get_stim_channel,
                      sys_info, _get_extra_data_path, _get_root_dir,
-                     _get_call_line)
+                     _get_call_line, _read_cache_dir, _write_cache_dir)
 from .docs import (copy_function_doc_to_method_doc, copy_doc, linkcode_resolve,
                    open_docs, deprecated, fill_doc)
 from .fetching import _fetch_file, _url_to_local_path
@@ -43,6 +43,6 @@ from .numerics import (hashfunc, md5sum, _compute_row_norms,
                        _time_mask, grand_average, object_diff, object_hash,
                        object_size, _apply_scaling_cov, _undo_scaling_cov,
                        _apply_scaling_array, _undo_scaling_array,
-                       _scaled_array, _replace_md5, _PCA)
+                       _scaled_array, _replace_md5, _PCA, _LRUCache)
 from .mixin import (SizeMixin, GetEpochsMixin, _prepare_read_metadata,
                     _prepare_write_metadata, _FakeNoPandas)
@@ -24,6 +24,7 @@ from ._logging import warn, logger
 
 
 _temp_home_dir = None
+_cache_max_bytes = None  # parsed MNE_CACHE_MAX_SIZE, reset by set_config
 
 
 def set_cache_dir(cache_dir):
@@ -69,6 +70,7 @@ def set_memmap_min_size(memmap_min_size):
 known_config_types = (
     'MNE_BROWSE_RAW_SIZE',
     'MNE_CACHE_DIR',
+    'MNE_CACHE_MAX_SIZE',
     'MNE_COREG_ADVANCED_RENDERING',
     'MNE_COREG_COPY_ANNOT',
     'MNE_COREG_GUESS_MRI_SUBJECT',
@@ -292,6 +294,80 @@ def set_config(key, value, home_dir=None, set_env=True):
         os.mkdir(directory)
     with open(config_path, 'w') as fid:
         json.dump(config, fid, sort_keys=True, indent=0)
+    if key == 'MNE_CACHE_MAX_SIZE':
+        global _cache_max_bytes
+        _cache_max_bytes = None
+
+
+def _get_cache_max_bytes():
+    """Get the size limit of the in-memory caches (MNE_CACHE_MAX_SIZE).
+
+    The value is only read once (and again after it is changed with
+    set_config), because the caches are used on hot paths.
+    """
+    global _cache_max_bytes
+    if _cache_max_bytes is None:
+        max_size = get_config('MNE_CACHE_MAX_SIZE', '256M')
+        max_bytes = max_size.strip()
+        factor = dict(K=1e3, M=1e6, G=1e9).get(max_bytes[-1:].upper(), 1.)
+        if factor != 1.:
+            max_bytes = max_bytes[:-1]
+        try:
+            max_bytes = float(max_bytes)
+        except ValueError:
+            max_bytes = -1
+        if not max_bytes >= 0:
+            raise ValueError('MNE_CACHE_MAX_SIZE must be a non-negative '
+                             'number of bytes, optionally with a K, M or G '
+                             'suffix (e.g., 500M or 0 to disable caching), '
+                             'got %r' % (max_size,))
+        _cache_max_bytes = int(max_bytes * factor)
+    return _cache_max_bytes
+
+
+def _cache_dir_fname(kind, key, ext):
+    """Get the file an entry is persisted to in MNE_CACHE_DIR (if set)."""
+    cache_dir = get_config('MNE_CACHE_DIR', None)
+    if cache_dir is None or not op.isdir(cache_dir):
+        return None
+    return op.join(cache_dir, 'mne_%s_%s%s' % (kind, key, ext))
+
+
+def _read_cache_dir(kind, key, ext, read):
+    """Read an entry of MNE_CACHE_DIR using read(fname).
+
+    None is returned if the entry does not exist or cannot be read.
+    """
+    fname = _cache_dir_fname(kind, key, ext)
+    if fname is None or not op.isfile(fname):
+        return None
+    logger.debug('    Reading cached %s' % fname)
+    try:
+        return read(fname)
+    except Exception as err:
+        logger.info('    Could not read cached %s: %s' % (fname, err))
+        return None
+
+
+def _write_cache_dir(kind, key, ext, write):
+    """Write an entry of MNE_CACHE_DIR using write(fname)."""
+    fname = _cache_dir_fname(kind, key, ext)
+    if fname is None:
+        return
+    # write to a temporary file first so that concurrent jobs never read a
+    # partially written one
+    temp_fname = '%s.%d.tmp%s' % (fname[:-len(ext)], os.getpid(), ext)
+    try:
+        write(temp_fname)
+        os.replace(temp_fname, fname)
+    except (IOError, OSError) as err:
+        logger.info('    Could not write cached %s: %s' % (fname, err))
+    finally:
+        if op.isfile(temp_fname):
+            try:
+                os.remove(temp_fname)
+            except OSError:
+                pass
 
 
 def _get_extra_data_path(home_dir=None):
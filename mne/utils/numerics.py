@@ -667,6 +667,88 @@ def object_size(x):
     return size
 
 
+class _LRUCache(object):
+    """A least-recently-used cache with a bounded total size.
+
+    Parameters
+    ----------
+    max_bytes : int | None
+        The maximum total size of the cached values, as estimated by
+        :func:`object_size`. When adding a value would exceed it, the least
+        recently used values are evicted first. A single value larger than
+        ``max_bytes`` is never cached. If None (default), the limit is read
+        from the ``MNE_CACHE_MAX_SIZE`` config value (default ``'256M'``,
+        ``'0'`` disables caching).
+    """
+
+    def __init__(self, max_bytes=None):
+        from collections import OrderedDict
+        self._max_bytes = None if max_bytes is None else int(max_bytes)
+        self._data = OrderedDict()
+        self._sizes = dict()
+        self.nbytes = 0
+
+    @property
+    def max_bytes(self):
+        """The maximum total size of the cached values."""
+        if self._max_bytes is None:
+            from .config import _get_cache_max_bytes
+            return _get_cache_max_bytes()
+        return self._max_bytes
+
+    def __contains__(self, key):  # noqa: D105
+        return key in self._data
+
+    def __len__(self):  # noqa: D105
+        return len(self._data)
+
+    def __getitem__(self, key):  # noqa: D105
+        value = self._data.pop(key)
+        self._data[key] = value  # now the most recently used
+        return value
+
+    def __setitem__(self, key, value):  # noqa: D105
+        if key in self._data:
+            self._pop(key)
+        max_bytes = self.max_bytes
+        size = object_size(value)
+        if size > max_bytes:
+            return
+        self._data[key] = value
+        self._sizes[key] = size
+        self.nbytes += size
+        self._evict(max_bytes)
+
+    def get(self, key, default=None):
+        """Get a value, or ``default`` if ``key`` is not cached."""
+        if self._data:
+            self._evict()  # the limit might have changed
+        return self[key] if key in self._data else default
+
+    def resize(self, max_bytes):
+        """Change the maximum size, evicting values if necessary.
+
+        None reverts to the ``MNE_CACHE_MAX_SIZE`` config value.
+        """
+        self._max_bytes = None if max_bytes is None else int(max_bytes)
+        self._evict()
+
+    def clear(self):
+        """Remove all values."""
+        self._data.clear()
+        self._sizes.clear()
+        self.nbytes = 0
+
+    def _pop(self, key):
+        self.nbytes -= self._sizes.pop(key)
+        return self._data.pop(key)
+
+    def _evict(self, max_bytes=None):
+        max_bytes = self.max_bytes if max_bytes is None else max_bytes
+        while self.nbytes > max_bytes:
+            self._pop(next(iter(self._data)))
+
+
 def _sort_keys(x):
     """Sort and return keys of dict."""
     keys = list(x.keys())  # note: not thread-safe
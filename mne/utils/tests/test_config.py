@@ -1,10 +1,12 @@
 from io import StringIO
 import os
+import os.path as op
 import pytest
 
 from mne.utils import (set_config, get_config, get_config_path,
                        set_memmap_min_size, _get_stim_channel, sys_info,
-                       verbose, _get_call_line)
+                       verbose, _get_call_line, _read_cache_dir,
+                       _write_cache_dir)
 
 
 def test_config(tmpdir):
@@ -70,6 +72,42 @@ def test_config(tmpdir):
     pytest.raises(TypeError, _get_stim_channel, [1], None)
 
 
+def test_cache_dir(tmpdir):
+    """Test reading and writing entries of MNE_CACHE_DIR."""
+    tempdir = str(tmpdir)
+    fname = op.join(tempdir, 'mne_foo_bar.txt')
+
+    def write(fname):
+        with open(fname, 'w') as fid:
+            fid.write('foo')
+
+    def read(fname):
+        with open(fname) as fid:
+            return int(fid.read())  # fails for the bad entries
+
+    def bad_write(fname):
+        write(fname)
+        raise IOError('disk full')
+
+    orig_dir = os.getenv('MNE_CACHE_DIR', None)
+    try:
+        os.environ['MNE_CACHE_DIR'] = tempdir
+        assert _read_cache_dir('foo', 'bar', '.txt', read) is None
+        _write_cache_dir('foo', 'bar', '.txt', bad_write)
+        assert os.listdir(tempdir) == []  # the temporary file is removed
+        _write_cache_dir('foo', 'bar', '.txt', write)
+        assert os.listdir(tempdir) == [op.basename(fname)]
+        assert _read_cache_dir('foo', 'bar', '.txt', read) is None
+        with open(fname, 'w') as fid:
+            fid.write('1')
+        assert _read_cache_dir('foo', 'bar', '.txt', read) == 1
+    finally:
+        if orig_dir is not None:
+            os.environ['MNE_CACHE_DIR'] = orig_dir
+        else:
+            del os.environ['MNE_CACHE_DIR']
+
+
 def test_sys_info():
     """Test info-showing utility."""
     out = StringIO()
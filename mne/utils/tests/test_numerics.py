@@ -1,6 +1,7 @@
 from copy import deepcopy
 from distutils.version import LooseVersion
 from io import StringIO
+import os
 import os.path as op
 
 import numpy as np
@@ -18,7 +19,8 @@ from mne.utils import (_get_inst_data, md5sum, hashfunc,
                        random_permutation, _reg_pinv, object_size,
                        object_hash, object_diff, _apply_scaling_cov,
                        _undo_scaling_cov, _apply_scaling_array,
-                       _undo_scaling_array, _PCA, requires_sklearn)
+                       _undo_scaling_array, _PCA, requires_sklearn,
+                       _LRUCache, _TempDir, set_config)
 
 
 base_dir = op.join(op.dirname(__file__), '..', '..', 'io', 'tests', 'data')
@@ -283,6 +285,54 @@ def test_object_size():
             '%s < %s < %s:\n%s' % (lower, size, upper, obj)
 
 
+def test_lru_cache():
+    """Test the size-limited LRU cache."""
+    tempdir = _TempDir()
+    key = 'MNE_CACHE_MAX_SIZE'
+    old_value = os.environ.get(key)
+    try:
+        set_config(key, '2K', home_dir=tempdir)
+        cache = _LRUCache()
+        assert cache.max_bytes == 2000
+        for ii in range(3):
+            cache[ii] = np.ones(100)  # ~900 bytes each
+        assert list(cache._data) == [1, 2]  # the least recently used is gone
+        assert cache.get(0) is None
+        assert cache.get(1) is not None  # now the most recently used
+        cache[3] = np.ones(100)
+        assert list(cache._data) == [1, 3]
+        cache[4] = np.ones(1000)  # too large
+        assert 4 not in cache
+        assert cache.nbytes == sum(object_size(v)
+                                   for v in cache._data.values())
+        # the limit is only read again when it is set
+        os.environ[key] = '0'
+        assert cache.max_bytes == 2000
+        set_config(key, '1000', home_dir=tempdir)
+        assert cache.get(3) is not None
+        assert list(cache._data) == [3]
+        set_config(key, '0', home_dir=tempdir)  # disabled
+        assert cache.get(3) is None
+        cache[3] = np.ones(1)
+        assert len(cache) == 0 and cache.nbytes == 0
+        # an explicit size overrides the config
+        cache.resize(1e4)
+        cache[3] = np.ones(100)
+        assert cache.get(3) is not None
+        cache.resize(None)
+        assert cache.get(3) is None
+        set_config(key, 'foo', home_dir=tempdir)
+        with pytest.raises(ValueError, match='MNE_CACHE_MAX_SIZE must be'):
+            cache[3] = np.ones(1)
+        set_config(key, '-1M', home_dir=tempdir)
+        with pytest.raises(ValueError, match='non-negative'):
+            _LRUCache().max_bytes
+    finally:
+        set_config(key, None, home_dir=tempdir)
+        if old_value is not None:
+            os.environ[key] = old_value
+
+
 def test_hash():
     """Test dictionary hashing and comparison functions."""
     # does hashing all of these types work: